@@ -1,12 +1,14 @@
 from __future__ import absolute_import
 
 import functools
+import itertools
 import logging
 import six
 import time
 
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.utils.cache import patch_vary_headers
 from django.utils.http import urlquote
 from django.views.decorators.csrf import csrf_exempt
 from enum import Enum
@@ -17,7 +19,7 @@ from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from sentry import tsdb
+from sentry import options, tsdb
 from sentry.app import raven
 from sentry.auth import access
 from sentry.models import Environment
@@ -29,6 +31,9 @@ from sentry.utils.audit import create_audit_entry
 from .authentication import ApiKeyAuthentication, TokenAuthentication
 from .paginator import Paginator
 from .permissions import NoPermission
+from .streaming import (
+    STREAM_BATCH_SIZE, StreamingJSONResponse, compress_response, get_content_encoding
+)
 
 
 __all__ = ['DocSection', 'Endpoint', 'EnvironmentMixin', 'StatsMixin']
@@ -180,6 +185,37 @@ class Endpoint(APIView):
 
         return self.response
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(Endpoint, self).finalize_response(request, response, *args, **kwargs)
+
+        if options.get('api.response.compression'):
+            patch_vary_headers(response, ('Accept-Encoding', ))
+            content_encoding = self.get_content_encoding(request)
+            # streamed responses are compressed as they are generated
+            if content_encoding is not None and isinstance(response, Response):
+                response.add_post_render_callback(
+                    functools.partial(
+                        compress_response,
+                        encoding=content_encoding,
+                        min_size=options.get('api.response.compression-min-size'),
+                    )
+                )
+        return response
+
+    def get_content_encoding(self, request):
+        # responses to our internal API client are consumed in process
+        if getattr(request, '__from_api_client__', False):
+            return None
+        if not options.get('api.response.compression'):
+            return None
+        return get_content_encoding(request)
+
+    def can_stream(self, request):
+        # the internal API client needs ``response.data``
+        if getattr(request, '__from_api_client__', False):
+            return False
+        return options.get('api.response.streaming')
+
     def add_cors_headers(self, request, response):
         response['Access-Control-Allow-Origin'] = request.META['HTTP_ORIGIN']
         response['Access-Control-Allow-Methods'] = ', '.join(
@@ -190,6 +226,8 @@ class Endpoint(APIView):
             response['X-Hits'] = cursor_result.hits
         if cursor_result.max_hits is not None:
             response['X-Max-Hits'] = cursor_result.max_hits
+        if cursor_result.hits_mode is not None:
+            response['X-Hits-Mode'] = cursor_result.hits_mode
         response['Link'] = ', '.join(
             [
                 self.build_cursor_link(
@@ -202,8 +240,15 @@ class Endpoint(APIView):
         return Response(context, **kwargs)
 
     def paginate(
-        self, request, on_results=None, paginator_cls=Paginator, default_per_page=100, **kwargs
+        self, request, on_results=None, paginator_cls=Paginator, default_per_page=100,
+        stream=False, **kwargs
     ):
+        """
+        Respond with a page of results. With ``stream`` the results are
+        serialized and sent out a few at a time rather than all at once,
+        which only works if ``on_results`` handles any slice of the page on
+        its own.
+        """
         per_page = int(request.GET.get('per_page', default_per_page))
         input_cursor = request.GET.get('cursor')
         if input_cursor:
@@ -219,6 +264,14 @@ class Endpoint(APIView):
             cursor=input_cursor,
         )
 
+        if stream and self.can_stream(request):
+            response = StreamingJSONResponse(
+                self._iter_result_batches(request, cursor_result.results, on_results),
+                content_encoding=self.get_content_encoding(request),
+            )
+            self.add_cursor_headers(request, response, cursor_result)
+            return response
+
         # map results based on callback
         if on_results:
             results = on_results(cursor_result.results)
@@ -227,6 +280,33 @@ class Endpoint(APIView):
         self.add_cursor_headers(request, response, cursor_result)
         return response
 
+    def _iter_result_batches(self, request, results, on_results=None):
+        """
+        Split the results into batches. The first batch is serialized right
+        away, so that most errors still turn into an error response instead
+        of failing once the response is being sent.
+        """
+        results = list(results)
+        batches = [
+            results[i:i + STREAM_BATCH_SIZE] for i in range(0, len(results), STREAM_BATCH_SIZE)
+        ]
+        if not on_results or not batches:
+            return iter(batches)
+        return itertools.chain(
+            [on_results(batches[0])],
+            self._serialize_batches(request, batches[1:], on_results),
+        )
+
+    def _serialize_batches(self, request, batches, on_results):
+        try:
+            for batch in batches:
+                yield on_results(batch)
+        except Exception:
+            # The status was already sent, so the error can only be reported
+            # and the response cut short.
+            logger.exception('api.stream.failed', extra={'path': request.path})
+            raise
+
 
 class EnvironmentMixin(object):
     def _get_environment_func(self, request, organization_id):
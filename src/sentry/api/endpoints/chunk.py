@@ -94,9 +94,10 @@ class ChunkUploadEndpoint(OrganizationEndpoint):
             return Response({'error': 'Too many chunks'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        for checksum, chunk in izip(checksums, files):
-            # Here we create the actual blob
-            blob = FileBlob.from_file(chunk)
+        # Here we create the actual blobs, uploading all missing ones at once
+        blobs = FileBlob.from_chunks([chunk.read() for chunk in files])
+
+        for checksum, blob in izip(checksums, blobs):
             # Add ownership to the blob here
             try:
                 with transaction.atomic():
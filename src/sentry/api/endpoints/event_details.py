@@ -9,7 +9,8 @@ from sentry.api.bases.group import GroupPermission
 from sentry.api.exceptions import ResourceDoesNotExist
 from sentry.api.serializers import serialize
 from sentry.constants import EVENT_ORDERING_KEY
-from sentry.models import Event, Release, UserReport
+from sentry.models import Event, UserReport
+from sentry.utils.events import hydrate_events
 
 
 class EventDetailsEndpoint(Endpoint):
@@ -19,13 +20,8 @@ class EventDetailsEndpoint(Endpoint):
         version = event.get_tag('sentry:release')
         if not version:
             return None
-        try:
-            release = Release.objects.get(
-                projects=event.project,
-                organization_id=event.project.organization_id,
-                version=version,
-            )
-        except Release.DoesNotExist:
+        release = event.get_release()
+        if release is None:
             return {'version': version}
         return serialize(release, request.user)
 
@@ -45,7 +41,7 @@ class EventDetailsEndpoint(Endpoint):
 
         self.check_object_permissions(request, event.group)
 
-        Event.objects.bind_nodes([event], 'data')
+        hydrate_events([event], releases=True)
 
         # HACK(dcramer): work around lack of unique sorting on datetime
         base_qs = Event.objects.filter(
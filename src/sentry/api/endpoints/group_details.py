@@ -1,14 +1,18 @@
 from __future__ import absolute_import
 
+from concurrent.futures import CancelledError, TimeoutError
+from Queue import Full
 from datetime import timedelta
 import functools
 import logging
+import six
+from time import time
 from uuid import uuid4
 
 from django.utils import timezone
 from rest_framework.response import Response
 
-from sentry import tsdb, tagstore
+from sentry import options, tsdb, tagstore
 from sentry.api import client
 from sentry.api.base import DocSection, EnvironmentMixin
 from sentry.api.bases import GroupEndpoint
@@ -19,6 +23,7 @@ from sentry.models import (
     Environment,
     Group,
     GroupHash,
+    GroupMeta,
     GroupSeen,
     GroupStatus,
     Release,
@@ -26,10 +31,58 @@ from sentry.models import (
     UserReport,
 )
 from sentry.plugins import IssueTrackingPlugin2, plugins
+from sentry.utils import metrics
+from sentry.utils.concurrent import SynchronousExecutor, ThreadedExecutor
+from sentry.utils.db import close_connections_after
 from sentry.utils.safe import safe_execute
 from sentry.utils.apidocs import scenario, attach_scenarios
 
 delete_logger = logging.getLogger('sentry.deletions.api')
+logger = logging.getLogger(__name__)
+
+# what a section of the response is left at if it takes too long
+SECTION_DEFAULTS = {
+    'activity': [],
+    'seenBy': [],
+    'releases': (None, None),
+    'participants': [],
+    'pluginActions': [],
+    'pluginIssues': [],
+    'pluginContexts': [],
+    'tags': [],
+    'userReportCount': 0,
+    'stats24h': [],
+    'stats30d': [],
+}
+
+# sections calling into plugins, which may talk to external services
+PLUGIN_SECTIONS = frozenset(['pluginActions', 'pluginIssues', 'pluginContexts'])
+
+_section_executors = {}
+
+
+def get_section_executor(name):
+    """
+    Plugin sections run on a pool of their own, so that slow plugins can't
+    hold up the other sections. Both pools only queue a limited number of
+    sections, the sections which don't fit are run by the request thread.
+    """
+    kind = 'plugins' if name in PLUGIN_SECTIONS else 'default'
+    executor = _section_executors.get(kind)
+    if executor is None:
+        executor = _section_executors[kind] = ThreadedExecutor(worker_count=8, maxsize=8)
+    return executor
+
+
+def clear_group_meta_after(func):
+    # the GroupMeta cache of a worker thread is never cleared otherwise, and
+    # would be read by the next request running there
+    def wrapped(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            GroupMeta.objects.clear_local_cache()
+    return wrapped
 
 
 @scenario('RetrieveAggregate')
@@ -108,6 +161,9 @@ class GroupDetailsEndpoint(GroupEndpoint, EnvironmentMixin):
 
     def _get_actions(self, request, group):
         project = group.project
+        # plugins read GroupMeta from a cache which is local to the thread
+        # running this section
+        GroupMeta.objects.populate_cache([group])
 
         action_list = []
         for plugin in plugins.for_project(project, version=1):
@@ -130,6 +186,7 @@ class GroupDetailsEndpoint(GroupEndpoint, EnvironmentMixin):
 
     def _get_available_issue_plugins(self, request, group):
         project = group.project
+        GroupMeta.objects.populate_cache([group])
 
         plugin_issues = []
         for plugin in plugins.for_project(project, version=1):
@@ -160,6 +217,113 @@ class GroupDetailsEndpoint(GroupEndpoint, EnvironmentMixin):
             return {'version': version}
         return serialize(release, request.user)
 
+    def _get_releases(self, request, group):
+        first_release = group.get_first_release()
+
+        if first_release is not None:
+            last_release = group.get_last_release()
+        else:
+            last_release = None
+
+        if first_release:
+            first_release = self._get_release_info(request, group, first_release)
+        if last_release:
+            last_release = self._get_release_info(request, group, last_release)
+        return (first_release, last_release)
+
+    def _get_participants(self, request, group):
+        participants = list(
+            User.objects.filter(
+                groupsubscription__is_active=True,
+                groupsubscription__group=group,
+            )
+        )
+        return serialize(participants, request.user)
+
+    def _get_tags(self, request, group, environment_id):
+        tags = tagstore.get_group_tag_keys(
+            group.project_id, group.id, environment_id, limit=100)
+        return sorted(serialize(tags, request.user), key=lambda x: x['name'])
+
+    def _get_user_report_count(self, group, environment_id):
+        if environment_id is None:
+            user_reports = UserReport.objects.filter(group=group)
+        else:
+            user_reports = UserReport.objects.filter(group=group, environment_id=environment_id)
+        return user_reports.count()
+
+    def _get_stats(self, group, get_range, period, rollup):
+        now = timezone.now()
+        return tsdb.rollup(
+            get_range(
+                model=tsdb.models.group,
+                keys=[group.id],
+                end=now,
+                start=now - period,
+            ), rollup
+        )[group.id]
+
+    def _submit_sections(self, sections):
+        """
+        Start computing the independent sections of the response, on a
+        thread pool if enabled. Returns the futures of all sections along
+        with the time by which each of them has to be done.
+        """
+        concurrent = options.get('api.group-details.concurrent-sections')
+        now = time()
+        timeout = options.get('api.group-details.section-timeout')
+        plugin_timeout = options.get('api.group-details.plugin-section-timeout')
+
+        futures = {}
+        deadlines = {}
+        for name, section in six.iteritems(sections):
+            deadlines[name] = now + (plugin_timeout if name in PLUGIN_SECTIONS else timeout)
+
+            future = None
+            if concurrent:
+                future = get_section_executor(name).submit(
+                    close_connections_after(clear_group_meta_after(section)),
+                    block=False,
+                )
+                if future.done() and isinstance(future.exception(), Full):
+                    metrics.incr('api.group-details.section.inline', tags={'section': name})
+                    future = None
+            if future is None:
+                future = SynchronousExecutor().submit(section)
+            futures[name] = future
+        return futures, deadlines
+
+    def _collect_sections(self, group, futures, deadlines):
+        """
+        Wait for the results of all sections. A section which is not done by
+        its deadline is returned empty instead of holding up the response.
+        The duration of every section is recorded.
+        """
+        results = {}
+        for name, future in six.iteritems(futures):
+            try:
+                results[name] = future.result(timeout=max(deadlines[name] - time(), 0))
+            except (CancelledError, TimeoutError):
+                future.cancel()
+                logger.warning(
+                    'group-details.section.timeout',
+                    extra={
+                        'group_id': group.id,
+                        'section': name,
+                    }
+                )
+                metrics.incr('api.group-details.section.timeout', tags={'section': name})
+                results[name] = SECTION_DEFAULTS[name]
+                continue
+
+            started, finished = future.get_timing()
+            metrics.timing(
+                'api.group-details.section',
+                finished - started,
+                tags={'section': name},
+            )
+        return results
+
     @attach_scenarios([retrieve_aggregate_scenario])
     def get(self, request, group):
         """
@@ -173,92 +337,69 @@ class GroupDetailsEndpoint(GroupEndpoint, EnvironmentMixin):
         :pparam string issue_id: the ID of the issue to retrieve.
         :auth: required
         """
-        # TODO(dcramer): handle unauthenticated/public response
-        data = serialize(
-            group,
-            request.user,
-            GroupSerializer(
-                environment_func=self._get_environment_func(
-                    request, group.project.organization_id)
-            )
-        )
-
-        # TODO: these probably should be another endpoint
-        activity = self._get_activity(request, group, num=100)
-        seen_by = self._get_seen_by(request, group)
-
-        first_release = group.get_first_release()
-
-        if first_release is not None:
-            last_release = group.get_last_release()
-        else:
-            last_release = None
-
-        action_list = self._get_actions(request, group)
-
-        if first_release:
-            first_release = self._get_release_info(request, group, first_release)
-        if last_release:
-            last_release = self._get_release_info(request, group, last_release)
-
         try:
             environment_id = self._get_environment_id_from_request(
                 request, group.project.organization_id)
         except Environment.DoesNotExist:
             get_range = lambda model, keys, start, end, **kwargs: \
                 {k: tsdb.make_series(0, start, end) for k in keys}
-            tags = []
-            user_reports = UserReport.objects.none()
-
+            get_tags = lambda: []
+            get_user_report_count = lambda: 0
         else:
             get_range = functools.partial(tsdb.get_range, environment_id=environment_id)
-            tags = tagstore.get_group_tag_keys(
-                group.project_id, group.id, environment_id, limit=100)
-            if environment_id is None:
-                user_reports = UserReport.objects.filter(group=group)
-            else:
-                user_reports = UserReport.objects.filter(group=group, environment_id=environment_id)
+            get_tags = functools.partial(self._get_tags, request, group, environment_id)
+            get_user_report_count = functools.partial(
+                self._get_user_report_count, group, environment_id)
 
-        now = timezone.now()
-        hourly_stats = tsdb.rollup(
-            get_range(
-                model=tsdb.models.group,
-                keys=[group.id],
-                end=now,
-                start=now - timedelta(days=1),
-            ), 3600
-        )[group.id]
-        daily_stats = tsdb.rollup(
-            get_range(
-                model=tsdb.models.group,
-                keys=[group.id],
-                end=now,
-                start=now - timedelta(days=30),
-            ), 3600 * 24
-        )[group.id]
+        # TODO: these probably should be another endpoint
+        futures, deadlines = self._submit_sections(
+            {
+                'activity': lambda: serialize(
+                    self._get_activity(request, group, num=100), request.user),
+                'seenBy': functools.partial(self._get_seen_by, request, group),
+                'releases': functools.partial(self._get_releases, request, group),
+                'participants': functools.partial(self._get_participants, request, group),
+                'pluginActions': functools.partial(self._get_actions, request, group),
+                'pluginIssues': functools.partial(
+                    self._get_available_issue_plugins, request, group),
+                'pluginContexts': functools.partial(self._get_context_plugins, request, group),
+                'tags': get_tags,
+                'userReportCount': get_user_report_count,
+                'stats24h': functools.partial(
+                    self._get_stats, group, get_range, timedelta(days=1), 3600),
+                'stats30d': functools.partial(
+                    self._get_stats, group, get_range, timedelta(days=30), 3600 * 24),
+            }
+        )
 
-        participants = list(
-            User.objects.filter(
-                groupsubscription__is_active=True,
-                groupsubscription__group=group,
+        # TODO(dcramer): handle unauthenticated/public response
+        data = serialize(
+            group,
+            request.user,
+            GroupSerializer(
+                environment_func=self._get_environment_func(
+                    request, group.project.organization_id)
             )
         )
 
+        sections = self._collect_sections(group, futures, deadlines)
+        first_release, last_release = sections['releases']
+
         data.update(
             {
                 'firstRelease': first_release,
                 'lastRelease': last_release,
-                'activity': serialize(activity, request.user),
-                'seenBy': seen_by,
-                'participants': serialize(participants, request.user),
-                'pluginActions': action_list,
-                'pluginIssues': self._get_available_issue_plugins(request, group),
-                'pluginContexts': self._get_context_plugins(request, group),
-                'userReportCount': user_reports.count(),
-                'tags': sorted(serialize(tags, request.user), key=lambda x: x['name']),
+                'activity': sections['activity'],
+                'seenBy': sections['seenBy'],
+                'participants': sections['participants'],
+                'pluginActions': sections['pluginActions'],
+                'pluginIssues': sections['pluginIssues'],
+                'pluginContexts': sections['pluginContexts'],
+                'userReportCount': sections['userReportCount'],
+                'tags': sections['tags'],
                 'stats': {
-                    '24h': hourly_stats,
-                    '30d': daily_stats,
+                    '24h': sections['stats24h'],
+                    '30d': sections['stats30d'],
                 }
             }
         )
@@ -46,6 +46,7 @@ class GroupEventsEndpoint(GroupEndpoint, EnvironmentMixin):
                 order_by='-datetime',
                 on_results=lambda x: serialize(x, request.user),
                 paginator_cls=DateTimePaginator,
+                stream=True,
             )
 
         events = Event.objects.filter(group_id=group.id)
@@ -8,6 +8,7 @@ from sentry.api.bases.organization import OrganizationEndpoint
 from sentry.api.exceptions import ResourceDoesNotExist
 from sentry.models import Environment, Project, Team
 from sentry.utils.apidocs import attach_scenarios, scenario
+from sentry.tsdb import cache as tsdb_cache
 
 
 @scenario('RetrieveEventCountsOrganization')
@@ -111,7 +112,7 @@ class OrganizationStatsEndpoint(OrganizationEndpoint, EnvironmentMixin, StatsMix
         if stat_model is None:
             raise ValueError('Invalid group: %s, stat: %s' % (group, stat))
 
-        data = tsdb.get_range(model=stat_model, keys=keys,
+        data = tsdb_cache.get_range(model=stat_model, keys=keys,
                               **self._parse_args(request, **query_kwargs))
 
         if group == 'organization':
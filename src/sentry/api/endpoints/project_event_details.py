@@ -8,6 +8,7 @@ from sentry.api.base import DocSection
 from sentry.api.bases.project import ProjectEndpoint
 from sentry.api.serializers import serialize
 from sentry.models import Event
+from sentry.utils.events import hydrate_events
 from sentry.utils.apidocs import scenario, attach_scenarios
 
 
@@ -47,7 +48,8 @@ class ProjectEventDetailsEndpoint(ProjectEndpoint):
         except Event.DoesNotExist:
             return Response({'detail': 'Event not found'}, status=404)
 
-        Event.objects.bind_nodes([event], 'data')
+        event.project = project
+        hydrate_events([event])
 
         # HACK(dcramer): work around lack of unique sorting on datetime
         base_qs = Event.objects.filter(
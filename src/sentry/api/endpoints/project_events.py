@@ -62,4 +62,5 @@ class ProjectEventsEndpoint(ProjectEndpoint):
             order_by='-datetime',
             on_results=lambda x: serialize(x, request.user),
             paginator_cls=DateTimePaginator,
+            stream=True,
         )
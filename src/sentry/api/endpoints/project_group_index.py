@@ -6,7 +6,7 @@ import logging
 from uuid import uuid4
 
 import six
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connection, transaction
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.response import Response
@@ -20,19 +20,20 @@ from sentry.api.serializers.models.actor import ActorSerializer
 from sentry.api.serializers.models.group import (
     SUBSCRIPTION_REASON_MAP, StreamGroupSerializer)
 from sentry.constants import DEFAULT_SORT_OPTION
-from sentry.db.models.query import create_or_update
 from sentry.models import (
-    Activity, Environment, Group, GroupAssignee, GroupBookmark, GroupHash, GroupResolution,
-    GroupSeen, GroupShare, GroupSnooze, GroupStatus, GroupSubscription, GroupSubscriptionReason,
-    GroupTombstone, Release, TOMBSTONE_FIELDS_FROM_GROUP, UserOption, User, Team
+    Activity, Environment, FeatureAdoption, Group, GroupAssignee, GroupBookmark, GroupHash,
+    GroupResolution, GroupSeen, GroupShare, GroupSnooze, GroupStatus, GroupSubscription,
+    GroupSubscriptionReason, GroupTombstone, Release, TOMBSTONE_FIELDS_FROM_GROUP, UserOption,
+    User, Team
 )
 from sentry.models.event import Event
 from sentry.models.group import looks_like_short_id
 from sentry.receivers import DEFAULT_SAVED_SEARCHES
+from sentry.search import cache as search_cache
 from sentry.search.utils import InvalidQuery, parse_query
 from sentry.signals import advanced_search, issue_resolved_in_release
 from sentry.tasks.deletion import delete_group
-from sentry.tasks.merge import merge_group
+from sentry.tasks.merge import merge_groups
 from sentry.utils.apidocs import attach_scenarios, scenario
 from sentry.utils.cursors import Cursor, CursorResult
 from sentry.utils.functional import extract_lazy_object
@@ -43,6 +44,42 @@ ERR_INVALID_STATS_PERIOD = "Invalid stats_period. Valid choices are '', '24h', a
 SAVED_SEARCH_QUERIES = set([s['query'] for s in DEFAULT_SAVED_SEARCHES])
 
 
+def bulk_create_or_update(model, group_list, values, **kwargs):
+    """
+    Set ``values`` on the rows of ``model`` matching ``kwargs`` for each of
+    the given groups, updating the existing rows with a single query and
+    inserting the missing ones in bulk.
+    """
+    group_ids = [g.id for g in group_list]
+
+    # 5 retries for race conditions where
+    # concurrent requests cause integrity errors
+    for i in range(4, -1, -1):  # 4 3 2 1 0
+        existing = set(model.objects.filter(
+            group__in=group_ids,
+            **kwargs
+        ).values_list('group_id', flat=True))
+
+        try:
+            with transaction.atomic():
+                if existing and values:
+                    model.objects.filter(
+                        group__in=existing,
+                        **kwargs
+                    ).update(**values)
+                model.objects.bulk_create([
+                    model(
+                        group=group,
+                        project_id=group.project_id,
+                        **dict(kwargs, **values)
+                    ) for group in group_list if group.id not in existing
+                ])
+                return
+        except IntegrityError as e:
+            if i == 0:
+                raise e
+
+
 @scenario('BulkUpdateIssues')
 def bulk_update_issues_scenario(runner):
     project = runner.default_project
@@ -242,19 +279,32 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
             result = search.query(**query_kwargs)
         return result, query_kwargs
 
-    def _subscribe_and_assign_issue(self, acting_user, group, result):
+    def _subscribe_and_assign_issues(self, acting_user, group_list, result):
         if acting_user:
-            GroupSubscription.objects.subscribe(
-                user=acting_user,
-                group=group,
+            GroupSubscription.objects.bulk_subscribe_groups(
+                group_list,
+                [acting_user.id],
                 reason=GroupSubscriptionReason.status_change,
             )
             self_assign_issue = UserOption.objects.get_value(
                 user=acting_user, key='self_assign_issue', default='0'
             )
-            if self_assign_issue == '1' and not group.assignee_set.exists():
+            if self_assign_issue == '1' and GroupAssignee.objects.filter(
+                group__in=group_list,
+            ).count() < len(group_list):
                 result['assignedTo'] = Actor(type=User, id=extract_lazy_object(acting_user).id)
 
+    def _create_activities(self, activities, is_bulk):
+        # TODO(dcramer): we need a solution for activity rollups
+        # before sending notifications on bulk changes
+        if is_bulk:
+            Activity.objects.bulk_create(activities)
+            return
+
+        for activity in activities:
+            activity.save()
+            activity.send_notification()
+
     # statsPeriod=24h
     @attach_scenarios([list_project_issues_scenario])
     def get(self, request, project):
@@ -347,7 +397,10 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
                 return response
 
         try:
-            cursor_result, query_kwargs = self._search(request, project, {'count_hits': True})
+            cursor_result, query_kwargs = self._search(request, project, {
+                'count_hits': True,
+                'use_cache': True,
+            })
         except ValidationError as exc:
             return Response({'detail': six.text_type(exc)}, status=400)
 
@@ -424,8 +477,8 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
         """
         group_ids = request.GET.getlist('id')
         if group_ids:
-            group_list = Group.objects.filter(
-                project=project, id__in=group_ids)
+            group_list = list(Group.objects.filter(
+                project=project, id__in=group_ids))
             # filter down group ids to only valid matches
             group_ids = [g.id for g in group_list]
             if not group_ids:
@@ -472,29 +525,7 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
                 return Response({'detail': ['You do not have that feature enabled']}, status=400)
 
             group_list = list(queryset)
-            groups_to_delete = []
-
-            for group in group_list:
-                with transaction.atomic():
-                    try:
-                        tombstone = GroupTombstone.objects.create(
-                            previous_group_id=group.id,
-                            actor_id=acting_user.id if acting_user else None,
-                            **{name: getattr(group, name) for name in TOMBSTONE_FIELDS_FROM_GROUP}
-                        )
-                    except IntegrityError:
-                        # in this case, a tombstone has already been created
-                        # for a group, so no hash updates are necessary
-                        pass
-                    else:
-                        groups_to_delete.append(group)
-
-                        GroupHash.objects.filter(
-                            group=group,
-                        ).update(
-                            group=None,
-                            group_tombstone_id=tombstone.id,
-                        )
+            groups_to_delete = self._create_tombstones(group_list, acting_user)
 
             self._delete_groups(request, project, groups_to_delete)
 
@@ -542,57 +573,50 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
 
             now = timezone.now()
 
-            for group in group_list:
-                with transaction.atomic():
-                    if release:
-                        resolution_params = {
-                            'release': release,
-                            'type': res_type,
-                            'status': res_status,
-                            'actor_id': request.user.id
-                            if request.user.is_authenticated() else None,
-                        }
-                        resolution, created = GroupResolution.objects.get_or_create(
-                            group=group,
-                            defaults=resolution_params,
-                        )
-                        if not created:
-                            resolution.update(
-                                datetime=timezone.now(), **resolution_params)
-                    else:
-                        resolution = None
+            with transaction.atomic():
+                if release:
+                    # maps the ids of the groups which were not resolved in
+                    # a release before to their new resolution
+                    resolutions = self._create_resolutions(group_list, {
+                        'release': release,
+                        'type': res_type,
+                        'status': res_status,
+                        'actor_id': request.user.id
+                        if request.user.is_authenticated() else None,
+                        'datetime': now,
+                    })
+                else:
+                    resolutions = None
 
-                    affected = Group.objects.filter(
-                        id=group.id,
-                    ).update(
-                        status=GroupStatus.RESOLVED,
-                        resolved_at=now,
-                    )
-                    if not resolution:
-                        created = affected
+                Group.objects.filter(
+                    id__in=group_ids,
+                ).update(
+                    status=GroupStatus.RESOLVED,
+                    resolved_at=now,
+                )
 
+                for group in group_list:
                     group.status = GroupStatus.RESOLVED
                     group.resolved_at = now
 
-                    self._subscribe_and_assign_issue(
-                        acting_user, group, result)
-
-                    if created:
-                        activity = Activity.objects.create(
-                            project=group.project,
-                            group=group,
-                            type=activity_type,
-                            user=acting_user,
-                            ident=resolution.id if resolution else None,
-                            data=activity_data,
-                        )
-                        # TODO(dcramer): we need a solution for activity rollups
-                        # before sending notifications on bulk changes
-                        if not is_bulk:
-                            activity.send_notification()
+                self._subscribe_and_assign_issues(
+                    acting_user, group_list, result)
+
+                self._create_activities([
+                    Activity(
+                        project=project,
+                        group=group,
+                        type=activity_type,
+                        user=acting_user,
+                        ident=resolutions[group.id] if resolutions else None,
+                        data=activity_data,
+                    ) for group in group_list
+                    if resolutions is None or group.id in resolutions
+                ], is_bulk)
 
+            if group_list:
                 issue_resolved_in_release.send(
-                    group=group,
+                    group=group_list[0],
                     project=project,
                     sender=acting_user,
                 )
@@ -636,31 +660,30 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
                             )
                         else:
                             ignore_until = None
+                        snoozes = []
                         for group in group_list:
                             state = {}
                             if ignore_count and not ignore_window:
                                 state['times_seen'] = group.times_seen
                             if ignore_user_count and not ignore_user_window:
                                 state['users_seen'] = group.count_users_seen()
-                            GroupSnooze.objects.create_or_update(
+                            snoozes.append(GroupSnooze(
                                 group=group,
-                                values={
-                                    'until':
-                                    ignore_until,
-                                    'count':
-                                    ignore_count,
-                                    'window':
-                                    ignore_window,
-                                    'user_count':
-                                    ignore_user_count,
-                                    'user_window':
-                                    ignore_user_window,
-                                    'state':
-                                    state,
-                                    'actor_id':
-                                    request.user.id if request.user.is_authenticated() else None,
-                                }
-                            )
+                                until=ignore_until,
+                                count=ignore_count,
+                                window=ignore_window,
+                                user_count=ignore_user_count,
+                                user_window=ignore_user_window,
+                                state=state,
+                                actor_id=request.user.id if request.user.is_authenticated() else None,
+                            ))
+                        # replace existing snoozes instead of updating them
+                        # one at a time
+                        GroupSnooze.objects.filter(
+                            group__in=group_ids,
+                        ).delete()
+                        GroupSnooze.objects.bulk_create(snoozes)
+                        if group_list:
                             result['statusDetails'] = {
                                 'ignoreCount': ignore_count,
                                 'ignoreUntil': ignore_until,
@@ -696,48 +719,38 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
                 for group in group_list:
                     group.status = new_status
 
-                    activity = Activity.objects.create(
-                        project=group.project,
+                if not is_bulk and acting_user:
+                    GroupSubscription.objects.subscribe(
+                        user=acting_user,
+                        group=group_list[0],
+                        reason=GroupSubscriptionReason.status_change,
+                    )
+
+                self._create_activities([
+                    Activity(
+                        project=project,
                         group=group,
                         type=activity_type,
                         user=acting_user,
                         data=activity_data,
-                    )
-                    # TODO(dcramer): we need a solution for activity rollups
-                    # before sending notifications on bulk changes
-                    if not is_bulk:
-                        if acting_user:
-                            GroupSubscription.objects.subscribe(
-                                user=acting_user,
-                                group=group,
-                                reason=GroupSubscriptionReason.status_change,
-                            )
-                        activity.send_notification()
+                    ) for group in group_list
+                ], is_bulk)
 
         if 'assignedTo' in result:
             assigned_actor = result['assignedTo']
             if assigned_actor:
-                for group in group_list:
-                    resolved_actor = assigned_actor.resolve()
+                resolved_actor = assigned_actor.resolve()
 
-                    GroupAssignee.objects.assign(group, resolved_actor, acting_user)
+                GroupAssignee.objects.bulk_assign(group_list, resolved_actor, acting_user)
                 result['assignedTo'] = serialize(
-                    assigned_actor.resolve(), acting_user, ActorSerializer())
+                    resolved_actor, acting_user, ActorSerializer())
             else:
-                for group in group_list:
-                    GroupAssignee.objects.deassign(group, acting_user)
+                GroupAssignee.objects.bulk_deassign(group_list, acting_user)
 
         if result.get('hasSeen') and project.member_set.filter(user=acting_user).exists():
-            for group in group_list:
-                instance, created = create_or_update(
-                    GroupSeen,
-                    group=group,
-                    user=acting_user,
-                    project=group.project,
-                    values={
-                        'last_seen': timezone.now(),
-                    }
-                )
+            bulk_create_or_update(GroupSeen, group_list, {
+                'last_seen': timezone.now(),
+            }, user=acting_user)
         elif result.get('hasSeen') is False:
             GroupSeen.objects.filter(
                 group__in=group_ids,
@@ -745,45 +758,30 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
             ).delete()
 
         if result.get('isBookmarked'):
-            for group in group_list:
-                GroupBookmark.objects.get_or_create(
-                    project=project,
-                    group=group,
-                    user=acting_user,
-                )
-                GroupSubscription.objects.subscribe(
-                    user=acting_user,
-                    group=group,
-                    reason=GroupSubscriptionReason.bookmark,
-                )
+            bulk_create_or_update(GroupBookmark, group_list, {}, user=acting_user)
+            GroupSubscription.objects.bulk_subscribe_groups(
+                group_list,
+                [acting_user.id],
+                reason=GroupSubscriptionReason.bookmark,
+            )
         elif result.get('isBookmarked') is False:
             GroupBookmark.objects.filter(
                 group__in=group_ids,
                 user=acting_user,
             ).delete()
 
-        # TODO(dcramer): we could make these more efficient by first
-        # querying for rich rows are present (if N > 2), flipping the flag
-        # on those rows, and then creating the missing rows
         if result.get('isSubscribed') in (True, False):
-            is_subscribed = result['isSubscribed']
-            for group in group_list:
-                # NOTE: Subscribing without an initiating event (assignment,
-                # commenting, etc.) clears out the previous subscription reason
-                # to avoid showing confusing messaging as a result of this
-                # action. It'd be jarring to go directly from "you are not
-                # subscribed" to "you were subscribed due since you were
-                # assigned" just by clicking the "subscribe" button (and you
-                # may no longer be assigned to the issue anyway.)
-                GroupSubscription.objects.create_or_update(
-                    user=acting_user,
-                    group=group,
-                    project=project,
-                    values={
-                        'is_active': is_subscribed,
-                        'reason': GroupSubscriptionReason.unknown,
-                    },
-                )
+            # NOTE: Subscribing without an initiating event (assignment,
+            # commenting, etc.) clears out the previous subscription reason
+            # to avoid showing confusing messaging as a result of this
+            # action. It'd be jarring to go directly from "you are not
+            # subscribed" to "you were subscribed due since you were
+            # assigned" just by clicking the "subscribe" button (and you
+            # may no longer be assigned to the issue anyway.)
+            bulk_create_or_update(GroupSubscription, group_list, {
+                'is_active': result['isSubscribed'],
+                'reason': GroupSubscriptionReason.unknown,
+            }, user=acting_user)
 
             result['subscriptionDetails'] = {
                 'reason': SUBSCRIPTION_REASON_MAP.get(
@@ -832,12 +830,17 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
                 if group == primary_group:
                     continue
                 children.append(group)
-                group.update(status=GroupStatus.PENDING_MERGE)
-                merge_group.delay(
-                    from_object_id=group.id,
-                    to_object_id=primary_group.id,
-                    transaction_id=transaction_id,
-                )
+                group.status = GroupStatus.PENDING_MERGE
+
+            Group.objects.filter(
+                id__in=[c.id for c in children],
+            ).update(status=GroupStatus.PENDING_MERGE)
+
+            merge_groups.delay(
+                from_object_ids=[c.id for c in children],
+                to_object_id=primary_group.id,
+                transaction_id=transaction_id,
+            )
 
             Activity.objects.create(
                 project=primary_group.project,
@@ -856,8 +859,103 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
                 'children': [six.text_type(g.id) for g in children],
             }
 
+        search_cache.invalidate(project.id)
+
         return Response(result)
 
+    def _create_resolutions(self, group_list, resolution_params):
+        """
+        Resolve the groups with the given release, returning a mapping of
+        the ids of the groups which had no resolution yet to the id of the
+        one that was created for them.
+        """
+        group_ids = [g.id for g in group_list]
+
+        # 5 retries for race conditions where
+        # concurrent requests cause integrity errors
+        for i in range(4, -1, -1):  # 4 3 2 1 0
+            existing = set(GroupResolution.objects.filter(
+                group__in=group_ids,
+            ).values_list('group_id', flat=True))
+            created = [g.id for g in group_list if g.id not in existing]
+
+            try:
+                with transaction.atomic():
+                    if existing:
+                        GroupResolution.objects.filter(
+                            group__in=existing,
+                        ).update(**resolution_params)
+                    GroupResolution.objects.bulk_create([
+                        GroupResolution(group_id=group_id, **resolution_params)
+                        for group_id in created
+                    ])
+                    break
+            except IntegrityError as e:
+                if i == 0:
+                    raise e
+
+        return dict(GroupResolution.objects.filter(
+            group__in=created,
+        ).values_list('group_id', 'id'))
+
+    def _create_tombstones(self, group_list, acting_user):
+        """
+        Create tombstones for the given groups and move their hashes over to
+        them, returning the groups which can be deleted.
+        """
+        group_ids = [g.id for g in group_list]
+
+        for i in range(4, -1, -1):  # 4 3 2 1 0
+            # a tombstone which was already created for a group means that
+            # its hashes were moved already
+            existing = set(GroupTombstone.objects.filter(
+                previous_group_id__in=group_ids,
+            ).values_list('previous_group_id', flat=True))
+            groups_to_delete = [g for g in group_list if g.id not in existing]
+
+            try:
+                with transaction.atomic():
+                    GroupTombstone.objects.bulk_create([
+                        GroupTombstone(
+                            previous_group_id=group.id,
+                            actor_id=acting_user.id if acting_user else None,
+                            **{name: getattr(group, name) for name in TOMBSTONE_FIELDS_FROM_GROUP}
+                        ) for group in groups_to_delete
+                    ])
+
+                    if groups_to_delete:
+                        self._move_hashes_to_tombstones([g.id for g in groups_to_delete])
+            except IntegrityError as e:
+                if i == 0:
+                    raise e
+            else:
+                break
+
+        # tombstones created with ``bulk_create`` don't send ``post_save``
+        if groups_to_delete:
+            FeatureAdoption.objects.record(
+                organization_id=groups_to_delete[0].project.organization_id,
+                feature_slug='delete_and_discard',
+            )
+        return groups_to_delete
+
+    def _move_hashes_to_tombstones(self, group_ids):
+        # The tombstone is set before the group, as MySQL evaluates the
+        # assignments of an UPDATE in order.
+        cursor = connection.cursor()
+        cursor.execute(
+            """
+            UPDATE sentry_grouphash
+            SET group_tombstone_id = (
+                    SELECT id FROM sentry_grouptombstone
+                    WHERE previous_group_id = sentry_grouphash.group_id
+                ),
+                group_id = NULL
+            WHERE group_id IN (%s)
+            """ % ', '.join(['%s'] * len(group_ids)),
+            list(group_ids),
+        )
+
     @attach_scenarios([bulk_remove_issues_scenario])
     def delete(self, request, project):
         """
@@ -925,6 +1023,7 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
             GroupStatus.DELETION_IN_PROGRESS,
         ]).update(status=GroupStatus.PENDING_DELETION)
         GroupHash.objects.filter(group__id__in=group_ids).delete()
+        search_cache.invalidate(project.id)
 
         transaction_id = uuid4().hex
 
@@ -10,6 +10,7 @@ from sentry.api.base import StatsMixin
 from sentry.api.bases.project import ProjectEndpoint
 from sentry.api.exceptions import ResourceDoesNotExist
 from sentry.models import ProjectKey
+from sentry.tsdb import cache as tsdb_cache
 
 
 class ProjectKeyStatsEndpoint(ProjectEndpoint, StatsMixin):
@@ -31,7 +32,7 @@ class ProjectKeyStatsEndpoint(ProjectEndpoint, StatsMixin):
              'total'), (tsdb.models.key_total_blacklisted, 'filtered'),
             (tsdb.models.key_total_rejected, 'dropped'),
         ):
-            result = tsdb.get_range(model=model, keys=[key.id], **stat_args)[key.id]
+            result = tsdb_cache.get_range(model=model, keys=[key.id], **stat_args)[key.id]
             for ts, count in result:
                 stats.setdefault(int(ts), {})[name] = count
 
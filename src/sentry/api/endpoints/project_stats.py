@@ -9,6 +9,7 @@ from sentry.api.exceptions import ResourceDoesNotExist
 from sentry.models import Environment
 from sentry.utils.data_filters import FILTER_STAT_KEYS_TO_VALUES
 from sentry.utils.apidocs import scenario, attach_scenarios
+from sentry.tsdb import cache as tsdb_cache
 
 
 @scenario('RetrieveEventCountsProjcet')
@@ -78,7 +79,7 @@ class ProjectStatsEndpoint(ProjectEndpoint, EnvironmentMixin, StatsMixin):
             except KeyError:
                 raise ValueError('Invalid stat: %s' % stat)
 
-        data = tsdb.get_range(
+        data = tsdb_cache.get_range(
             model=stat_model, keys=[project.id], **self._parse_args(request, **query_kwargs)
         )[project.id]
 
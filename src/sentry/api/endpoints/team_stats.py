@@ -9,6 +9,7 @@ from sentry.api.bases.team import TeamEndpoint
 from sentry.api.exceptions import ResourceDoesNotExist
 from sentry.models import Environment, Project
 from sentry.utils.apidocs import scenario, attach_scenarios
+from sentry.tsdb import cache as tsdb_cache
 
 
 @scenario('RetrieveEventCountsTeam')
@@ -68,7 +69,7 @@ class TeamStatsEndpoint(TeamEndpoint, EnvironmentMixin, StatsMixin):
             return Response([])
 
         data = list(
-            tsdb.get_range(
+            tsdb_cache.get_range(
                 model=tsdb.models.project,
                 keys=[p.id for p in projects],
                 **self._parse_args(request, environment_id)
@@ -12,11 +12,16 @@ import functools
 import math
 
 from datetime import datetime
+from django.core.cache import cache
 from django.db import connections
 from django.db.models.sql.datastructures import EmptyResultSet
 from django.utils import timezone
 
+from sentry import options
+from sentry.utils import json
 from sentry.utils.cursors import build_cursor, Cursor, CursorResult
+from sentry.utils.db import is_postgres
+from sentry.utils.hashlib import md5_text
 
 quote_name = connections['default'].ops.quote_name
 
@@ -24,9 +29,96 @@ quote_name = connections['default'].ops.quote_name
 MAX_LIMIT = 100
 MAX_HITS_LIMIT = 1000
 
+HITS_EXACT = 'exact'
+HITS_ESTIMATE = 'estimate'
+HITS_CACHED = 'cached'
+
+
+def _build_hits_query(queryset, max_hits=None):
+    """
+    Returns the SQL and params selecting the ids of at most ``max_hits`` rows
+    of the queryset, or ``None`` if the queryset can't match anything.
+    """
+    hits_query = queryset.values().query
+    if max_hits:
+        hits_query.set_limits(high=max_hits)
+    # clear out any select fields (include select_related) and pull just the id
+    hits_query.clear_select_clause()
+    hits_query.add_fields(['id'])
+    hits_query.clear_ordering(force_empty=True)
+    try:
+        return hits_query.sql_with_params()
+    except EmptyResultSet:
+        return None
+
+
+def count_hits_exact(queryset, max_hits):
+    query = _build_hits_query(queryset, max_hits)
+    if query is None:
+        return 0, HITS_EXACT
+    h_sql, h_params = query
+    cursor = connections[queryset.db].cursor()
+    cursor.execute(u'SELECT COUNT(*) FROM ({}) as t'.format(
+        h_sql,
+    ), h_params)
+    return cursor.fetchone()[0], HITS_EXACT
+
+
+def count_hits_estimate(queryset, max_hits):
+    """
+    Use the row estimate of the query planner when it expects at least
+    ``max_hits`` rows, so large result sets are reported as "``max_hits``+"
+    without counting them. Smaller results, which are cheap to count, and
+    databases other than Postgres fall back to an exact count.
+    """
+    if not is_postgres(queryset.db):
+        return count_hits_exact(queryset, max_hits)
+
+    query = _build_hits_query(queryset)
+    if query is None:
+        return 0, HITS_EXACT
+    h_sql, h_params = query
+    cursor = connections[queryset.db].cursor()
+    cursor.execute(u'EXPLAIN (FORMAT JSON) {}'.format(h_sql), h_params)
+    plan = cursor.fetchone()[0]
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    if plan[0]['Plan']['Plan Rows'] >= max_hits:
+        return max_hits, HITS_ESTIMATE
+    return count_hits_exact(queryset, max_hits)
+
+
+def count_hits_cached(queryset, max_hits):
+    """
+    Count the hits exactly and cache the count for a short time. The cache
+    is keyed by the normalized hits query, so requests which only differ in
+    their ordering or the page they ask for share a count.
+    """
+    query = _build_hits_query(queryset, max_hits)
+    if query is None:
+        return 0, HITS_EXACT
+    h_sql, h_params = query
+    cache_key = 'api.hits:{}'.format(
+        md5_text(queryset.db, h_sql, repr(h_params)).hexdigest(),
+    )
+    hits = cache.get(cache_key)
+    if hits is not None:
+        return hits, HITS_CACHED
+
+    hits, mode = count_hits_exact(queryset, max_hits)
+    cache.set(cache_key, hits, options.get('api.paginator.hits-cache-ttl'))
+    return hits, mode
+
+
+HIT_COUNTERS = {
+    HITS_EXACT: count_hits_exact,
+    HITS_ESTIMATE: count_hits_estimate,
+    HITS_CACHED: count_hits_cached,
+}
+
 
 class BasePaginator(object):
-    def __init__(self, queryset, order_by=None, max_limit=MAX_LIMIT):
+    def __init__(self, queryset, order_by=None, max_limit=MAX_LIMIT, hits_mode=None):
         if order_by:
             if order_by.startswith('-'):
                 self.key, self.desc = order_by[1:], True
@@ -37,6 +129,7 @@ class BasePaginator(object):
             self.desc = False
         self.queryset = queryset
         self.max_limit = max_limit
+        self.hits_mode = hits_mode
 
     def _is_asc(self, is_prev):
         return (self.desc and is_prev) or not (self.desc or is_prev)
@@ -119,9 +212,9 @@ class BasePaginator(object):
         # TODO(dcramer): this does not yet work correctly for ``is_prev`` when
         # the key is not unique
         if count_hits:
-            hits = self.count_hits(MAX_HITS_LIMIT)
+            hits, hits_mode = self.get_hits(MAX_HITS_LIMIT)
         else:
-            hits = None
+            hits, hits_mode = None, None
 
         offset = cursor.offset
         # this effectively gets us the before row, and the current (after) row
@@ -142,28 +235,25 @@ class BasePaginator(object):
             limit=limit,
             hits=hits,
             max_hits=MAX_HITS_LIMIT if count_hits else None,
+            hits_mode=hits_mode,
             cursor=cursor,
             is_desc=self.desc,
             key=self.get_item_key,
         )
 
-    def count_hits(self, max_hits):
+    def get_hits(self, max_hits):
+        """
+        Returns the number of hits, up to ``max_hits``, and the mode which
+        produced it (one of ``HIT_COUNTERS``).
+        """
         if not max_hits:
-            return 0
-        hits_query = self.queryset.values()[:max_hits].query
-        # clear out any select fields (include select_related) and pull just the id
-        hits_query.clear_select_clause()
-        hits_query.add_fields(['id'])
-        hits_query.clear_ordering(force_empty=True)
-        try:
-            h_sql, h_params = hits_query.sql_with_params()
-        except EmptyResultSet:
-            return 0
-        cursor = connections[self.queryset.db].cursor()
-        cursor.execute(u'SELECT COUNT(*) FROM ({}) as t'.format(
-            h_sql,
-        ), h_params)
-        return cursor.fetchone()[0]
+            return 0, HITS_EXACT
+        hits_mode = self.hits_mode or options.get('api.paginator.hits-mode')
+        counter = HIT_COUNTERS.get(hits_mode, count_hits_exact)
+        return counter(self.queryset, max_hits)
+
+    def count_hits(self, max_hits):
+        return self.get_hits(max_hits)[0]
 
 
 class Paginator(BasePaginator):
@@ -318,4 +408,5 @@ class SequencePaginator(object):
             next=next_cursor,
             hits=min(len(self.scores), MAX_HITS_LIMIT) if count_hits else None,
             max_hits=MAX_HITS_LIMIT if count_hits else None,
+            hits_mode=HITS_EXACT if count_hits else None,
         )
@@ -7,6 +7,7 @@ from django.utils import timezone
 
 from sentry.api.serializers import Serializer, register
 from sentry.models import Event, EventError
+from sentry.utils.events import hydrate_events
 
 
 @register(Event)
@@ -38,7 +39,7 @@ class EventSerializer(Serializer):
         return [i[1] for i in interface_list]
 
     def get_attrs(self, item_list, user, is_public=False):
-        Event.objects.bind_nodes(item_list, 'data')
+        hydrate_events(item_list, groups=False, projects=False)
 
         results = {}
         for item in item_list:
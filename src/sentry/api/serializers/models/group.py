@@ -3,13 +3,14 @@ from __future__ import absolute_import, print_function
 import itertools
 from collections import defaultdict
 from datetime import timedelta
+from functools import partial
 
 import six
 from django.core.urlresolvers import reverse
 from django.db.models import Q
 from django.utils import timezone
 
-from sentry import tagstore, tsdb
+from sentry import options, tagstore, tsdb
 from sentry.api.serializers import Serializer, register, serialize
 from sentry.api.serializers.models.actor import ActorSerializer
 from sentry.api.fields.actor import Actor
@@ -19,7 +20,9 @@ from sentry.models import (
     GroupShare, GroupStatus, GroupSubscription, GroupSubscriptionReason, User, UserOption,
     UserOptionValue
 )
-from sentry.utils.db import attach_foreignkey
+from sentry.utils import metrics
+from sentry.utils.concurrent import SynchronousExecutor, ThreadedExecutor, execute_all
+from sentry.utils.db import attach_foreignkey, close_connections_after
 from sentry.utils.http import absolute_uri
 from sentry.utils.safe import safe_execute
 
@@ -34,6 +37,15 @@ SUBSCRIPTION_REASON_MAP = {
 
 disabled = object()
 
+_lookup_executor = None
+
+
+def get_lookup_executor():
+    global _lookup_executor
+    if _lookup_executor is None:
+        _lookup_executor = ThreadedExecutor(worker_count=8)
+    return _lookup_executor
+
 
 @register(Group)
 class GroupSerializer(Serializer):
@@ -113,81 +125,106 @@ class GroupSerializer(Serializer):
 
         return results
 
-    def get_attrs(self, item_list, user):
-        from sentry.plugins import plugins
-
-        GroupMeta.objects.populate_cache(item_list)
-
-        attach_foreignkey(item_list, Group.project)
+    def _get_lookups(self, item_list, user, environment):
+        """
+        Returns a mapping of lookup names to callables for all of the
+        independent queries needed to build the attributes of ``item_list``.
+        """
+        lookups = {
+            'assignees': partial(self._get_assignees, item_list),
+            'ignore_items': partial(self._get_ignore_items, item_list),
+            'resolutions': partial(self._get_resolutions, item_list),
+            'share_ids': partial(self._get_share_ids, item_list),
+        }
 
         if user.is_authenticated() and item_list:
-            bookmarks = set(
-                GroupBookmark.objects.filter(
-                    user=user,
-                    group__in=item_list,
-                ).values_list('group_id', flat=True)
-            )
-            seen_groups = dict(
-                GroupSeen.objects.filter(
-                    user=user,
-                    group__in=item_list,
-                ).values_list('group_id', 'last_seen')
-            )
-            subscriptions = self._get_subscriptions(item_list, user)
-        else:
-            bookmarks = set()
-            seen_groups = {}
-            subscriptions = defaultdict(lambda: (False, None))
-
-        assignees = {
-            a.group_id: a.assigned_actor() for a in
-            GroupAssignee.objects.filter(
-                group__in=item_list,
-            )
-        }
-        resolved_assignees = Actor.resolve_dict(assignees)
+            lookups.update({
+                'bookmarks': partial(self._get_bookmarks, item_list, user),
+                'seen_groups': partial(self._get_seen_groups, item_list, user),
+                'subscriptions': partial(self._get_subscriptions, item_list, user),
+            })
 
-        try:
-            environment = self.environment_func()
-        except Environment.DoesNotExist:
-            user_counts = {}
-            first_seen = {}
-            last_seen = {}
-            times_seen = {}
-        else:
+        if environment is not disabled:
             project_id = item_list[0].project_id
             item_ids = [g.id for g in item_list]
-            user_counts = tagstore.get_groups_user_counts(
+            lookups['user_counts'] = partial(
+                tagstore.get_groups_user_counts,
                 project_id,
                 item_ids,
                 environment_id=environment and environment.id,
             )
-            first_seen = {}
-            last_seen = {}
-            times_seen = {}
             if environment is not None:
-                environment_tagvalues = tagstore.get_group_list_tag_value(
+                lookups['environment_tagvalues'] = partial(
+                    tagstore.get_group_list_tag_value,
                     project_id,
                     item_ids,
                     environment.id,
                     'environment',
                     environment.name,
                 )
-                for item_id, value in environment_tagvalues.items():
-                    first_seen[item_id] = value.first_seen
-                    last_seen[item_id] = value.last_seen
-                    times_seen[item_id] = value.times_seen
-            else:
-                for item in item_list:
-                    first_seen[item.id] = item.first_seen
-                    last_seen[item.id] = item.last_seen
-                    times_seen[item.id] = item.times_seen
 
-        ignore_items = {g.group_id: g for g in GroupSnooze.objects.filter(
+        return lookups
+
+    def _execute_lookups(self, lookups):
+        """
+        Executes all lookups, concurrently if enabled, and returns a mapping
+        of lookup names to their results. The duration of every lookup is
+        recorded so the slowest one can be identified.
+        """
+        if options.get('api.group-serializer.concurrent-lookups'):
+            executor = get_lookup_executor()
+            lookups = {
+                name: close_connections_after(lookup)
+                for name, lookup in six.iteritems(lookups)
+            }
+        else:
+            executor = SynchronousExecutor()
+
+        futures = execute_all(lookups, executor)
+
+        results = {}
+        for name, future in six.iteritems(futures):
+            results[name] = future.result()
+            started, finished = future.get_timing()
+            metrics.timing(
+                'serializers.group.lookup',
+                finished - started,
+                tags={'lookup': name},
+            )
+        return results
+
+    def _get_bookmarks(self, item_list, user):
+        return set(
+            GroupBookmark.objects.filter(
+                user=user,
+                group__in=item_list,
+            ).values_list('group_id', flat=True)
+        )
+
+    def _get_seen_groups(self, item_list, user):
+        return dict(
+            GroupSeen.objects.filter(
+                user=user,
+                group__in=item_list,
+            ).values_list('group_id', 'last_seen')
+        )
+
+    def _get_assignees(self, item_list):
+        assignees = {
+            a.group_id: a.assigned_actor() for a in
+            GroupAssignee.objects.filter(
+                group__in=item_list,
+            )
+        }
+        return Actor.resolve_dict(assignees)
+
+    def _get_ignore_items(self, item_list):
+        return {g.group_id: g for g in GroupSnooze.objects.filter(
             group__in=item_list,
         )}
 
-        resolutions = {
+    def _get_resolutions(self, item_list):
+        return {
             i[0]: i[1:]
             for i in GroupResolution.objects.filter(
                 group__in=item_list,
@@ -198,6 +235,57 @@ class GroupSerializer(Serializer):
                 'actor_id',
             )
         }
+
+    def _get_share_ids(self, item_list):
+        return dict(GroupShare.objects.filter(
+            group__in=item_list,
+        ).values_list('group_id', 'uuid'))
+
+    def get_attrs(self, item_list, user):
+        attach_foreignkey(item_list, Group.project)
+        # the cache is local to the thread populating it, so this can not be
+        # one of the lookups which may run on the executor
+        GroupMeta.objects.populate_cache(item_list)
+
+        try:
+            environment = self.environment_func()
+        except Environment.DoesNotExist:
+            environment = disabled
+
+        results = self._execute_lookups(
+            self._get_lookups(item_list, user, environment),
+        )
+        return self._build_attrs(item_list, user, environment, results)
+
+    def _build_attrs(self, item_list, user, environment, results):
+        from sentry.plugins import plugins
+
+        bookmarks = results.get('bookmarks', set())
+        seen_groups = results.get('seen_groups', {})
+        if 'subscriptions' in results:
+            subscriptions = results['subscriptions']
+        else:
+            subscriptions = defaultdict(lambda: (False, None))
+
+        resolved_assignees = results['assignees']
+
+        user_counts = results.get('user_counts', {})
+        first_seen = {}
+        last_seen = {}
+        times_seen = {}
+        if 'environment_tagvalues' in results:
+            for item_id, value in results['environment_tagvalues'].items():
+                first_seen[item_id] = value.first_seen
+                last_seen[item_id] = value.last_seen
+                times_seen[item_id] = value.times_seen
+        elif environment is None:
+            for item in item_list:
+                first_seen[item.id] = item.first_seen
+                last_seen[item.id] = item.last_seen
+                times_seen[item.id] = item.times_seen
+
+        ignore_items = results['ignore_items']
+        resolutions = results['resolutions']
         actor_ids = set(r[-1] for r in six.itervalues(resolutions))
         actor_ids.update(r.actor_id for r in six.itervalues(ignore_items))
         if actor_ids:
@@ -209,9 +297,7 @@ class GroupSerializer(Serializer):
         else:
             actors = {}
 
-        share_ids = dict(GroupShare.objects.filter(
-            group__in=item_list,
-        ).values_list('group_id', 'uuid'))
+        share_ids = results['share_ids']
 
         result = {}
         for item in item_list:
@@ -380,32 +466,40 @@ class StreamGroupSerializer(GroupSerializer):
         self.stats_period = stats_period
         self.matching_event_id = matching_event_id
 
-    def get_attrs(self, item_list, user):
-        attrs = super(StreamGroupSerializer, self).get_attrs(item_list, user)
+    def _get_lookups(self, item_list, user, environment):
+        lookups = super(StreamGroupSerializer, self)._get_lookups(item_list, user, environment)
 
-        if self.stats_period:
+        if self.stats_period and environment is not disabled:
             # we need to compute stats at 1d (1h resolution), and 14d
-            group_ids = [g.id for g in item_list]
-
-            segments, interval = self.STATS_PERIOD_CHOICES[self.stats_period]
-            now = timezone.now()
-            query_params = {
-                'start': now - ((segments - 1) * interval),
-                'end': now,
-                'rollup': int(interval.total_seconds()),
-            }
+            lookups['stats'] = partial(
+                tsdb.get_range,
+                model=tsdb.models.group,
+                keys=[g.id for g in item_list],
+                environment_id=environment and environment.id,
+                **self._get_stats_query_params()
+            )
+
+        return lookups
+
+    def _get_stats_query_params(self):
+        segments, interval = self.STATS_PERIOD_CHOICES[self.stats_period]
+        now = timezone.now()
+        return {
+            'start': now - ((segments - 1) * interval),
+            'end': now,
+            'rollup': int(interval.total_seconds()),
+        }
+
+    def _build_attrs(self, item_list, user, environment, results):
+        attrs = super(StreamGroupSerializer, self)._build_attrs(
+            item_list, user, environment, results)
 
-            try:
-                environment = self.environment_func()
-            except Environment.DoesNotExist:
-                stats = {key: tsdb.make_series(0, **query_params) for key in group_ids}
+        if self.stats_period:
+            if 'stats' in results:
+                stats = results['stats']
             else:
-                stats = tsdb.get_range(
-                    model=tsdb.models.group,
-                    keys=group_ids,
-                    environment_id=environment and environment.id,
-                    **query_params
-                )
+                query_params = self._get_stats_query_params()
+                stats = {g.id: tsdb.make_series(0, **query_params) for g in item_list}
 
             for item in item_list:
 
@@ -0,0 +1,148 @@
+"""
+sentry.api.streaming
+~~~~~~~~~~~~~~~~~~~~
+
+Helpers to compress API responses and to stream large result lists out in
+batches instead of rendering them in one go.
+
+:copyright: (c) 2010-2018 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+from __future__ import absolute_import
+
+import re
+import zlib
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+    has_brotli = True
+except ImportError:
+    has_brotli = False
+
+__all__ = (
+    'get_content_encoding', 'compress', 'compress_chunks', 'compress_response',
+    'iter_json_list', 'StreamingJSONResponse',
+)
+
+# number of results serialized at a time when streaming
+STREAM_BATCH_SIZE = 25
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# in order of preference
+if has_brotli:
+    SUPPORTED_ENCODINGS = ('br', 'gzip')
+else:
+    SUPPORTED_ENCODINGS = ('gzip', )
+
+_accept_encoding_re = re.compile(r'^\s*([^\s;]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def parse_accept_encoding(value):
+    """
+    Parse an ``Accept-Encoding`` header into a mapping of encodings to
+    their quality values.
+    """
+    rv = {}
+    for part in (value or '').split(','):
+        match = _accept_encoding_re.match(part)
+        if match is None:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        rv[match.group(1).lower()] = quality
+    return rv
+
+
+def get_content_encoding(request):
+    """
+    Return the preferred encoding we support which the client accepts, or
+    ``None`` if the response should not be compressed.
+    """
+    accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress_chunks(chunks, encoding):
+    """
+    Compress an iterable of byte strings. Every chunk is flushed so that
+    clients can decode a stream as it arrives.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    elif encoding == 'gzip':
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+
+        def flush():
+            return compressor.flush(zlib.Z_SYNC_FLUSH)
+    else:
+        raise ValueError('Unsupported encoding: %r' % (encoding, ))
+
+    for chunk in chunks:
+        if chunk:
+            yield process(chunk) + flush()
+    yield finish()
+
+
+def compress(content, encoding):
+    return b''.join(compress_chunks([content], encoding))
+
+
+def compress_response(response, encoding, min_size=0):
+    """
+    Compress the content of a rendered response in place. Meant to be used
+    as a post render callback of rest framework responses.
+    """
+    if response.has_header('Content-Encoding') or len(response.content) < min_size:
+        return
+    response.content = compress(response.content, encoding)
+    response['Content-Encoding'] = encoding
+
+
+def iter_json_list(batches, renderer=None):
+    """
+    Encode an iterable of lists of results as a single JSON list, one
+    batch at a time. The output is identical to rendering the whole list
+    at once.
+    """
+    if renderer is None:
+        renderer = JSONRenderer()
+
+    yield b'['
+    first = True
+    for batch in batches:
+        # the rest framework renderer returns nothing for ``None``
+        parts = [renderer.render(item) if item is not None else b'null' for item in batch]
+        if not parts:
+            continue
+        yield (b'' if first else b', ') + b', '.join(parts)
+        first = False
+    yield b']'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    A JSON list response which is serialized while it is being sent.
+
+    >>> StreamingJSONResponse(serialize(batch) for batch in batches)
+    """
+
+    def __init__(self, batches, content_encoding=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        content = iter_json_list(batches)
+        if content_encoding is not None:
+            content = compress_chunks(content, content_encoding)
+        super(StreamingJSONResponse, self).__init__(content, **kwargs)
+        if content_encoding is not None:
+            self['Content-Encoding'] = content_encoding
@@ -433,8 +433,9 @@ CELERY_IMPORTS = (
     'sentry.tasks.collect_project_platforms', 'sentry.tasks.commits', 'sentry.tasks.deletion',
     'sentry.tasks.digests', 'sentry.tasks.email', 'sentry.tasks.merge',
     'sentry.tasks.options', 'sentry.tasks.ping', 'sentry.tasks.post_process',
-    'sentry.tasks.process_buffer', 'sentry.tasks.reports', 'sentry.tasks.reprocessing',
-    'sentry.tasks.scheduler', 'sentry.tasks.signals', 'sentry.tasks.store', 'sentry.tasks.unmerge',
+    'sentry.tasks.process_buffer', 'sentry.tasks.release_artifacts', 'sentry.tasks.reports',
+    'sentry.tasks.reprocessing', 'sentry.tasks.scheduler', 'sentry.tasks.signals',
+    'sentry.tasks.store', 'sentry.tasks.unmerge',
     'sentry.tasks.symcache_update', 'sentry.tasks.servicehooks',
     'sentry.tagstore.tasks', 'sentry.tasks.assemble', 'sentry.tasks.integrations',
 )
@@ -579,6 +580,16 @@ CELERYBEAT_SCHEDULE = {
             'expires': 60 * 25,
         },
     },
+    'schedule-daily-organization-report-snapshots': {
+        'task': 'sentry.tasks.reports.prepare_snapshots',
+        'schedule': crontab(
+            minute=30,
+            hour=0,
+        ),
+        'options': {
+            'expires': 60 * 60 * 3,
+        },
+    },
     'schedule-weekly-organization-reports': {
         'task':
         'sentry.tasks.reports.prepare_reports',
@@ -952,6 +963,11 @@ SENTRY_SNUBA = os.environ.get('SNUBA', 'http://localhost:1218')
 SENTRY_NODESTORE = 'sentry.nodestore.django.DjangoNodeStorage'
 SENTRY_NODESTORE_OPTIONS = {}
 
+# How node payloads are serialized by backends that serialize on their own.
+# Payloads of either codec can always be read.
+SENTRY_NODESTORE_CODEC = 'sentry.nodestore.codec.PickleNodeCodec'
+SENTRY_NODESTORE_CODEC_OPTIONS = {}
+
 # Tag storage backend
 _SENTRY_TAGSTORE_DEFAULT_MULTI_OPTIONS = {
     'backends': [
@@ -995,6 +1011,12 @@ SENTRY_METRICS_OPTIONS = {}
 SENTRY_METRICS_SAMPLE_RATE = 1.0
 SENTRY_METRICS_PREFIX = 'sentry.'
 
+# Internal metrics are buffered in a bounded queue and written to the internal
+# time series database in batches.
+SENTRY_INTERNAL_METRICS_QUEUE_SIZE = 10000
+SENTRY_INTERNAL_METRICS_FLUSH_INTERVAL = 1
+SENTRY_INTERNAL_METRICS_PUT_TIMEOUT = 0.1
+
 # URI Prefixes for generating DSN URLs
 # (Defaults to URL_PREFIX by default)
 SENTRY_ENDPOINT = None
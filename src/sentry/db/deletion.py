@@ -1,10 +1,14 @@
 from __future__ import absolute_import
 
-from datetime import timedelta
+import time
+
+from datetime import datetime, timedelta
 from django.db import connections, router
+from django.db.models import Q
+from django.db.models.sql.subqueries import DeleteQuery
 from django.utils import timezone
 
-from sentry.utils import db
+from sentry.utils import db, json, metrics, redis
 
 
 class BulkDeleteQuery(object):
@@ -127,3 +131,141 @@ class BulkDeleteQuery(object):
             self.execute_postgres(chunk_size)
         else:
             self.execute_generic(chunk_size)
+
+
+class DeletionCheckpoint(object):
+    """
+    Remembers the last ``(date, id)`` that an incremental deletion removed,
+    so that an interrupted pass can be resumed.
+    """
+    ttl = 60 * 60 * 24 * 30
+
+    def __init__(self, name):
+        self.key = 'cleanup:checkpoint:{}'.format(name)
+
+    @classmethod
+    def for_model(cls, model, project_id=None):
+        return cls('{}.{}:{}'.format(
+            model._meta.app_label,
+            model._meta.object_name,
+            project_id or '*',
+        ))
+
+    def get(self):
+        with redis.clusters.get('default').map() as client:
+            result = client.get(self.key)
+        value = result.value
+        if value is None:
+            return None
+        value = json.loads(value)
+        date = datetime.utcfromtimestamp(value['date']).replace(tzinfo=timezone.utc)
+        return date, value['id']
+
+    def set(self, date, id):
+        value = json.dumps({
+            'date': (date - datetime(1970, 1, 1, tzinfo=timezone.utc)).total_seconds(),
+            'id': id,
+        })
+        with redis.clusters.get('default').map() as client:
+            client.setex(self.key, self.ttl, value)
+
+    def clear(self):
+        with redis.clusters.get('default').map() as client:
+            client.delete(self.key)
+
+
+class IncrementalDeleteQuery(object):
+    """
+    Deletes all rows older than ``days`` in ``(dtfield, id)`` order.
+
+    Every batch is sized so that deleting it takes about
+    ``target_duration`` seconds. After each batch the deletion pauses so
+    that it is only busy for a ``duty_cycle`` fraction of the time, which
+    bounds the load it puts on the database. Progress is stored in the
+    optional ``checkpoint`` and a pass resumes from it. The checkpoint is
+    cleared at the end of a pass, so rows which show up later with an old
+    date are picked up by the next pass.
+
+    Rows are removed with a plain ``DELETE`` unless a ``delete`` callback is
+    given, which is called with the ids of each batch.
+    """
+
+    def __init__(self, model, dtfield, days, project_id=None, checkpoint=None,
+                 delete=None, chunk_size=1000, min_chunk_size=10, max_chunk_size=10000,
+                 target_duration=1.0, duty_cycle=1.0):
+        assert 0 < duty_cycle <= 1
+        self.model = model
+        self.dtfield = dtfield
+        self.days = int(days)
+        self.project_id = int(project_id) if project_id else None
+        self.checkpoint = checkpoint
+        self.delete = delete or self.delete_rows
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.target_duration = target_duration
+        self.duty_cycle = duty_cycle
+        self.using = router.db_for_write(model)
+
+    def get_queryset(self, position):
+        cutoff = timezone.now() - timedelta(days=self.days)
+        qs = self.model.objects.filter(**{'{}__lte'.format(self.dtfield): cutoff})
+        if self.project_id:
+            if 'project' in self.model._meta.get_all_field_names():
+                qs = qs.filter(project=self.project_id)
+            else:
+                qs = qs.filter(project_id=self.project_id)
+        if position is not None:
+            date, id = position
+            qs = qs.filter(
+                Q(**{'{}__gt'.format(self.dtfield): date}) |
+                Q(**{self.dtfield: date, 'id__gt': id})
+            )
+        return qs.order_by(self.dtfield, 'id')
+
+    def delete_rows(self, ids):
+        DeleteQuery(self.model).delete_batch(ids, self.using)
+
+    def execute(self, max_duration=None):
+        """
+        Delete batches until no rows are left, or until ``max_duration``
+        seconds have passed. Returns the number of deleted rows.
+        """
+        tags = {'model': self.model.__name__}
+        position = self.checkpoint.get() if self.checkpoint else None
+        chunk_size = self.chunk_size
+        deadline = time.time() + max_duration if max_duration else None
+        deleted = 0
+
+        while deadline is None or time.time() < deadline:
+            start = time.time()
+            rows = list(
+                self.get_queryset(position).values_list('id', self.dtfield)[:chunk_size]
+            )
+            if not rows:
+                if self.checkpoint:
+                    self.checkpoint.clear()
+                break
+
+            self.delete([id for id, _ in rows])
+            id, date = rows[-1]
+            position = (date, id)
+            if self.checkpoint:
+                self.checkpoint.set(date, id)
+
+            duration = max(time.time() - start, 0.001)
+            deleted += len(rows)
+            metrics.incr('cleanup.incremental.deleted', amount=len(rows), tags=tags)
+            metrics.timing('cleanup.incremental.batch-duration', duration, tags=tags)
+            metrics.timing('cleanup.incremental.batch-size', len(rows), tags=tags)
+
+            # Move towards the target duration without overshooting on a
+            # single unusually fast or slow batch.
+            factor = min(max(self.target_duration / duration, 0.5), 2.0)
+            chunk_size = int(min(max(chunk_size * factor, self.min_chunk_size),
+                                 self.max_chunk_size))
+
+            if self.duty_cycle < 1:
+                time.sleep(duration * (1 - self.duty_cycle) / self.duty_cycle)
+
+        return deleted
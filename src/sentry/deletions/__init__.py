@@ -23,7 +23,9 @@ as Event, so it can more efficiently bulk delete rows.
 
 from __future__ import absolute_import
 
-from .base import BulkModelDeletionTask, ModelDeletionTask, ModelRelation  # NOQA
+from .base import (  # NOQA
+    BulkModelDeletionTask, BulkQueryDeletionTask, ModelDeletionTask, ModelRelation
+)
 from .manager import DeletionTaskManager
 
 default_manager = DeletionTaskManager(default_task=ModelDeletionTask)
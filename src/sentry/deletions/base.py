@@ -3,6 +3,9 @@ from __future__ import absolute_import, print_function
 import logging
 import re
 
+from django.db import router
+from django.db.models.sql.subqueries import DeleteQuery
+
 from sentry.constants import ObjectStatus
 from sentry.utils.query import bulk_delete_objects
 
@@ -233,6 +236,23 @@ class ModelDeletionTask(BaseDeletionTask):
                 instance.update(status=ObjectStatus.DELETION_IN_PROGRESS)
 
 
+class BulkQueryDeletionTask(ModelDeletionTask):
+    """
+    Deletes each batch of rows with a single ``DELETE ... WHERE id IN``
+    statement, skipping Django's collector and the per-row delete signals.
+
+    Child relations are still handled, but the model must not have foreign
+    keys pointing at it, nor post_delete receivers which need to run.
+    """
+    DEFAULT_QUERY_LIMIT = 1000
+
+    def delete_instance_bulk(self, instance_list):
+        DeleteQuery(self.model).delete_batch(
+            [i.id for i in instance_list],
+            router.db_for_write(self.model),
+        )
+
+
 class BulkModelDeletionTask(ModelDeletionTask):
     """
     An efficient mechanism for deleting larger volumes of rows in one pass,
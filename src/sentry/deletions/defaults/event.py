@@ -2,7 +2,7 @@ from __future__ import absolute_import, print_function
 
 from sentry import nodestore
 
-from ..base import (BaseDeletionTask, BaseRelation, ModelDeletionTask)
+from ..base import (BaseDeletionTask, BaseRelation, BulkQueryDeletionTask)
 
 
 class NodeDeletionTask(BaseDeletionTask):
@@ -15,8 +15,15 @@ class NodeDeletionTask(BaseDeletionTask):
         return False
 
 
-class EventDeletionTask(ModelDeletionTask):
+class EventDeletionTask(BulkQueryDeletionTask):
+    """
+    Events are deleted a batch at a time without going through
+    ``Model.delete``. The only work their post_delete signal does is
+    removing the node, which is done for the whole batch at once by the
+    node relation below.
+    """
+
     def get_child_relations_bulk(self, instance_list):
-        node_ids = [i.data.id for i in instance_list]
+        node_ids = [i.data.id for i in instance_list if i.data.id]
 
         return [BaseRelation({'nodes': node_ids}, NodeDeletionTask)]
@@ -12,7 +12,6 @@ class GroupDeletionTask(ModelDeletionTask):
         model_list = (
             # prioritize GroupHash
             models.GroupHash,
-            models.EventMapping,
             models.GroupAssignee,
             models.GroupCommitResolution,
             models.GroupLink,
@@ -28,12 +27,24 @@ class GroupDeletionTask(ModelDeletionTask):
             models.GroupSnooze,
             models.GroupEmailThread,
             models.GroupSubscription,
+        )
+
+        relations.extend([ModelRelation(m, {'group_id': instance.id}) for m in model_list])
+
+        # Event centric relations are deleted in bulk, without per-row
+        # signals, and are also scoped to the project so the project leading
+        # indexes on these tables can be used.
+        model_list = (
+            models.EventMapping,
             models.UserReport,
             # Event is last as its the most time consuming
             models.Event,
         )
 
-        relations.extend([ModelRelation(m, {'group_id': instance.id}) for m in model_list])
+        relations.extend([
+            ModelRelation(m, {'project_id': instance.project_id, 'group_id': instance.id})
+            for m in model_list
+        ])
 
         return relations
 
@@ -10,9 +10,12 @@ import zlib
 
 from django.conf import settings
 from os.path import splitext
+from random import randint
 from requests.utils import get_encoding_from_headers
 from six.moves.urllib.parse import urljoin, urlsplit
 from symbolic import SourceMapView
+from time import sleep, time
+from uuid import uuid4
 
 # In case SSL is unavailable (light builds) we can't import this here.
 try:
@@ -24,12 +27,14 @@ except ImportError:
 
 
 from sentry import http
+from sentry.app import locks
 from sentry.interfaces.stacktrace import Stacktrace
 from sentry.models import EventError, ReleaseFile
 from sentry.utils.cache import cache
 from sentry.utils.files import compress_file
 from sentry.utils.hashlib import md5_text
 from sentry.utils.http import is_valid_origin
+from sentry.utils.locking import UnableToAcquireLock
 from sentry.utils import metrics
 from sentry.stacktraces import StacktraceProcessor
 
@@ -62,6 +67,17 @@ CACHE_CONTROL_MIN = 60
 # the maximum number of remote resources (i.e. source files) that should be
 # fetched
 MAX_RESOURCE_FETCHES = 100
+# the maximum number of artifacts of a release that are indexed and prefetched
+# into the cache when they are uploaded
+MAX_INDEXED_RELEASE_FILES = 5000
+MAX_PREFETCH_RELEASE_FILES = 500
+# cache entries expire up to this fraction of their ttl later
+CACHE_TTL_JITTER = 0.1
+# concurrent fetches of the same file wait for the worker that is already
+# fetching it for at most this many seconds before fetching it themselves
+SINGLE_FLIGHT_WAIT = settings.SENTRY_SOURCE_FETCH_TIMEOUT
+SINGLE_FLIGHT_POLL_INTERVAL = 0.1
+SINGLE_FLIGHT_LOCK_DURATION = settings.SENTRY_SOURCE_FETCH_TIMEOUT * 2
 
 logger = logging.getLogger(__name__)
 
@@ -197,81 +213,260 @@ def discover_sourcemap(result):
     return sourcemap
 
 
-def fetch_release_file(filename, release, dist=None):
-    cache_key = 'releasefile:v1:%s:%s' % (release.id, md5_text(filename).hexdigest(), )
+def get_release_artifact_index_cache_key(release_id):
+    return 'releasefile:index:v1:%s' % (release_id, )
 
-    logger.debug('Checking cache for release artifact %r (release_id=%s)', filename, release.id)
-    result = cache.get(cache_key)
 
-    dist_name = dist and dist.name or None
+def get_release_artifact_index_version_cache_key(release_id):
+    return 'releasefile:index-version:v1:%s' % (release_id, )
 
-    if result is None:
-        filename_choices = ReleaseFile.normalize(filename)
-        filename_idents = [ReleaseFile.get_ident(f, dist_name) for f in filename_choices]
 
-        logger.debug(
-            'Checking database for release artifact %r (release_id=%s)', filename, release.id
-        )
+def invalidate_release_artifact_index(release_id):
+    """
+    Drops the artifact index of a release after its artifacts changed. The
+    version is changed first, so that an index which is being built from the
+    previous artifacts is never kept.
+    """
+    cache.set(get_release_artifact_index_version_cache_key(release_id), uuid4().hex, 3600)
+    cache.delete(get_release_artifact_index_cache_key(release_id))
+
+
+def get_release_artifact_cache_key(file_id, checksum):
+    return 'releasefile:file:v1:%s:%s' % (file_id, checksum, )
 
-        possible_files = list(
-            ReleaseFile.objects.filter(
-                release=release,
-                dist=dist,
-                ident__in=filename_idents,
-            ).select_related('file')
+
+def read_release_file(releasefile):
+    """
+    Reads the contents of a release artifact, returning the tuple that is
+    stored in the cache or ``None`` if it could not be read. The contents are
+    cached per file, so they can be shared by every url resolving to it.
+    """
+    file = releasefile.file
+    artifact_cache_key = get_release_artifact_cache_key(file.id, file.checksum)
+    result = cache.get(artifact_cache_key)
+    if result is not None:
+        return result
+
+    try:
+        with metrics.timer('sourcemaps.release_file_read'):
+            with file.getfile() as fp:
+                z_body, body = compress_file(fp)
+    except Exception as e:
+        logger.exception(six.text_type(e))
+        return None
+
+    headers = {k.lower(): v for k, v in file.headers.items()}
+    encoding = get_encoding_from_headers(headers)
+    result = (headers, z_body, 200, encoding)
+    cache.set(artifact_cache_key, result, jitter_ttl(3600))
+    return result
+
+
+def prefetch_release_artifacts(release):
+    """
+    Builds the artifact index of a release (mapping the ident of every
+    artifact to the id and checksum of its file) and warms the cache with the
+    contents of its artifacts, so the first events of a new release do not
+    all have to resolve and read the same files.
+    """
+    version_key = get_release_artifact_index_version_cache_key(release.id)
+    version = cache.get(version_key)
+
+    releasefiles = list(
+        ReleaseFile.objects.filter(
+            release=release,
+        ).select_related('file')[:MAX_INDEXED_RELEASE_FILES + 1]
+    )
+
+    # An incomplete index would report existing artifacts as missing, so
+    # releases with too many (or not fully uploaded) artifacts are always
+    # resolved from the database.
+    if len(releasefiles) <= MAX_INDEXED_RELEASE_FILES and \
+            all(rf.file.checksum for rf in releasefiles):
+        index_key = get_release_artifact_index_cache_key(release.id)
+        cache.set(
+            index_key,
+            {rf.ident: (rf.file_id, rf.file.checksum) for rf in releasefiles},
+            3600,
         )
+        # Artifacts changed while the index was built, it might be missing
+        # some of them. Whoever changed them scheduled another build.
+        if cache.get(version_key) != version:
+            cache.delete(index_key)
 
-        if len(possible_files) == 0:
-            logger.debug(
-                'Release artifact %r not found in database (release_id=%s)', filename, release.id
-            )
-            cache.set(cache_key, -1, 60)
-            return None
-        elif len(possible_files) == 1:
-            releasefile = possible_files[0]
+    prefetched = 0
+    for releasefile in releasefiles[:MAX_PREFETCH_RELEASE_FILES]:
+        file = releasefile.file
+        if not file.checksum or file.size > settings.SENTRY_SOURCE_FETCH_MAX_SIZE:
+            continue
+        if read_release_file(releasefile) is not None:
+            prefetched += 1
+
+    metrics.incr('sourcemaps.release_file_prefetch', amount=prefetched)
+    return prefetched
+
+
+def jitter_ttl(ttl):
+    """
+    Spreads the expiry of cache entries that are usually written at the same
+    time (e.g. all artifacts of a new release) so they do not expire at once.
+    """
+    return ttl + randint(0, int(ttl * CACHE_TTL_JITTER))
+
+
+def fetch_single_flight(key, lookup, fetch, source):
+    """
+    Ensures that only one worker at a time runs ``fetch`` for ``key``.
+
+    ``fetch`` has to store its result where ``lookup`` finds it. Workers that
+    cannot acquire the lock poll ``lookup`` until the result of the worker
+    holding it shows up, and only fetch on their own if it does not show up
+    within ``SINGLE_FLIGHT_WAIT`` seconds.
+    """
+    lock = locks.get(
+        'sourcemaps:fetch:%s' % (md5_text(key).hexdigest(), ),
+        duration=SINGLE_FLIGHT_LOCK_DURATION,
+    )
+    try:
+        with lock.acquire():
+            # the previous holder of the lock may have just stored the result
+            result = lookup()
+            if result is None:
+                return fetch()
+    except UnableToAcquireLock:
+        deadline = time() + SINGLE_FLIGHT_WAIT
+        while time() < deadline:
+            sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+            result = lookup()
+            if result is not None:
+                break
         else:
-            # Pick first one that matches in priority order.
-            # This is O(N*M) but there are only ever at most 4 things here
-            # so not really worth optimizing.
-            releasefile = next((
-                rf
-                for ident in filename_idents
-                for rf in possible_files
-                if rf.ident == ident
-            ))
+            metrics.incr('sourcemaps.fetch.single_flight_timeout', tags={'source': source})
+            return fetch()
 
+    metrics.incr('sourcemaps.fetch.deduplicated', tags={'source': source})
+    return result
+
+
+def resolve_release_file(filename, release, dist, cache_key):
+    """
+    Looks up a release artifact, storing the result (or ``-1`` if there is no
+    such artifact) in the cache under ``cache_key`` and returning it.
+    """
+    dist_name = dist and dist.name or None
+    filename_choices = ReleaseFile.normalize(filename)
+    filename_idents = [ReleaseFile.get_ident(f, dist_name) for f in filename_choices]
+
+    index = cache.get(get_release_artifact_index_cache_key(release.id))
+    if index is not None:
+        artifact = next((index[ident] for ident in filename_idents if ident in index), None)
+        if artifact is None:
+            logger.debug(
+                'Release artifact %r not found in index (release_id=%s)', filename, release.id
+            )
+            cache.set(cache_key, -1, jitter_ttl(60))
+            return -1
+        result = cache.get(get_release_artifact_cache_key(*artifact))
+        if result is not None:
+            cache.set(cache_key, result, jitter_ttl(3600))
+            return result
+
+    logger.debug(
+        'Checking database for release artifact %r (release_id=%s)', filename, release.id
+    )
+
+    possible_files = list(
+        ReleaseFile.objects.filter(
+            release=release,
+            dist=dist,
+            ident__in=filename_idents,
+        ).select_related('file')
+    )
+
+    if len(possible_files) == 0:
         logger.debug(
-            'Found release artifact %r (id=%s, release_id=%s)', filename, releasefile.id, release.id
+            'Release artifact %r not found in database (release_id=%s)', filename, release.id
         )
-        try:
-            with metrics.timer('sourcemaps.release_file_read'):
-                with releasefile.file.getfile() as fp:
-                    z_body, body = compress_file(fp)
-        except Exception as e:
-            logger.exception(six.text_type(e))
-            cache.set(cache_key, -1, 3600)
-            result = None
-        else:
-            headers = {k.lower(): v for k, v in releasefile.file.headers.items()}
-            encoding = get_encoding_from_headers(headers)
-            result = http.UrlResult(filename, headers, body, 200, encoding)
-            cache.set(cache_key, (headers, z_body, 200, encoding), 3600)
+        cache.set(cache_key, -1, jitter_ttl(60))
+        return -1
+    elif len(possible_files) == 1:
+        releasefile = possible_files[0]
+    else:
+        # Pick first one that matches in priority order.
+        # This is O(N*M) but there are only ever at most 4 things here
+        # so not really worth optimizing.
+        releasefile = next((
+            rf
+            for ident in filename_idents
+            for rf in possible_files
+            if rf.ident == ident
+        ))
+
+    logger.debug(
+        'Found release artifact %r (id=%s, release_id=%s)', filename, releasefile.id, release.id
+    )
+    result = read_release_file(releasefile)
+    if result is None:
+        cache.set(cache_key, -1, jitter_ttl(3600))
+        return -1
+    cache.set(cache_key, result, jitter_ttl(3600))
+    return result
+
+
+def fetch_release_file(filename, release, dist=None):
+    cache_key = 'releasefile:v1:%s:%s' % (release.id, md5_text(filename).hexdigest(), )
+
+    logger.debug('Checking cache for release artifact %r (release_id=%s)', filename, release.id)
+    result = cache.get(cache_key)
 
-    elif result == -1:
+    if result is None:
+        result = fetch_single_flight(
+            cache_key,
+            lookup=lambda: cache.get(cache_key),
+            fetch=lambda: resolve_release_file(filename, release, dist, cache_key),
+            source='release',
+        )
+
+    if result == -1:
         # We cached an error, so normalize
         # it down to None
-        result = None
-    else:
-        # Previous caches would be a 3-tuple instead of a 4-tuple,
-        # so this is being maintained for backwards compatibility
-        try:
-            encoding = result[3]
-        except IndexError:
-            encoding = None
-        result = http.UrlResult(
-            filename, result[0], zlib.decompress(result[1]), result[2], encoding
-        )
+        return None
+
+    # Previous caches would be a 3-tuple instead of a 4-tuple,
+    # so this is being maintained for backwards compatibility
+    try:
+        encoding = result[3]
+    except IndexError:
+        encoding = None
+    return http.UrlResult(
+        filename, result[0], zlib.decompress(result[1]), result[2], encoding
+    )
+
 
+def fetch_remote_file(url, project, cache_key, error_cache_key):
+    """
+    Fetches a file from the internet, storing the result in the cache under
+    ``cache_key`` (or the error under ``error_cache_key``) and returning it.
+    """
+    headers = {}
+    verify_ssl = False
+    if project and is_valid_origin(url, project=project):
+        verify_ssl = bool(project.get_option('sentry:verify_ssl', False))
+        token = project.get_option('sentry:token')
+        if token:
+            token_header = project.get_option('sentry:token_header') or 'X-Sentry-Token'
+            headers[token_header] = token
+
+    with metrics.timer('sourcemaps.fetch'):
+        try:
+            result = http.fetch_file(url, headers=headers, verify_ssl=verify_ssl)
+        except http.CannotFetch as exc:
+            # Keep other workers waiting for this url from retrying it
+            cache.set(error_cache_key, exc.data, jitter_ttl(CACHE_CONTROL_MIN))
+            raise
+        z_body = zlib.compress(result.body)
+        result = (url, result.headers, z_body, result.status, result.encoding)
+        cache.set(cache_key, result, jitter_ttl(get_max_age(result[1])))
     return result
 
 
@@ -296,7 +491,9 @@ def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True):
     else:
         result = None
 
-    cache_key = 'source:cache:v4:%s' % (md5_text(url).hexdigest(), )
+    url_hash = md5_text(url).hexdigest()
+    cache_key = 'source:cache:v4:%s' % (url_hash, )
+    error_cache_key = 'source:error:v1:%s' % (url_hash, )
 
     if result is None:
         if not allow_scraping or not url.startswith(('http:', 'https:')):
@@ -308,40 +505,32 @@ def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True):
 
         logger.debug('Checking cache for url %r', url)
         result = cache.get(cache_key)
-        if result is not None:
-            # Previous caches would be a 3-tuple instead of a 4-tuple,
-            # so this is being maintained for backwards compatibility
-            try:
-                encoding = result[4]
-            except IndexError:
-                encoding = None
-            # We got a cache hit, but the body is compressed, so we
-            # need to decompress it before handing it off
-            result = http.UrlResult(
-                result[0], result[1], zlib.decompress(result[2]), result[3], encoding
-            )
 
-    if result is None:
-        headers = {}
-        verify_ssl = False
-        if project and is_valid_origin(url, project=project):
-            verify_ssl = bool(project.get_option('sentry:verify_ssl', False))
-            token = project.get_option('sentry:token')
-            if token:
-                token_header = project.get_option('sentry:token_header') or 'X-Sentry-Token'
-                headers[token_header] = token
-
-        with metrics.timer('sourcemaps.fetch'):
-            result = http.fetch_file(url, headers=headers, verify_ssl=verify_ssl)
-            z_body = zlib.compress(result.body)
-            cache.set(
+        if result is None:
+            def lookup():
+                error = cache.get(error_cache_key)
+                if error is not None:
+                    raise http.CannotFetch(error)
+                return cache.get(cache_key)
+
+            result = fetch_single_flight(
                 cache_key,
-                (url,
-                 result.headers,
-                 z_body,
-                 result.status,
-                 result.encoding),
-                get_max_age(result.headers))
+                lookup=lookup,
+                fetch=lambda: fetch_remote_file(url, project, cache_key, error_cache_key),
+                source='remote',
+            )
+
+        # Previous caches would be a 3-tuple instead of a 4-tuple,
+        # so this is being maintained for backwards compatibility
+        try:
+            encoding = result[4]
+        except IndexError:
+            encoding = None
+        # The body is cached compressed, so we need to decompress it
+        # before handing it off
+        result = http.UrlResult(
+            result[0], result[1], zlib.decompress(result[2]), result[3], encoding
+        )
 
     # If we did not get a 200 OK we just raise a cannot fetch here.
     if result.status != 200:
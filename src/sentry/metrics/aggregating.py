@@ -0,0 +1,188 @@
+from __future__ import absolute_import
+
+__all__ = ['AggregatingMetricsBackend']
+
+import atexit
+import logging
+import os
+import six
+import threading
+
+from random import randint
+from time import sleep
+
+from sentry.utils.imports import import_string
+
+from .base import MetricsBackend
+
+logger = logging.getLogger('sentry.errors')
+
+
+def _make_series(key, instance, tags):
+    if tags:
+        tags = tuple(sorted(six.iteritems(tags)))
+    else:
+        tags = ()
+    return (key, instance, tags)
+
+
+class MetricsAggregator(object):
+    """
+    Process wide buffer of pre-aggregated metrics.
+
+    Counters are summed per series, timings are kept as a bounded reservoir
+    of samples per series along with the number of values recorded. The buffer is swapped out atomically on flush so
+    that recording a metric never waits on the network.
+    """
+
+    def __init__(self, flush, flush_interval, max_series, max_timing_samples):
+        self._flush = flush
+        self.flush_interval = flush_interval
+        self.max_series = max_series
+        self.max_timing_samples = max_timing_samples
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset()
+        self._thread = None
+        self._pid = None
+
+    def _reset(self):
+        self.counters = {}
+        self.timings = {}
+
+    def _size(self):
+        return len(self.counters) + len(self.timings)
+
+    def _ensure_started(self):
+        # A forked process inherits the thread of its parent, but the thread
+        # itself is not running in it.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+
+            def worker():
+                while True:
+                    sleep(self.flush_interval)
+                    self.flush()
+
+            self._pid = os.getpid()
+            self._thread = thread = threading.Thread(target=worker)
+            thread.setDaemon(True)
+            thread.start()
+
+    def incr(self, series, amount):
+        self._ensure_started()
+        with self._lock:
+            is_full = series not in self.counters and self._size() >= self.max_series
+            if not is_full:
+                self.counters[series] = self.counters.get(series, 0) + amount
+        if is_full:
+            # Apply back-pressure on the caller instead of growing the buffer
+            # without bound.
+            self.flush()
+            self.incr(series, amount)
+
+    def timing(self, series, value):
+        self._ensure_started()
+        with self._lock:
+            samples = self.timings.get(series)
+            is_full = samples is None and self._size() >= self.max_series
+            if not is_full:
+                if samples is None:
+                    # [number of values seen, reservoir of values]
+                    self.timings[series] = samples = [0, []]
+                samples[0] += 1
+                reservoir = samples[1]
+                if len(reservoir) < self.max_timing_samples:
+                    reservoir.append(value)
+                else:
+                    # Reservoir sampling keeps the distribution of the
+                    # values intact once the series exceeds its budget.
+                    index = randint(0, samples[0] - 1)
+                    if index < self.max_timing_samples:
+                        reservoir[index] = value
+        if is_full:
+            self.flush()
+            self.timing(series, value)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                counters, timings = self.counters, self.timings
+                self._reset()
+
+            if not (counters or timings):
+                return
+
+            try:
+                self._flush(counters, timings)
+            except Exception:
+                logger.exception('Unable to flush aggregated metrics')
+
+
+# ``MetricsBackend`` is thread local (its ``__init__`` runs again for every
+# thread), so the aggregation buffer has to be shared out of band.
+_aggregators = {}
+_aggregators_lock = threading.Lock()
+
+
+class AggregatingMetricsBackend(MetricsBackend):
+    """
+    Wraps another metrics backend and pre-aggregates all metrics in memory,
+    flushing them to the wrapped backend in a single batch every
+    ``flush_interval`` seconds.
+
+    >>> SENTRY_METRICS_BACKEND = 'sentry.metrics.aggregating.AggregatingMetricsBackend'
+    >>> SENTRY_METRICS_OPTIONS = {
+    >>>     'backend': 'sentry.metrics.statsd.StatsdMetricsBackend',
+    >>>     'backend_options': {'host': 'localhost', 'port': 8125},
+    >>>     'flush_interval': 10,
+    >>> }
+    """
+
+    def __init__(self, backend, backend_options=None, flush_interval=10,
+                 max_series=10000, max_timing_samples=100, prefix=None):
+        backend_options = dict(backend_options or {})
+        if prefix is not None:
+            backend_options.setdefault('prefix', prefix)
+        self.backend = import_string(backend)(**backend_options)
+        super(AggregatingMetricsBackend, self).__init__(prefix=prefix)
+
+        with _aggregators_lock:
+            aggregator = _aggregators.get(id(self))
+            if aggregator is None:
+                aggregator = _aggregators[id(self)] = MetricsAggregator(
+                    flush=self._send,
+                    flush_interval=flush_interval,
+                    max_series=max_series,
+                    max_timing_samples=max_timing_samples,
+                )
+                atexit.register(aggregator.flush)
+        self.aggregator = aggregator
+
+    def _send(self, counters, timings):
+        backend = self.backend
+        with backend.batch():
+            for (key, instance, tags), amount in six.iteritems(counters):
+                backend.incr(key, instance, dict(tags), amount)
+
+            for (key, instance, tags), (count, values) in six.iteritems(timings):
+                # Only a sample of the values is kept once a series exceeds
+                # its reservoir. Clients drop values sent with a sample rate
+                # on their own, so the number of values is sent separately.
+                for value in values:
+                    backend.timing(key, value, instance, dict(tags))
+                backend.incr('{}.count'.format(key), instance, dict(tags), count)
+
+    def flush(self):
+        self.aggregator.flush()
+
+    def incr(self, key, instance=None, tags=None, amount=1, sample_rate=1):
+        # Sampling is unnecessary as every call only touches memory.
+        self.aggregator.incr(_make_series(key, instance, tags), amount)
+
+    def timing(self, key, value, instance=None, tags=None, sample_rate=1):
+        self.aggregator.timing(_make_series(key, instance, tags), value)
@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 __all__ = ['MetricsBackend']
 
+from contextlib import contextmanager
 from django.conf import settings
 from random import random
 from threading import local
@@ -21,6 +22,14 @@ class MetricsBackend(local):
     def _should_sample(self, sample_rate):
         return sample_rate >= 1 or random() >= 1 - sample_rate
 
+    @contextmanager
+    def batch(self):
+        """
+        Group all metrics recorded by the current thread within this block
+        so that backends supporting it can send them as a single payload.
+        """
+        yield
+
     def incr(self, key, instance=None, tags=None, amount=1, sample_rate=1):
         raise NotImplementedError
 
@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 __all__ = ['DogStatsdMetricsBackend']
 
+from contextlib import contextmanager
 from datadog import initialize, statsd
 
 from .base import MetricsBackend
@@ -14,6 +15,14 @@ class DogStatsdMetricsBackend(MetricsBackend):
         initialize(**kwargs)
         super(DogStatsdMetricsBackend, self).__init__(prefix=prefix)
 
+    @contextmanager
+    def batch(self):
+        statsd.open_buffer()
+        try:
+            yield
+        finally:
+            statsd.close_buffer()
+
     def incr(self, key, instance=None, tags=None, amount=1, sample_rate=1):
         if tags is None:
             tags = {}
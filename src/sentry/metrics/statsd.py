@@ -2,6 +2,8 @@ from __future__ import absolute_import
 
 __all__ = ['StatsdMetricsBackend']
 
+from contextlib import contextmanager
+
 import statsd
 
 from .base import MetricsBackend
@@ -17,6 +19,17 @@ class StatsdMetricsBackend(MetricsBackend):
             return '{}.{}'.format(key, instance)
         return key
 
+    @contextmanager
+    def batch(self):
+        client = self.client
+        self.client = pipeline = client.pipeline()
+        try:
+            yield
+        finally:
+            self.client = client
+            # the pipeline packs as many metrics as fit into each datagram
+            pipeline.send()
+
     def incr(self, key, instance=None, tags=None, amount=1, sample_rate=1):
         self.client.incr(self._full_key(self._get_key(key)), amount, sample_rate)
 
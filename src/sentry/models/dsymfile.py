@@ -18,6 +18,8 @@ import shutil
 import hashlib
 import logging
 import tempfile
+import threading
+from collections import OrderedDict
 from requests.exceptions import RequestException
 
 from jsonfield import JSONField
@@ -45,10 +47,20 @@ logger = logging.getLogger(__name__)
 ONE_DAY = 60 * 60 * 24
 ONE_DAY_AND_A_HALF = int(ONE_DAY * 1.5)
 
+# How often the timestamp of a file in the cache is bumped when it is used.
+# The timestamps determine the order of eviction.
+BUMP_TIMESTAMP_INTERVAL = 60 * 60
+
 # How long we cache a conversion failure by checksum in cache.  Currently
 # 10 minutes is assumed to be a reasonable value here.
 CONVERSION_ERROR_TTL = 60 * 10
 
+# How long we cache which symcache file belongs to a debug id.
+SYMCACHE_METADATA_TTL = 60 * 10
+
+# How many open symcaches are kept around per process.
+SYMCACHE_POOL_SIZE = 100
+
 DSYM_MIMETYPES = dict((v, k) for k, v in KNOWN_DSYM_TYPES.items())
 
 _proguard_file_re = re.compile(r'/proguard/(?:mapping-)?(.*?)\.txt$')
@@ -346,6 +358,7 @@ def create_dsym_from_id(project, dsym_type, cpu_name, debug_id,
         rv.file.headers['Content-Type'] = DSYM_MIMETYPES[dsym_type]
         rv.file.save()
 
+    ProjectDSymFile.dsymcache.invalidate_symcache_metadata(project, debug_id)
     resolve_processing_issue(
         project=project,
         scope='native',
@@ -466,7 +479,36 @@ def find_dsym_file(project, debug_id):
         pass
 
 
+class SymCachePool(object):
+    """A process wide pool of open (memory mapped) symcaches with least
+    recently used eviction.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._symcaches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            symcache = self._symcaches.pop(key, None)
+            if symcache is not None:
+                self._symcaches[key] = symcache
+            return symcache
+
+    def add(self, key, symcache):
+        with self._lock:
+            self._symcaches.pop(key, None)
+            self._symcaches[key] = symcache
+            while len(self._symcaches) > self.size:
+                self._symcaches.popitem(last=False)
+        return symcache
+
+
 class DSymCache(object):
+    def __init__(self):
+        self._pool = SymCachePool(SYMCACHE_POOL_SIZE)
+
     @property
     def cache_path(self):
         return options.get('dsym.cache-path')
@@ -483,9 +525,27 @@ class DSymCache(object):
     def get_symcaches(self, project, debug_ids, on_dsym_file_referenced=None,
                       with_conversion_errors=False):
         """Given some debug ids returns the symcaches loaded for these debug ids."""
-        cachefiles, conversion_errors = self._get_symcaches_impl(
-            project, debug_ids, on_dsym_file_referenced)
-        symcaches = self._load_cachefiles_via_fs(project, cachefiles)
+        symcaches = {}
+        conversion_errors = {}
+
+        # The callback needs the debug file models, so the metadata cache can
+        # only be used if there is none.
+        if on_dsym_file_referenced is None:
+            missing = []
+            for debug_id in map(six.text_type, debug_ids):
+                symcache = self._load_cachefile_via_metadata(project, debug_id)
+                if symcache is not None:
+                    symcaches[debug_id] = symcache
+                else:
+                    missing.append(debug_id)
+        else:
+            missing = debug_ids
+
+        if missing:
+            cachefiles, conversion_errors = self._get_symcaches_impl(
+                project, missing, on_dsym_file_referenced)
+            symcaches.update(self._load_cachefiles_via_fs(project, cachefiles))
+
         if with_conversion_errors:
             return symcaches, dict((k, v) for k, v in conversion_errors.items())
         return symcaches
@@ -660,25 +720,84 @@ class DSymCache(object):
 
         raise RuntimeError('Concurrency error on symcache update')
 
+    def _get_metadata_cache_key(self, project, debug_id):
+        return 'symcache:meta:v1:%s:%s' % (project.id, debug_id)
+
+    def invalidate_symcache_metadata(self, project, debug_id):
+        default_cache.delete(self._get_metadata_cache_key(project, debug_id))
+
+    def _get_cachefile_path(self, project, debug_id, checksum, version):
+        return os.path.join(
+            self.get_project_path(project),
+            '%s_%s_%s.symcache' % (debug_id, checksum, version),
+        )
+
+    def _load_cachefile_via_metadata(self, project, debug_id):
+        """Loads a symcache without querying the database if it is known
+        which symcache file belongs to the debug id.
+        """
+        cache_key = self._get_metadata_cache_key(project, debug_id)
+        metadata = default_cache.get(cache_key)
+        if metadata is None:
+            return None
+
+        cache_file_id, checksum, version = metadata
+        key = (debug_id, checksum, version)
+        symcache = self._pool.get(key)
+        if symcache is not None:
+            return symcache
+
+        path = self._get_cachefile_path(project, debug_id, checksum, version)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            try:
+                File.objects.get(id=cache_file_id).save_to(path)
+            except File.DoesNotExist:
+                # The symcache was rebuilt in the meantime
+                default_cache.delete(cache_key)
+                return None
+        else:
+            self._try_bump_timestamp(path, stat)
+
+        return self._pool.add(key, SymCache.from_path(path))
+
     def _load_cachefiles_via_fs(self, project, cachefiles):
         rv = {}
-        base = self.get_project_path(project)
         for dsym_id, symcache_file in cachefiles:
-            cachefile_path = os.path.join(base, dsym_id + '.symcache')
+            checksum = symcache_file.checksum
+            version = symcache_file.version
+            default_cache.set(
+                self._get_metadata_cache_key(project, dsym_id),
+                (symcache_file.cache_file_id, checksum, version),
+                SYMCACHE_METADATA_TTL,
+            )
+
+            key = (dsym_id, checksum, version)
+            symcache = self._pool.get(key)
+            if symcache is not None:
+                rv[dsym_id] = symcache
+                continue
+
+            cachefile_path = self._get_cachefile_path(project, dsym_id, checksum, version)
             try:
                 stat = os.stat(cachefile_path)
             except OSError as e:
                 if e.errno != errno.ENOENT:
                     raise
+                # `save_to` writes to a temporary file and moves it into
+                # place, so concurrent workers never see partial files.
                 symcache_file.cache_file.save_to(cachefile_path)
             else:
                 self._try_bump_timestamp(cachefile_path, stat)
-            rv[dsym_id] = SymCache.from_path(cachefile_path)
+            rv[dsym_id] = self._pool.add(key, SymCache.from_path(cachefile_path))
         return rv
 
     def _try_bump_timestamp(self, path, old_stat):
         now = int(time.time())
-        if old_stat.st_ctime < now - ONE_DAY:
+        if old_stat.st_mtime < now - BUMP_TIMESTAMP_INTERVAL:
             os.utime(path, (now, now))
 
     def clear_old_entries(self):
@@ -688,7 +807,9 @@ class DSymCache(object):
             return
 
         cutoff = int(time.time()) - ONE_DAY_AND_A_HALF
+        max_size = options.get('dsym.cache-max-size')
 
+        entries = []
         for cache_folder in cache_folders:
             cache_folder = os.path.join(self.cache_path, cache_folder)
             try:
@@ -698,14 +819,31 @@ class DSymCache(object):
             for cached_file in items:
                 cached_file = os.path.join(cache_folder, cached_file)
                 try:
-                    mtime = os.path.getmtime(cached_file)
+                    stat = os.stat(cached_file)
                 except OSError:
                     continue
-                if mtime < cutoff:
+                if stat.st_mtime < cutoff:
                     try:
                         os.remove(cached_file)
                     except OSError:
                         pass
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, cached_file))
+
+        if not max_size:
+            return
+
+        # Evict the least recently used files until the cache fits into
+        # its size budget again.
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, cached_file in sorted(entries):
+            if total_size <= max_size:
+                break
+            try:
+                os.remove(cached_file)
+            except OSError:
+                continue
+            total_size -= size
 
 
 ProjectDSymFile.dsymcache = DSymCache()
@@ -269,6 +269,22 @@ class Event(Model):
 
         return self._environment_cache
 
+    def get_release(self):
+        from sentry.models import Release
+
+        if not hasattr(self, '_release_cache'):
+            version = self.get_tag('sentry:release')
+            try:
+                self._release_cache = Release.objects.get(
+                    projects=self.project,
+                    organization_id=self.project.organization_id,
+                    version=version,
+                ) if version else None
+            except Release.DoesNotExist:
+                self._release_cache = None
+
+        return self._release_cache
+
 
 class EventSubjectTemplate(string.Template):
     idpattern = r'(tag:)?[_a-z][_a-z0-9]*'
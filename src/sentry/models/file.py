@@ -11,7 +11,10 @@ from __future__ import absolute_import
 import os
 import six
 import mmap
+import time
+import logging
 import tempfile
+import threading
 
 from hashlib import sha1
 from uuid import uuid4
@@ -21,7 +24,7 @@ from django.conf import settings
 from django.core.files.base import File as FileObj
 from django.core.files.base import ContentFile
 from django.core.files.storage import get_storage_class
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from jsonfield import JSONField
 
@@ -30,10 +33,18 @@ from sentry.db.models import (BoundedPositiveIntegerField, FlexibleForeignKey, M
 from sentry.utils import metrics
 from sentry.utils.retries import TimedRetryPolicy
 
+logger = logging.getLogger(__name__)
+
 ONE_DAY = 60 * 60 * 24
 
 DEFAULT_BLOB_SIZE = 1024 * 1024  # one mb
+# number of blobs that are hashed, looked up and uploaded together
+BLOB_BATCH_SIZE = 32
+# number of concurrent uploads of missing blobs to the storage
+BLOB_UPLOAD_WORKERS = 8
 CHUNK_STATE_HEADER = '__state'
+# cached blobs are only touched this often to mark them as recently used
+BLOB_CACHE_BUMP_INTERVAL = 60 * 60
 
 
 def enum(**named_values):
@@ -67,6 +78,153 @@ def get_storage():
     return storage(**options)
 
 
+class FileBlobCache(object):
+    """
+    Read-through cache of blobs on the local disk.
+
+    Blobs are immutable and addressed by their checksum, so cached copies
+    never need to be invalidated. Files are written to a temporary location,
+    verified against the checksum and then atomically moved into place.
+    Once more than a tenth of the budget was written, the least recently
+    used files are evicted until the cache fits into
+    ``filestore.cache-max-size`` again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bytes_written = 0
+
+    @property
+    def cache_path(self):
+        from sentry import options
+        return options.get('filestore.cache-path') or None
+
+    def get_cachefile_path(self, checksum):
+        return os.path.join(self.cache_path, checksum[:2], checksum)
+
+    def open(self, blob):
+        """
+        Return an open file object with the contents of the blob, fetching
+        it from the storage into the cache on a miss. Returns `None` if the
+        cache is disabled or the blob could not be cached.
+        """
+        if self.cache_path is None:
+            return None
+
+        path = self.get_cachefile_path(blob.checksum)
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            pass
+        else:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == blob.size:
+                metrics.incr('filestore.cache', tags={'result': 'hit'})
+                self._try_bump_timestamp(path, stat)
+                return f
+            f.close()
+
+        metrics.incr('filestore.cache', tags={'result': 'miss'})
+        try:
+            return self._store(blob, path)
+        except (IOError, OSError):
+            logger.warning('filestore.cache.write-failed', exc_info=True)
+            return None
+
+    def _store(self, blob, path):
+        base = os.path.dirname(path)
+        try:
+            os.makedirs(base)
+        except OSError:
+            pass
+
+        fd, tmp = tempfile.mkstemp(prefix='._blob-', dir=base)
+        try:
+            size = 0
+            checksum = sha1(b'')
+            with os.fdopen(fd, 'wb') as dst:
+                with get_storage().open(blob.path) as src:
+                    for chunk in src.chunks():
+                        size += len(chunk)
+                        checksum.update(chunk)
+                        dst.write(chunk)
+
+            if checksum.hexdigest() != blob.checksum:
+                logger.error('filestore.cache.checksum-mismatch',
+                             extra={'checksum': blob.checksum})
+                return None
+
+            # Keep a handle to the file in case it is evicted right away
+            rv = open(tmp, 'rb')
+            os.rename(tmp, path)
+        finally:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+        self._record_write(size)
+        return rv
+
+    def _try_bump_timestamp(self, path, old_stat):
+        now = int(time.time())
+        if old_stat.st_mtime < now - BLOB_CACHE_BUMP_INTERVAL:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+
+    def _record_write(self, size):
+        from sentry import options
+        max_size = options.get('filestore.cache-max-size')
+        if not max_size:
+            return
+
+        with self._lock:
+            self._bytes_written += size
+            if self._bytes_written < max_size // 10:
+                return
+            self._bytes_written = 0
+        self.clear_old_entries()
+
+    def clear_old_entries(self):
+        from sentry import options
+        max_size = options.get('filestore.cache-max-size')
+        cache_path = self.cache_path
+        if not max_size or cache_path is None:
+            return
+
+        try:
+            cache_folders = os.listdir(cache_path)
+        except OSError:
+            return
+
+        entries = []
+        for cache_folder in cache_folders:
+            cache_folder = os.path.join(cache_path, cache_folder)
+            try:
+                items = os.listdir(cache_folder)
+            except OSError:
+                continue
+            for cached_file in items:
+                cached_file = os.path.join(cache_folder, cached_file)
+                try:
+                    stat = os.stat(cached_file)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, cached_file))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, cached_file in sorted(entries):
+            if total_size <= max_size:
+                break
+            try:
+                os.remove(cached_file)
+            except OSError:
+                continue
+            total_size -= size
+
+
 class FileBlob(Model):
     __core__ = False
 
@@ -122,6 +280,54 @@ class FileBlob(Model):
         metrics.timing('filestore.blob-size', size)
         return blob
 
+    @classmethod
+    def from_chunks(cls, chunks):
+        """
+        Retrieve a list of FileBlob instances for the given chunks of data, in
+        the same order.
+
+        All chunks are looked up with a single query and only the ones that
+        are not already present are stored, concurrently.
+
+        >>> blobs = FileBlob.from_chunks([b'foo', b'bar'])
+        """
+        checksums = [sha1(chunk).hexdigest() for chunk in chunks]
+        blobs = {
+            blob.checksum: blob
+            for blob in cls.objects.filter(checksum__in=set(checksums))
+        }
+
+        missing = {}
+        for checksum, chunk in six.moves.zip(checksums, chunks):
+            if checksum not in blobs and checksum not in missing:
+                blob = cls(size=len(chunk), checksum=checksum)
+                blob.path = cls.generate_unique_path(blob.timestamp)
+                missing[checksum] = (blob, chunk)
+
+        if missing:
+            def upload(blob, chunk):
+                get_storage().save(blob.path, ContentFile(chunk))
+
+            with ThreadPoolExecutor(max_workers=BLOB_UPLOAD_WORKERS) as exe:
+                futures = [exe.submit(upload, blob, chunk)
+                           for blob, chunk in six.itervalues(missing)]
+            for future in futures:
+                future.result()
+
+            for blob, chunk in six.itervalues(missing):
+                try:
+                    with transaction.atomic():
+                        blob.save()
+                except IntegrityError:
+                    # The same blob was stored concurrently, use that one
+                    get_storage().delete(blob.path)
+                    blob = cls.objects.get(checksum=blob.checksum)
+                else:
+                    metrics.timing('filestore.blob-size', blob.size)
+                blobs[blob.checksum] = blob
+
+        return [blobs[checksum] for checksum in checksums]
+
     @classmethod
     def generate_unique_path(cls, timestamp):
         pieces = [six.text_type(x) for x in divmod(int(timestamp.strftime('%s')), ONE_DAY)]
@@ -156,10 +362,17 @@ class FileBlob(Model):
         """
         assert self.path
 
+        f = self.blobcache.open(self)
+        if f is not None:
+            return FileObj(f)
+
         storage = get_storage()
         return storage.open(self.path)
 
 
+FileBlob.blobcache = FileBlobCache()
+
+
 class File(Model):
     __core__ = False
 
@@ -242,6 +455,9 @@ class File(Model):
         """
         Save a fileobj into a number of chunks.
 
+        Chunks are stored in batches of ``BLOB_BATCH_SIZE`` blobs, uploading
+        the ones not already present concurrently.
+
         Returns a list of `FileBlobIndex` items.
 
         >>> indexes = file.putfile(fileobj)
@@ -250,21 +466,29 @@ class File(Model):
         offset = 0
         checksum = sha1(b'')
 
-        while True:
-            contents = fileobj.read(blob_size)
-            if not contents:
+        eof = False
+        while not eof:
+            chunks = []
+            while len(chunks) < BLOB_BATCH_SIZE:
+                contents = fileobj.read(blob_size)
+                if not contents:
+                    eof = True
+                    break
+                checksum.update(contents)
+                chunks.append(contents)
+
+            if not chunks:
                 break
-            checksum.update(contents)
 
-            blob_fileobj = ContentFile(contents)
-            blob = FileBlob.from_file(blob_fileobj)
+            for blob in FileBlob.from_chunks(chunks):
+                results.append(FileBlobIndex(
+                    file=self,
+                    blob=blob,
+                    offset=offset,
+                ))
+                offset += blob.size
 
-            results.append(FileBlobIndex.objects.create(
-                file=self,
-                blob=blob,
-                offset=offset,
-            ))
-            offset += blob.size
+        FileBlobIndex.objects.bulk_create(results)
         self.size = offset
         self.checksum = checksum.hexdigest()
         metrics.timing('filestore.file-size', offset)
@@ -277,35 +501,39 @@ class File(Model):
         This creates a file, from file blobs and returns a temp file with the
         contents.
         """
-        tf = tempfile.NamedTemporaryFile()
         with transaction.atomic():
             file_blobs = FileBlob.objects.filter(id__in=file_blob_ids).all()
             # Make sure the blobs are sorted with the order provided
             file_blobs = sorted(file_blobs, key=lambda blob: file_blob_ids.index(blob.id))
 
-            new_checksum = sha1(b'')
+            indexes = []
             offset = 0
             for blob in file_blobs:
-                FileBlobIndex.objects.create(
+                indexes.append(FileBlobIndex(
                     file=self,
                     blob=blob,
                     offset=offset,
-                )
-                for chunk in blob.getfile().chunks():
-                    new_checksum.update(chunk)
-                    tf.write(chunk)
+                ))
                 offset += blob.size
+            FileBlobIndex.objects.bulk_create(indexes)
+
+            # Fetches all blobs concurrently
+            tf = ChunkedFileBlobIndexWrapper(indexes, prefetch=True).detach_tempfile()
+
+            new_checksum = sha1(b'')
+            for chunk in iter(lambda: tf.read(DEFAULT_BLOB_SIZE), b''):
+                new_checksum.update(chunk)
 
             self.size = offset
             self.checksum = new_checksum.hexdigest()
 
             if checksum != self.checksum:
+                tf.close()
                 raise AssembleChecksumMismatch('Checksum mismatch')
 
         metrics.timing('filestore.file-size', offset)
         if commit:
             self.save()
-        tf.flush()
         tf.seek(0)
         return tf
 
@@ -391,8 +619,21 @@ class ChunkedFileBlobIndexWrapper(object):
 
         mem = mmap.mmap(f.fileno(), size)
 
-        def fetch_file(offset, getfile):
-            with getfile() as sf:
+        def fetch_file(offset, blob):
+            cached = FileBlob.blobcache.open(blob)
+            if cached is not None:
+                # Map the cached blob and copy it over in one go rather
+                # than streaming it through intermediate read buffers.
+                with cached:
+                    if blob.size:
+                        src = mmap.mmap(cached.fileno(), 0, access=mmap.ACCESS_READ)
+                        try:
+                            mem[offset:offset + blob.size] = src[:]
+                        finally:
+                            src.close()
+                return
+
+            with blob.getfile() as sf:
                 while 1:
                     chunk = sf.read(65535)
                     if not chunk:
@@ -401,8 +642,10 @@ class ChunkedFileBlobIndexWrapper(object):
                     offset += len(chunk)
 
         with ThreadPoolExecutor(max_workers=4) as exe:
-            for idx in self._indexes:
-                exe.submit(fetch_file, idx.offset, idx.blob.getfile)
+            futures = [exe.submit(fetch_file, idx.offset, idx.blob)
+                       for idx in self._indexes]
+        for future in futures:
+            future.result()
 
         mem.flush()
         self._curfile = f
@@ -9,7 +9,7 @@ from __future__ import absolute_import
 import six
 
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
 from sentry.db.models import FlexibleForeignKey, Model, sane_repr, \
@@ -92,6 +92,117 @@ class GroupAssigneeManager(BaseManager):
             )
             activity.send_notification()
 
+    def bulk_assign(self, group_list, assigned_to, acting_user=None):
+        """
+        Assign a list of issues, writing each kind of change with a single
+        query and sending all notifications from a single task.
+        """
+        from sentry.models import User, Team, GroupSubscription, GroupSubscriptionReason
+
+        if isinstance(assigned_to, User):
+            user_ids = [assigned_to.id]
+            assignee_type = 'user'
+            other_type = 'team'
+        elif isinstance(assigned_to, Team):
+            user_ids = list(assigned_to.member_set.values_list('user_id', flat=True))
+            assignee_type = 'team'
+            other_type = 'user'
+        else:
+            raise AssertionError('Invalid type to assign to: %r' % type(assigned_to))
+
+        GroupSubscription.objects.bulk_subscribe_groups(
+            group_list,
+            user_ids,
+            reason=GroupSubscriptionReason.assigned,
+        )
+
+        now = timezone.now()
+        existing = dict(GroupAssignee.objects.filter(
+            group__in=group_list,
+        ).values_list('group_id', '{}_id'.format(assignee_type)))
+
+        changed = [g for g in group_list if g.id in existing and existing[g.id] != assigned_to.id]
+        created = [g for g in group_list if g.id not in existing]
+
+        if changed:
+            GroupAssignee.objects.filter(
+                group__in=changed,
+            ).update(**{
+                assignee_type: assigned_to,
+                other_type: None,
+                'date_added': now,
+            })
+
+        try:
+            with transaction.atomic():
+                GroupAssignee.objects.bulk_create([
+                    GroupAssignee(**{
+                        'project_id': group.project_id,
+                        'group': group,
+                        assignee_type: assigned_to,
+                        'date_added': now,
+                    }) for group in created
+                ])
+        except IntegrityError:
+            # Some of the issues were assigned concurrently, so the new
+            # assignments are made one at a time.
+            for group in created:
+                self.assign(group, assigned_to, acting_user)
+            created = []
+
+        for group in created:
+            issue_assigned.send(project=group.project, group=group, sender=acting_user)
+
+        self._bulk_create_activity(changed + created, Activity.ASSIGNED, acting_user, {
+            'assignee': six.text_type(assigned_to.id),
+            'assigneeEmail': getattr(assigned_to, 'email', None),
+            'assigneeType': assignee_type,
+        })
+
+    def bulk_deassign(self, group_list, acting_user=None):
+        affected = set(GroupAssignee.objects.filter(
+            group__in=group_list,
+        ).values_list('group_id', flat=True))
+        if not affected:
+            return
+
+        GroupAssignee.objects.filter(
+            group__in=affected,
+        ).delete()
+
+        self._bulk_create_activity(
+            [group for group in group_list if group.id in affected],
+            Activity.UNASSIGNED,
+            acting_user,
+        )
+
+    def _bulk_create_activity(self, group_list, type, acting_user, data=None):
+        from sentry.tasks.activity import send_bulk_activity_notifications
+
+        if not group_list:
+            return
+
+        now = timezone.now()
+        Activity.objects.bulk_create([
+            Activity(
+                project_id=group.project_id,
+                group=group,
+                type=type,
+                user=acting_user,
+                data=dict(data) if data is not None else None,
+                datetime=now,
+            ) for group in group_list
+        ])
+
+        # ``bulk_create`` does not return the ids of the new rows.
+        activity_ids = list(Activity.objects.filter(
+            group__in=group_list,
+            type=type,
+            user=acting_user,
+            datetime=now,
+        ).values_list('id', flat=True))
+        send_bulk_activity_notifications.delay(activity_ids)
+
 
 class GroupAssignee(Model):
     """
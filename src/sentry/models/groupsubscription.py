@@ -143,6 +143,44 @@ class GroupSubscriptionManager(BaseManager):
                 if i == 0:
                     raise e
 
+    def bulk_subscribe_groups(self, group_list, user_ids,
+                              reason=GroupSubscriptionReason.unknown):
+        """
+        Subscribe a list of user ids to a list of issues, but only to the
+        issues the users have not explicitly unsubscribed from.
+        """
+        user_ids = set(user_ids)
+
+        # 5 retries for race conditions where
+        # concurrent subscription attempts cause integrity errors
+        for i in range(4, -1, -1):  # 4 3 2 1 0
+
+            existing_subscriptions = set(GroupSubscription.objects.filter(
+                user_id__in=user_ids,
+                group__in=group_list,
+            ).values_list('group_id', 'user_id'))
+
+            subscriptions = [
+                GroupSubscription(
+                    user_id=user_id,
+                    group=group,
+                    project_id=group.project_id,
+                    is_active=True,
+                    reason=reason,
+                )
+                for group in group_list
+                for user_id in user_ids
+                if (group.id, user_id) not in existing_subscriptions
+            ]
+
+            try:
+                with transaction.atomic():
+                    self.bulk_create(subscriptions)
+                    return True
+            except IntegrityError as e:
+                if i == 0:
+                    raise e
+
     def get_participants(self, group):
         """
         Identify all users who are participating with a given issue.
@@ -0,0 +1,134 @@
+"""
+sentry.nodestore.cache.backend
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2017 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+
+from __future__ import absolute_import
+
+import logging
+
+import six
+
+from django.core.cache import caches
+
+from sentry.nodestore import codec
+from sentry.nodestore.base import NodeStorage
+from sentry.utils import metrics
+from sentry.utils.imports import import_string
+
+__all__ = ('CachedNodeStorage', )
+
+logger = logging.getLogger(__name__)
+
+
+class CachedNodeStorage(NodeStorage):
+    """
+    A backend which wraps another backend and keeps recently written and
+    read nodes in a Django cache.
+
+    Writes go to the wrapped backend first and are then written through to
+    the cache. Reads are served from the cache, and all misses are fetched
+    from the wrapped backend in a single batch. Nodes which are larger than
+    ``max_node_size`` bytes once serialized are never cached.
+
+    >>> CachedNodeStorage(
+    >>>     backend='sentry.nodestore.riak.backend.RiakNodeStorage',
+    >>>     backend_options={'nodes': [{'host': '127.0.0.1', 'http_port': 8098}]},
+    >>>     cache='default',
+    >>>     ttl=60 * 10,
+    >>> )
+    """
+
+    def __init__(self, backend, backend_options=None, cache='default',
+                 ttl=60 * 10, max_node_size=1024 * 1024, prefix='nodestore:v1:', **kwargs):
+        if isinstance(backend, six.string_types):
+            backend = import_string(backend)
+        self.backend = backend(**(backend_options or {}))
+        self.cache = caches[cache]
+        self.ttl = ttl
+        self.max_node_size = max_node_size
+        self.prefix = prefix
+        super(CachedNodeStorage, self).__init__(**kwargs)
+
+    def _get_cache_key(self, id):
+        return '%s%s' % (self.prefix, id)
+
+    def _get_cached(self, id_list):
+        keys = {self._get_cache_key(id): id for id in id_list}
+        try:
+            values = self.cache.get_many(list(keys))
+        except Exception:
+            logger.warning('nodestore.cache.get-failed', exc_info=True)
+            return {}
+        return {keys[key]: codec.decode(value) for key, value in six.iteritems(values)}
+
+    def _set_cached(self, values):
+        to_cache = {}
+        for id, data in six.iteritems(values):
+            if data is None:
+                continue
+            value = codec.encode(data)
+            if len(value) > self.max_node_size:
+                metrics.incr('nodestore.cache.skipped')
+                continue
+            to_cache[self._get_cache_key(id)] = value
+
+        if not to_cache:
+            return
+        try:
+            self.cache.set_many(to_cache, self.ttl)
+        except Exception:
+            logger.warning('nodestore.cache.set-failed', exc_info=True)
+
+    def _delete_cached(self, id_list):
+        try:
+            self.cache.delete_many([self._get_cache_key(id) for id in id_list])
+        except Exception:
+            logger.warning('nodestore.cache.delete-failed', exc_info=True)
+
+    def get(self, id):
+        return self.get_multi([id]).get(id)
+
+    def get_multi(self, id_list):
+        id_list = list(id_list)
+        result = self._get_cached(id_list)
+        missing = [id for id in id_list if id not in result]
+
+        metrics.incr('nodestore.cache', amount=len(result), tags={'result': 'hit'})
+        if not missing:
+            return result
+        metrics.incr('nodestore.cache', amount=len(missing), tags={'result': 'miss'})
+
+        if len(missing) == 1:
+            fetched = {missing[0]: self.backend.get(missing[0])}
+        else:
+            fetched = self.backend.get_multi(missing)
+        self._set_cached(fetched)
+        result.update(fetched)
+        return result
+
+    def set(self, id, data):
+        self.backend.set(id, data)
+        self._set_cached({id: data})
+
+    def set_multi(self, values):
+        self.backend.set_multi(values)
+        self._set_cached(values)
+
+    def delete(self, id):
+        self.backend.delete(id)
+        self._delete_cached([id])
+
+    def delete_multi(self, id_list):
+        self.backend.delete_multi(id_list)
+        self._delete_cached(id_list)
+
+    def cleanup(self, cutoff_timestamp):
+        # Cached nodes expire on their own well before any cutoff.
+        self.backend.cleanup(cutoff_timestamp)
+
+    def validate(self):
+        self.backend.validate()
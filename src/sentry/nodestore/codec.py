@@ -0,0 +1,278 @@
+"""
+sentry.nodestore.codec
+~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2017 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+
+from __future__ import absolute_import
+
+import re
+import six
+import zlib
+import base64
+import struct
+
+from collections import defaultdict
+from simplejson import JSONEncoder, _default_decoder
+
+from django.conf import settings
+
+from sentry.utils.compat import pickle
+from sentry.utils.imports import import_string
+from sentry.utils.strings import compress, decompress
+
+__all__ = (
+    'NodeCodec', 'PickleNodeCodec', 'CompactNodeCodec', 'get_codec', 'encode', 'decode',
+    'encode_text', 'decode_text', 'get_sdk_name', 'train_dictionary',
+)
+
+# Payloads written by ``CompactNodeCodec`` start with this marker, followed by
+# the format version and the id of the dictionary they were compressed with.
+# Legacy payloads are plain zlib streams, which never start with it.
+MAGIC = b'\x8eN'
+HEADER = struct.Struct('!2sBB')
+VERSION = 1
+
+# Text columns can not hold binary data, so compact payloads are base64
+# encoded behind this prefix. It is not part of the base64 alphabet which is
+# used by the legacy format.
+TEXT_PREFIX = u'!'
+
+# zlib only looks back 32k, so any larger dictionary would be wasted.
+MAX_DICTIONARY_SIZE = 32 * 1024
+
+json_dumps = JSONEncoder(
+    separators=(',', ':'),
+    ensure_ascii=False,
+    encoding='utf-8',
+    default=None,
+).encode
+
+json_loads = _default_decoder.decode
+
+
+def _serialize(data):
+    value = json_dumps(data)
+    if isinstance(value, six.text_type):
+        value = value.encode('utf-8')
+    return value
+
+
+class NodeCodec(object):
+    """
+    Converts node data to bytes and back.
+    """
+
+    def encode(self, data):
+        raise NotImplementedError
+
+    def decode(self, value):
+        raise NotImplementedError
+
+
+class PickleNodeCodec(NodeCodec):
+    """
+    The original format, zlib compressed pickles. New payloads use the
+    binary pickle protocol, the protocol of older payloads is detected when
+    they are loaded.
+    """
+
+    def encode(self, data):
+        return zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    def decode(self, value):
+        return pickle.loads(zlib.decompress(value))
+
+
+class Dictionary(object):
+    """
+    A zlib preset dictionary.
+
+    Python 2's zlib does not support preset dictionaries, so they are
+    emulated by compressing the dictionary once and handing out copies of
+    the primed (de)compressor. The primed prefix is never stored.
+    """
+
+    def __init__(self, id, data, level=zlib.Z_BEST_COMPRESSION):
+        assert 0 < id < 256, 'dictionary ids need to fit into a byte'
+        self.id = id
+        self.data = data[-MAX_DICTIONARY_SIZE:]
+        self.level = level
+
+        compressor = zlib.compressobj(level)
+        prefix = compressor.compress(self.data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        self._compressor = compressor
+
+        decompressor = zlib.decompressobj()
+        decompressor.decompress(prefix)
+        self._decompressor = decompressor
+
+    @classmethod
+    def from_file(cls, id, path, level=zlib.Z_BEST_COMPRESSION):
+        with open(path, 'rb') as f:
+            return cls(id, f.read(), level)
+
+    def compress(self, value):
+        compressor = self._compressor.copy()
+        return compressor.compress(value) + compressor.flush()
+
+    def decompress(self, value):
+        decompressor = self._decompressor.copy()
+        return decompressor.decompress(value) + decompressor.flush()
+
+
+class CompactNodeCodec(NodeCodec):
+    """
+    Stores node data as compact JSON, compressed with a dictionary trained
+    on payloads of the same SDK where one is available.
+
+    Data that can not be represented as JSON falls back to the legacy
+    format. Either format can be decoded.
+
+    >>> CompactNodeCodec(dictionaries={
+    >>>     1: {'sdk': 'raven-python', 'path': '/etc/sentry/dicts/raven-python-1'},
+    >>> })
+    """
+
+    def __init__(self, dictionaries=None, level=6):
+        self.level = level
+        self.dictionaries = {}
+        self.sdk_dictionaries = {}
+        self.fallback = PickleNodeCodec()
+        for id, config in six.iteritems(dictionaries or {}):
+            dictionary = Dictionary.from_file(id, config['path'], level)
+            self.dictionaries[id] = dictionary
+            # new payloads always use the latest dictionary of an SDK
+            sdk = config.get('sdk')
+            current = self.sdk_dictionaries.get(sdk)
+            if current is None or current.id < id:
+                self.sdk_dictionaries[sdk] = dictionary
+
+    def encode(self, data):
+        try:
+            value = _serialize(data)
+        except (TypeError, ValueError):
+            return self.fallback.encode(data)
+
+        dictionary = self.sdk_dictionaries.get(get_sdk_name(data))
+        if dictionary is None:
+            return HEADER.pack(MAGIC, VERSION, 0) + zlib.compress(value, self.level)
+        return HEADER.pack(MAGIC, VERSION, dictionary.id) + dictionary.compress(value)
+
+    def decode(self, value):
+        if not value.startswith(MAGIC):
+            return self.fallback.decode(value)
+
+        _, version, dictionary_id = HEADER.unpack_from(value)
+        if version != VERSION:
+            raise ValueError('Unknown node format version %d' % version)
+
+        payload = value[HEADER.size:]
+        if dictionary_id:
+            try:
+                payload = self.dictionaries[dictionary_id].decompress(payload)
+            except KeyError:
+                raise ValueError('Unknown node dictionary %d' % dictionary_id)
+        else:
+            payload = zlib.decompress(payload)
+        return json_loads(payload.decode('utf-8'))
+
+
+def get_sdk_name(data):
+    sdk = data.get('sdk') if isinstance(data, dict) else None
+    if isinstance(sdk, dict):
+        return sdk.get('name')
+    return None
+
+
+_codec = None
+_compact_codec = None
+
+
+def get_codec():
+    global _codec
+    if _codec is None:
+        cls = import_string(settings.SENTRY_NODESTORE_CODEC)
+        _codec = cls(**settings.SENTRY_NODESTORE_CODEC_OPTIONS)
+    return _codec
+
+
+def get_compact_codec():
+    """
+    Return a codec which can decode compact payloads, even if another codec
+    is configured. Dictionaries are still taken from the codec options.
+    """
+    global _compact_codec
+    codec = get_codec()
+    if isinstance(codec, CompactNodeCodec):
+        return codec
+    if _compact_codec is None:
+        _compact_codec = CompactNodeCodec(
+            dictionaries=settings.SENTRY_NODESTORE_CODEC_OPTIONS.get('dictionaries'),
+        )
+    return _compact_codec
+
+
+def encode(data):
+    return get_codec().encode(data)
+
+
+def decode(value):
+    # payloads written while the compact codec was configured stay readable
+    # after switching back to another codec
+    if value.startswith(MAGIC):
+        return get_compact_codec().decode(value)
+    return get_codec().decode(value)
+
+
+def encode_text(data):
+    """
+    Like ``encode`` but for backends that can only store text.
+    """
+    codec = get_codec()
+    if isinstance(codec, PickleNodeCodec):
+        # keep producing exactly what older versions wrote
+        return compress(pickle.dumps(data))
+    return TEXT_PREFIX + base64.b64encode(codec.encode(data)).decode('ascii')
+
+
+def decode_text(value):
+    if value.startswith(TEXT_PREFIX):
+        return decode(base64.b64decode(value[len(TEXT_PREFIX):]))
+    return pickle.loads(decompress(value))
+
+
+_token_re = re.compile(r'"(?:[^"\\]|\\.)*"\s*:\s*(?:"(?:[^"\\]|\\.)*"|[^,{}\[\]"]+|\{|\[)')
+
+
+def train_dictionary(samples, size=MAX_DICTIONARY_SIZE):
+    """
+    Build a compression dictionary out of the given node payloads.
+
+    Every key/value fragment of the serialized payloads is scored by how
+    many payloads contain it and how long it is. The best fragments are
+    kept, with the most valuable last as those are the cheapest to refer
+    to from compressed data.
+    """
+    counts = defaultdict(int)
+    for data in samples:
+        for fragment in set(_token_re.findall(_serialize(data).decode('utf-8'))):
+            counts[fragment.encode('utf-8')] += 1
+
+    # fragments seen only once do not generalize to other payloads
+    scored = sorted(
+        ((count * len(fragment), fragment) for fragment, count in six.iteritems(counts)
+         if count > 1),
+        reverse=True,
+    )
+
+    chosen = []
+    total = 0
+    for _, fragment in scored:
+        if total + len(fragment) > size:
+            continue
+        chosen.append(fragment)
+        total += len(fragment)
+    return b''.join(reversed(chosen))
@@ -8,10 +8,48 @@ sentry.nodestore.django.models
 
 from __future__ import absolute_import
 
+import logging
+import six
+
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
 from sentry.db.models import (BaseModel, GzippedDictField, sane_repr)
+from sentry.nodestore import codec
+
+logger = logging.getLogger('sentry')
+
+
+class NodeDataField(GzippedDictField):
+    """
+    Stores node data in the format of the configured node codec.
+    """
+
+    def to_python(self, value):
+        if isinstance(value, six.string_types) and value:
+            try:
+                value = codec.decode_text(value)
+            except Exception as e:
+                logger.exception(e)
+                return {}
+        elif not value:
+            return {}
+        return value
+
+    def get_prep_value(self, value):
+        if not value and self.null:
+            return None
+        return codec.encode_text(value)
+
+
+if hasattr(models, 'SubfieldBase'):
+    NodeDataField = six.add_metaclass(models.SubfieldBase)(NodeDataField)
+
+if 'south' in settings.INSTALLED_APPS:
+    from south.modelsinspector import add_introspection_rules
+
+    add_introspection_rules([], ["^sentry\.nodestore\.django\.models\.NodeDataField"])
 
 
 class Node(BaseModel):
@@ -20,7 +58,7 @@ class Node(BaseModel):
     id = models.CharField(max_length=40, primary_key=True)
     # TODO(dcramer): this being pickle and not JSON has the ability to cause
     # hard errors as it accepts other serialization than native JSON
-    data = GzippedDictField()
+    data = NodeDataField()
     timestamp = models.DateTimeField(default=timezone.now, db_index=True)
 
     __repr__ = sane_repr('timestamp')
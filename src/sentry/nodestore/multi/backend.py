@@ -8,13 +8,32 @@ sentry.nodestore.multi.backend
 
 from __future__ import absolute_import
 
+import logging
 import random
+from collections import deque
+from functools import partial
+from time import time
 
 import six
+from concurrent.futures import FIRST_COMPLETED, TimeoutError, wait
 
 from sentry.nodestore.base import NodeStorage
+from sentry.utils import metrics
+from sentry.utils.concurrent import SynchronousExecutor, ThreadedExecutor
+from sentry.utils.db import close_connections_after
 from sentry.utils.imports import import_string
 
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadedExecutor(worker_count=16)
+    return _executor
+
 
 class MultiNodeStorage(NodeStorage):
     """
@@ -24,13 +43,21 @@ class MultiNodeStorage(NodeStorage):
     This is not intended for consistency, but is instead designed to allow you
     to dual-write for purposes of migrations.
 
+    Writes go to all backends concurrently and fail if any backend fails or
+    does not finish within ``write_timeout`` seconds. With ``hedge_reads``
+    enabled, a read is also sent to a second backend if the first one fails
+    or has not answered within the ``hedge_percentile`` of its recent
+    latencies, and the first successful answer is used.
+
     >>> MultiNodeStorage(backends=[
     >>>     ('sentry.nodestore.django.backend.DjangoNodeStorage', {}),
     >>>     ('sentry.nodestore.riak.backend.RiakNodeStorage', {}),
     >>> ], read_selector=lambda backends: backends[0])
     """
 
-    def __init__(self, backends, read_selector=random.choice, **kwargs):
+    def __init__(self, backends, read_selector=random.choice, write_timeout=None,
+                 hedge_reads=False, hedge_percentile=95, hedge_min_delay=0.01,
+                 **kwargs):
         assert backends, "you should provide at least one backend"
 
         self.backends = []
@@ -39,49 +66,141 @@ class MultiNodeStorage(NodeStorage):
                 backend = import_string(backend)
             self.backends.append(backend(**backend_options))
         self.read_selector = read_selector
+        self.write_timeout = write_timeout
+        self.hedge_reads = hedge_reads
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        # recent read latencies of every backend
+        self.latencies = [deque(maxlen=200) for _ in self.backends]
+        self.inline = [self._uses_database(backend) for backend in self.backends]
         super(MultiNodeStorage, self).__init__(**kwargs)
 
+    def _get_backend_name(self, backend):
+        return type(backend).__name__
+
+    def _uses_database(self, backend):
+        from sentry.nodestore.django.backend import DjangoNodeStorage
+
+        # follow backends wrapping another one, such as CachedNodeStorage
+        while backend is not None:
+            if isinstance(backend, DjangoNodeStorage):
+                return True
+            backend = getattr(backend, 'backend', None)
+        return False
+
+    def _submit(self, index, func):
+        if self.inline[index]:
+            return SynchronousExecutor().submit(func)
+        return get_executor().submit(close_connections_after(func))
+
+    def _write(self, method, *args):
+        if len(self.backends) == 1:
+            return getattr(self.backends[0], method)(*args)
+
+        # start the pool writes before blocking on the inline ones
+        indexes = sorted(range(len(self.backends)), key=lambda i: self.inline[i])
+        futures = {
+            i: self._submit(i, partial(getattr(self.backends[i], method), *args))
+            for i in indexes
+        }
+        _, not_done = wait(futures.values(), timeout=self.write_timeout)
+        for future in not_done:
+            future.cancel()
+
+        error = None
+        for i, backend in enumerate(self.backends):
+            future = futures[i]
+            tags = {'backend': self._get_backend_name(backend), 'method': method}
+            if not future.done() or future.cancelled():
+                metrics.incr('nodestore.multi.timeout', tags=tags)
+                exc = TimeoutError('%s.%s timed out' % (tags['backend'], method))
+                exc_info = (TimeoutError, exc, None)
+            else:
+                started, finished = future.get_timing()
+                metrics.timing('nodestore.multi.duration', finished - started, tags=tags)
+                exc, tb = future.exception_info()
+                if exc is None:
+                    continue
+                exc_info = (type(exc), exc, tb)
+
+            metrics.incr('nodestore.multi.error', tags=tags)
+            logger.error('nodestore.multi.write-failed', exc_info=exc_info, extra=tags)
+            if error is None:
+                error = exc_info
+
+        if error is not None:
+            six.reraise(*error)
+
+    def _read(self, method, *args):
+        backend = self.read_selector(self.backends)
+        primary = self.backends.index(backend)
+        if not self.hedge_reads or len(self.backends) == 1 or self.inline[primary]:
+            return getattr(backend, method)(*args)
+
+        futures = {self._submit(primary, self._timed_read(primary, method, *args)): primary}
+
+        done, _ = wait(futures, timeout=self._get_hedge_delay(primary))
+        if not done or any(future.exception() is not None for future in done):
+            secondary = random.choice([i for i in range(len(self.backends)) if i != primary])
+            metrics.incr('nodestore.multi.hedged', tags={
+                'backend': self._get_backend_name(self.backends[secondary]),
+            })
+            # an inline secondary read blocks until it is done
+            futures[self._submit(secondary, self._timed_read(secondary, method, *args))] = secondary
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                exc, tb = future.exception_info()
+                if exc is None:
+                    return future.result()
+                metrics.incr('nodestore.multi.error', tags={
+                    'backend': self._get_backend_name(self.backends[futures[future]]),
+                    'method': method,
+                })
+                if error is None:
+                    error = (type(exc), exc, tb)
+        six.reraise(*error)
+
+    def _timed_read(self, index, method, *args):
+        func = getattr(self.backends[index], method)
+        latencies = self.latencies[index]
+
+        def read():
+            start = time()
+            rv = func(*args)
+            latencies.append(time() - start)
+            return rv
+        return read
+
+    def _get_hedge_delay(self, index):
+        latencies = sorted(self.latencies[index])
+        if not latencies:
+            return self.hedge_min_delay
+        percentile = latencies[min(len(latencies) - 1,
+                                   len(latencies) * self.hedge_percentile // 100)]
+        return max(percentile, self.hedge_min_delay)
+
     def get(self, id):
         # just fetch it from a random backend, we're not aiming for consistency
-        backend = self.read_selector(self.backends)
-        return backend.get(id)
+        return self._read('get', id)
 
     def get_multi(self, id_list):
-        backend = self.read_selector(self.backends)
-        return backend.get_multi(id_list=id_list)
+        return self._read('get_multi', id_list)
 
     def set(self, id, data):
-        should_raise = False
-        for backend in self.backends:
-            try:
-                backend.set(id, data)
-            except Exception:
-                should_raise = True
-
-        if should_raise:
-            raise
+        self._write('set', id, data)
 
     def set_multi(self, values):
-        should_raise = False
-        for backend in self.backends:
-            try:
-                backend.set_multi(values)
-            except Exception:
-                should_raise = True
-
-        if should_raise:
-            raise
+        self._write('set_multi', values)
 
     def delete(self, id):
-        should_raise = False
-        for backend in self.backends:
-            try:
-                backend.delete(id)
-            except Exception:
-                should_raise = True
+        self._write('delete', id)
 
-        if should_raise:
-            raise
+    def delete_multi(self, id_list):
+        self._write('delete_multi', id_list)
 
     def cleanup(self, cutoff_timestamp):
         should_raise = False
@@ -0,0 +1,347 @@
+"""
+sentry.nodestore.segment.backend
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2017 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+
+from __future__ import absolute_import
+
+import calendar
+import errno
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import six
+
+from sentry.exceptions import InvalidConfiguration
+from sentry.nodestore import codec
+from sentry.nodestore.base import NodeStorage
+
+from .index import NodeIndex, hash_id
+
+__all__ = ('SegmentNodeStorage', )
+
+logger = logging.getLogger(__name__)
+
+# magic, creation timestamp
+SEGMENT_HEADER = struct.Struct('!8sQ')
+SEGMENT_MAGIC = b'SNSEG001'
+SEGMENT_SUFFIX = '.seg'
+
+# magic, kind, id length, payload length, crc32 of id and payload
+RECORD = struct.Struct('!2sBHII')
+RECORD_MAGIC = b'NR'
+RECORD_SET = 0
+RECORD_DELETE = 1
+
+
+def _to_bytes(id):
+    if isinstance(id, six.text_type):
+        return id.encode('utf-8')
+    return id
+
+
+def _make_record(kind, id, payload=b''):
+    body = id + payload
+    return RECORD.pack(RECORD_MAGIC, kind, len(id), len(payload),
+                       zlib.crc32(body) & 0xffffffff) + body
+
+
+class SegmentNodeStorage(NodeStorage):
+    """
+    A backend which appends nodes to segment files on the local disk.
+
+    Nodes are encoded with the configured node codec and appended to the
+    current segment, a new segment is started once it grows beyond
+    ``segment_size`` bytes or is older than ``segment_duration`` seconds.
+    The location of every node is kept in a memory mapped hash table
+    shared by all processes, and reads slice the memory mapped segments.
+
+    The index records how far the segments have been indexed. Records
+    written past that point, e.g. by a process which crashed before
+    updating the index, are replayed from the segments by the next writer,
+    and a missing or damaged index is rebuilt from all segments.
+    ``cleanup`` removes whole segments which were last written to before
+    the cutoff. Overwritten and deleted nodes take up space until their
+    segment expires.
+
+    >>> SegmentNodeStorage(path='/var/lib/sentry/nodestore')
+    """
+
+    def __init__(self, path, segment_size=256 * 1024 * 1024, segment_duration=60 * 60,
+                 fsync=False, index_capacity=1 << 16, max_open_segments=64, **kwargs):
+        self.path = path
+        self.segment_size = segment_size
+        self.segment_duration = segment_duration
+        self.fsync = fsync
+        self.max_open_segments = max_open_segments
+        self.index = NodeIndex(os.path.join(path, 'index'), index_capacity)
+        self._segments = OrderedDict()
+        self._lock_file = None
+        super(SegmentNodeStorage, self).__init__(**kwargs)
+
+    def validate(self):
+        try:
+            self._ensure_open()
+        except (IOError, OSError) as e:
+            raise InvalidConfiguration(six.text_type(e))
+
+    def _ensure_open(self):
+        if self._lock_file is not None:
+            return
+
+        try:
+            os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        self._lock_file = open(os.path.join(self.path, 'lock'), 'a')
+
+        # Index everything that was written since the index was last
+        # updated, which rebuilds it entirely if it had to be created.
+        with self._locked(exclusive=True):
+            pass
+
+    @contextmanager
+    def _locked(self, exclusive=False):
+        self._ensure_open()
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            self.index.refresh()
+            if exclusive:
+                self._replay()
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _get_segment_path(self, segment):
+        return os.path.join(self.path, '%08d%s' % (segment, SEGMENT_SUFFIX))
+
+    def _list_segments(self):
+        segments = []
+        for name in os.listdir(self.path):
+            if name.endswith(SEGMENT_SUFFIX):
+                try:
+                    segments.append(int(name[:-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(segments)
+
+    def _map_segment(self, segment, size=0):
+        """
+        Return a read only mapping of the segment which covers at least
+        ``size`` bytes, or ``None`` if the segment does not exist anymore.
+        """
+        mapping = self._segments.pop(segment, None)
+        if mapping is None or len(mapping) < size:
+            if mapping is not None:
+                mapping.close()
+            try:
+                with open(self._get_segment_path(segment), 'rb') as f:
+                    mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (IOError, OSError, ValueError):
+                # gone, or empty and therefore not mappable
+                return None
+            if len(mapping) < size:
+                mapping.close()
+                return None
+
+        self._segments[segment] = mapping
+        while len(self._segments) > self.max_open_segments:
+            self._segments.popitem(last=False)[1].close()
+        return mapping
+
+    def _unmap_segment(self, segment):
+        mapping = self._segments.pop(segment, None)
+        if mapping is not None:
+            mapping.close()
+
+    def _read_record(self, segment, offset, length):
+        mapping = self._map_segment(segment, offset + length)
+        if mapping is None:
+            return None
+        _, kind, id_length, payload_length, _ = RECORD.unpack_from(mapping, offset)
+        start = offset + RECORD.size
+        return (
+            mapping[start:start + id_length],
+            mapping[start + id_length:start + id_length + payload_length],
+        )
+
+    def _lookup(self, id, remove=False):
+        id = _to_bytes(id)
+        found = []
+
+        def verify(segment, offset, length):
+            record = self._read_record(segment, offset, length)
+            if record is None or record[0] != id:
+                return False
+            found.append(record[1])
+            return True
+
+        if remove:
+            return self.index.remove(hash_id(id), verify)
+        if self.index.get(hash_id(id), verify) is None:
+            return None
+        return found[-1]
+
+    def _apply(self, kind, id, segment, offset, length):
+        def verify(s, o, l):
+            record = self._read_record(s, o, l)
+            return record is not None and record[0] == id
+
+        if kind == RECORD_SET:
+            self.index.put(hash_id(id), segment, offset, length, verify)
+        else:
+            self.index.remove(hash_id(id), verify)
+
+    def _replay(self):
+        segment, offset = self.index.watermark
+        segments = [s for s in self._list_segments() if s >= segment]
+        for s in segments:
+            start = offset if s == segment else SEGMENT_HEADER.size
+            end = self._replay_segment(s, start, is_current=s == segments[-1])
+            self.index.set_watermark(s, end)
+
+    def _replay_segment(self, segment, offset, is_current):
+        path = self._get_segment_path(segment)
+        size = os.path.getsize(path)
+        offset = max(offset, SEGMENT_HEADER.size)
+        if size <= offset:
+            return offset
+
+        mapping = self._map_segment(segment, size)
+        if mapping is None:
+            return offset
+
+        while offset + RECORD.size <= size:
+            magic, kind, id_length, payload_length, crc = RECORD.unpack_from(mapping, offset)
+            end = offset + RECORD.size + id_length + payload_length
+            if magic != RECORD_MAGIC or end > size:
+                break
+            body = mapping[offset + RECORD.size:end]
+            if zlib.crc32(body) & 0xffffffff != crc:
+                break
+            self._apply(kind, body[:id_length], segment, offset, end - offset)
+            offset = end
+
+        if offset < size:
+            logger.warning('nodestore.segment.corrupt', extra={
+                'segment': segment,
+                'offset': offset,
+            })
+            if is_current:
+                # Drop the partial write so new records follow valid ones
+                self._unmap_segment(segment)
+                with open(path, 'r+b') as f:
+                    f.truncate(offset)
+        return offset
+
+    def _get_writable_segment(self):
+        segments = self._list_segments()
+        if segments:
+            segment = segments[-1]
+            path = self._get_segment_path(segment)
+            with open(path, 'rb') as f:
+                header = f.read(SEGMENT_HEADER.size)
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+            if len(header) == SEGMENT_HEADER.size:
+                _, created = SEGMENT_HEADER.unpack(header)
+                if size < self.segment_size and created > time.time() - self.segment_duration:
+                    return segment, size
+        else:
+            segment = 0
+
+        segment += 1
+        with open(self._get_segment_path(segment), 'wb') as f:
+            f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, int(time.time())))
+        return segment, SEGMENT_HEADER.size
+
+    def _append(self, records):
+        """
+        Append ``(kind, id, payload)`` records in a single write and index
+        them.
+        """
+        buf = []
+        for kind, id, payload in records:
+            buf.append(_make_record(kind, id, payload))
+
+        with self._locked(exclusive=True):
+            segment, offset = self._get_writable_segment()
+            with open(self._get_segment_path(segment), 'ab') as f:
+                f.write(b''.join(buf))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+            for (kind, id, _), record in zip(records, buf):
+                self._apply(kind, id, segment, offset, len(record))
+                offset += len(record)
+            self.index.set_watermark(segment, offset)
+            if self.fsync:
+                self.index.flush()
+
+    def get(self, id):
+        return self.get_multi([id])[id]
+
+    def get_multi(self, id_list):
+        with self._locked():
+            payloads = [(id, self._lookup(id)) for id in id_list]
+        return {
+            id: codec.decode(payload) if payload is not None else None
+            for id, payload in payloads
+        }
+
+    def set(self, id, data):
+        self.set_multi({id: data})
+
+    def set_multi(self, values):
+        if not values:
+            return
+        self._append([
+            (RECORD_SET, _to_bytes(id), codec.encode(data))
+            for id, data in six.iteritems(values)
+        ])
+
+    def delete(self, id):
+        self.delete_multi([id])
+
+    def delete_multi(self, id_list):
+        if not id_list:
+            return
+        self._append([(RECORD_DELETE, _to_bytes(id), b'') for id in id_list])
+
+    def cleanup(self, cutoff_timestamp):
+        cutoff = calendar.timegm(cutoff_timestamp.utctimetuple())
+        with self._locked(exclusive=True):
+            # The newest segment is kept, its id is needed to continue
+            # numbering segments.
+            expired = set()
+            for segment in self._list_segments()[:-1]:
+                try:
+                    mtime = os.path.getmtime(self._get_segment_path(segment))
+                except OSError:
+                    continue
+                if mtime < cutoff:
+                    expired.add(segment)
+
+            if not expired:
+                return
+
+            self.index.remove_segments(expired)
+            for segment in expired:
+                self._unmap_segment(segment)
+                try:
+                    os.remove(self._get_segment_path(segment))
+                except OSError:
+                    pass
@@ -0,0 +1,240 @@
+"""
+sentry.nodestore.segment.index
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2017 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+
+from __future__ import absolute_import
+
+import mmap
+import os
+import struct
+
+from hashlib import md5
+
+__all__ = ('NodeIndex', 'hash_id')
+
+MAGIC = b'SNINDEX1'
+# magic, capacity, used slots, replayed up to segment, replayed up to offset
+HEADER = struct.Struct('!8sQQIQ')
+HEADER_SIZE = 64
+# key hash, segment, offset, length
+SLOT = struct.Struct('!QIQI')
+
+# Segment ids start at 1, so 0 marks a removed entry. Removed entries keep
+# a hash so lookups continue probing past them.
+TOMBSTONE = 0
+MAX_LOAD = 0.7
+
+
+def hash_id(id):
+    if not isinstance(id, bytes):
+        id = id.encode('utf-8')
+    # 0 marks empty slots
+    return struct.unpack('!Q', md5(id).digest()[:8])[0] or 1
+
+
+class NodeIndex(object):
+    """
+    A memory mapped hash table of node id hash -> (segment, offset, length).
+
+    The table uses open addressing with linear probing and is shared by all
+    processes through the mapping, callers are responsible for locking.
+    Since only hashes are stored, every lookup is passed a ``verify``
+    callback which confirms that a location holds the requested node.
+    """
+
+    def __init__(self, path, initial_capacity=1 << 16):
+        assert initial_capacity & (initial_capacity - 1) == 0, \
+            'capacity needs to be a power of two'
+        self.path = path
+        self.initial_capacity = initial_capacity
+        self._file = None
+        self._mmap = None
+        self._inode = None
+
+    def open(self):
+        """
+        Map the index, creating it if it does not exist or is unreadable.
+        Returns ``True`` if a new, empty index was created.
+        """
+        self.close()
+        created = False
+        try:
+            f = open(self.path, 'r+b')
+        except IOError:
+            f = None
+        if f is not None and not self._is_valid(f):
+            f.close()
+            f = None
+        if f is None:
+            self._create(self.path, self.initial_capacity)
+            f = open(self.path, 'r+b')
+            created = True
+
+        self._file = f
+        self._mmap = mmap.mmap(f.fileno(), 0)
+        self._inode = os.fstat(f.fileno()).st_ino
+        return created
+
+    def refresh(self):
+        """
+        Remap the index if it was replaced by another process.
+        """
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            inode = None
+        if self._mmap is None or inode != self._inode:
+            return self.open()
+        return False
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._inode = None
+
+    def _is_valid(self, f):
+        header = f.read(HEADER.size)
+        if len(header) != HEADER.size:
+            return False
+        magic, capacity, _, _, _ = HEADER.unpack(header)
+        if magic != MAGIC or not capacity or capacity & (capacity - 1):
+            return False
+        f.seek(0, os.SEEK_END)
+        return f.tell() == HEADER_SIZE + capacity * SLOT.size
+
+    @staticmethod
+    def _create(path, capacity, watermark=(0, 0)):
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, capacity, 0, watermark[0], watermark[1]))
+            f.truncate(HEADER_SIZE + capacity * SLOT.size)
+        os.rename(tmp, path)
+
+    def _header(self):
+        return HEADER.unpack_from(self._mmap, 0)
+
+    def _set_header(self, capacity, used, segment, offset):
+        HEADER.pack_into(self._mmap, 0, MAGIC, capacity, used, segment, offset)
+
+    @property
+    def capacity(self):
+        return self._header()[1]
+
+    @property
+    def watermark(self):
+        _, _, _, segment, offset = self._header()
+        return segment, offset
+
+    def set_watermark(self, segment, offset):
+        _, capacity, used, _, _ = self._header()
+        self._set_header(capacity, used, segment, offset)
+
+    def _slot(self, index):
+        return SLOT.unpack_from(self._mmap, HEADER_SIZE + index * SLOT.size)
+
+    def _set_slot(self, index, key_hash, segment, offset, length):
+        SLOT.pack_into(self._mmap, HEADER_SIZE + index * SLOT.size,
+                       key_hash, segment, offset, length)
+
+    def _probe(self, key_hash):
+        mask = self.capacity - 1
+        index = key_hash & mask
+        while True:
+            yield index, self._slot(index)
+            index = (index + 1) & mask
+
+    def get(self, key_hash, verify):
+        for _, (slot_hash, segment, offset, length) in self._probe(key_hash):
+            if not slot_hash:
+                return None
+            if slot_hash == key_hash and segment != TOMBSTONE and \
+                    verify(segment, offset, length):
+                return segment, offset, length
+
+    def put(self, key_hash, segment, offset, length, verify):
+        free = None
+        for index, (slot_hash, s, o, l) in self._probe(key_hash):
+            if not slot_hash:
+                break
+            if s == TOMBSTONE:
+                if free is None:
+                    free = index
+            elif slot_hash == key_hash and verify(s, o, l):
+                self._set_slot(index, key_hash, segment, offset, length)
+                return
+
+        if free is None:
+            _, capacity, used, wm_segment, wm_offset = self._header()
+            if used + 1 > capacity * MAX_LOAD:
+                self.grow()
+                return self.put(key_hash, segment, offset, length, verify)
+            self._set_header(capacity, used + 1, wm_segment, wm_offset)
+            free = index
+        self._set_slot(free, key_hash, segment, offset, length)
+
+    def remove(self, key_hash, verify):
+        for index, (slot_hash, segment, offset, length) in self._probe(key_hash):
+            if not slot_hash:
+                return False
+            if slot_hash == key_hash and segment != TOMBSTONE and \
+                    verify(segment, offset, length):
+                self._set_slot(index, key_hash, TOMBSTONE, 0, 0)
+                return True
+
+    def iter_entries(self):
+        for index in range(self.capacity):
+            slot_hash, segment, offset, length = self._slot(index)
+            if slot_hash and segment != TOMBSTONE:
+                yield index, segment
+
+    def remove_segments(self, segments):
+        """
+        Drop all entries which point into one of the given segments.
+        """
+        for index, segment in list(self.iter_entries()):
+            if segment in segments:
+                slot_hash = self._slot(index)[0]
+                self._set_slot(index, slot_hash, TOMBSTONE, 0, 0)
+
+    def grow(self):
+        """
+        Rehash all live entries into a table which is at most half full,
+        dropping all removed entries. The new table replaces the old one
+        atomically.
+        """
+        _, capacity, _, wm_segment, wm_offset = self._header()
+        entries = [self._slot(index) for index, _ in self.iter_entries()]
+
+        new_capacity = capacity
+        while len(entries) + 1 > new_capacity * MAX_LOAD / 2:
+            new_capacity *= 2
+
+        tmp = '%s.%d.grow' % (self.path, os.getpid())
+        self._create(tmp, new_capacity, (wm_segment, wm_offset))
+        new = NodeIndex(tmp)
+        new.open()
+        try:
+            mask = new_capacity - 1
+            for key_hash, segment, offset, length in entries:
+                index = key_hash & mask
+                while new._slot(index)[0]:
+                    index = (index + 1) & mask
+                new._set_slot(index, key_hash, segment, offset, length)
+            new._set_header(new_capacity, len(entries), wm_segment, wm_offset)
+            new._mmap.flush()
+        finally:
+            new.close()
+
+        os.rename(tmp, self.path)
+        self.open()
+
+    def flush(self):
+        self._mmap.flush()
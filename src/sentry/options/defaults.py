@@ -58,6 +58,8 @@ register('redis.options', type=Dict, flags=FLAG_NOSTORE)
 
 # symbolizer specifics
 register('dsym.cache-path', type=String, default='/tmp/sentry-dsym-cache')
+# Size budget of the dsym cache in bytes (0 for no limit)
+register('dsym.cache-max-size', default=10 * 1024 * 1024 * 1024)
 
 # Mail
 register('mail.backend', default='smtp', flags=FLAG_NOSTORE)
@@ -91,6 +93,28 @@ register(
 )
 
 register('api.rate-limit.org-create', default=5, flags=FLAG_ALLOW_EMPTY | FLAG_PRIORITIZE_DISK)
+# Run the independent queries of the group serializer on a thread pool
+register('api.group-serializer.concurrent-lookups', default=False, flags=FLAG_PRIORITIZE_DISK)
+# Build the independent sections of the group details response on a thread pool
+register('api.group-details.concurrent-sections', default=False, flags=FLAG_PRIORITIZE_DISK)
+# Seconds after which a group details section is left out of the response
+register('api.group-details.section-timeout', default=5.0, flags=FLAG_PRIORITIZE_DISK)
+# Seconds after which a group details section provided by plugins is left out
+register('api.group-details.plugin-section-timeout', default=2.0, flags=FLAG_PRIORITIZE_DISK)
+# How paginators count hits: exact, estimate (planner estimates) or cached
+register('api.paginator.hits-mode', default='exact', flags=FLAG_PRIORITIZE_DISK)
+register('api.paginator.hits-cache-ttl', default=30, flags=FLAG_PRIORITIZE_DISK)
+# Compress API responses for clients which accept gzip (or brotli if installed)
+register('api.response.compression', default=False, flags=FLAG_PRIORITIZE_DISK)
+register('api.response.compression-min-size', default=1024, flags=FLAG_PRIORITIZE_DISK)
+# Serialize and send large API result lists in batches
+register('api.response.streaming', default=False, flags=FLAG_PRIORITIZE_DISK)
+# Cache closed TSDB buckets read by the stats endpoints
+register('api.stats.cache', default=False, flags=FLAG_PRIORITIZE_DISK)
+# Seconds to share reads of buckets which are still open (0 to disable)
+register('api.stats.open-bucket-ttl', default=10, flags=FLAG_PRIORITIZE_DISK)
+# Seconds to share issue stream search results for (0 to disable)
+register('search.result-cache-ttl', default=0, flags=FLAG_PRIORITIZE_DISK)
 
 # Beacon
 
@@ -99,6 +123,10 @@ register('beacon.anonymous', type=Bool, flags=FLAG_REQUIRED)
 # Filestore
 register('filestore.backend', default='filesystem', flags=FLAG_NOSTORE)
 register('filestore.options', default={'location': '/tmp/sentry-files'}, flags=FLAG_NOSTORE)
+# Local read-through cache of blobs, keyed by checksum (empty to disable)
+register('filestore.cache-path', type=String, default='', flags=FLAG_ALLOW_EMPTY | FLAG_NOSTORE)
+# Size budget of the local blob cache in bytes (0 for no limit)
+register('filestore.cache-max-size', default=10 * 1024 * 1024 * 1024, flags=FLAG_NOSTORE)
 
 # Symbol server
 register('symbolserver.enabled', default=False, flags=FLAG_ALLOW_EMPTY | FLAG_PRIORITIZE_DISK)
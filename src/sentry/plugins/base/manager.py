@@ -10,12 +10,23 @@ from __future__ import absolute_import, print_function
 __all__ = ('PluginManager', )
 
 import logging
+import threading
+
+from collections import OrderedDict
 
 from sentry.utils.managers import InstanceManager
 from sentry.utils.safe import safe_execute
 
+# for how many projects the enabled plugins are kept in every process
+ENABLED_CACHE_SIZE = 1000
+
 
 class PluginManager(InstanceManager):
+    def __init__(self, *args, **kwargs):
+        super(PluginManager, self).__init__(*args, **kwargs)
+        self._enabled_cache = OrderedDict()
+        self._enabled_cache_lock = threading.Lock()
+
     def __iter__(self):
         return iter(self.all())
 
@@ -44,11 +55,51 @@ class PluginManager(InstanceManager):
         return False
 
     def for_project(self, project, version=1):
-        for plugin in self.all(version=version):
-            if not safe_execute(plugin.is_enabled, project, _with_transaction=False):
-                continue
+        if project is None:
+            for plugin in self.all(version=version):
+                if not safe_execute(plugin.is_enabled, project, _with_transaction=False):
+                    continue
+                yield plugin
+            return
+
+        for plugin in self._get_enabled_for_project(project, version):
             yield plugin
 
+    def _get_enabled_for_project(self, project, version):
+        """
+        Returns the plugins which are enabled for the project.
+
+        The result is kept along with a hash of the project's options and the
+        registered plugins, so it is recomputed as soon as either of them
+        changes. Only the most recently used projects are kept.
+        """
+        from sentry.models import ProjectOption
+
+        project_options = ProjectOption.objects.get_all_values(project)
+        plugins = list(self.all(version=version))
+        version_hash = hash((
+            repr(sorted(project_options.items())),
+            tuple(id(p) for p in plugins),
+        ))
+
+        local_key = (project.id, version)
+        with self._enabled_cache_lock:
+            cached = self._enabled_cache.pop(local_key, None)
+            if cached is not None and cached[0] == version_hash:
+                self._enabled_cache[local_key] = cached
+                return cached[1]
+
+        enabled = [
+            p for p in plugins
+            if safe_execute(p.is_enabled, project, _with_transaction=False)
+        ]
+
+        with self._enabled_cache_lock:
+            self._enabled_cache[local_key] = (version_hash, enabled)
+            while len(self._enabled_cache) > ENABLED_CACHE_SIZE:
+                self._enabled_cache.popitem(last=False)
+        return enabled
+
     def for_site(self, version=1):
         for plugin in self.all(version=version):
             if not plugin.has_site_conf():
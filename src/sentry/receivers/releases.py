@@ -1,12 +1,13 @@
 from __future__ import absolute_import, print_function
 
 from django.db import IntegrityError, transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 
 from sentry.models import (
-    Activity, Commit, GroupAssignee, GroupLink, Release, PullRequest
+    Activity, Commit, GroupAssignee, GroupLink, Release, ReleaseFile, PullRequest
 )
 from sentry.tasks.clear_expired_resolutions import clear_expired_resolutions
+from sentry.tasks.release_artifacts import schedule_prefetch_release_artifacts
 
 
 def resolve_group_resolutions(instance, created, **kwargs):
@@ -16,6 +17,15 @@ def resolve_group_resolutions(instance, created, **kwargs):
     clear_expired_resolutions.delay(release_id=instance.id)
 
 
+def prefetch_release_artifacts(instance, **kwargs):
+    from sentry.lang.javascript.processor import invalidate_release_artifact_index
+
+    # The index no longer reflects the artifacts of the release, drop it so
+    # lookups fall back to the database until it has been rebuilt.
+    invalidate_release_artifact_index(instance.release_id)
+    schedule_prefetch_release_artifacts(instance.release_id)
+
+
 def resolved_in_commit(instance, created, **kwargs):
     groups = instance.find_referenced_groups()
 
@@ -135,6 +145,20 @@ post_save.connect(
     weak=False
 )
 
+post_save.connect(
+    prefetch_release_artifacts,
+    sender=ReleaseFile,
+    dispatch_uid="prefetch_release_artifacts",
+    weak=False,
+)
+
+post_delete.connect(
+    prefetch_release_artifacts,
+    sender=ReleaseFile,
+    dispatch_uid="prefetch_release_artifacts_on_delete",
+    weak=False,
+)
+
 post_save.connect(
     resolved_in_commit,
     sender=Commit,
@@ -0,0 +1,33 @@
+from __future__ import absolute_import
+
+from django.db.models.signals import post_save
+
+from sentry.models import Activity
+from sentry.search import cache as search_cache
+
+# Every change of an issue's status is recorded with one of these
+STATUS_ACTIVITY_TYPES = frozenset([
+    Activity.SET_RESOLVED,
+    Activity.SET_RESOLVED_BY_AGE,
+    Activity.SET_RESOLVED_IN_RELEASE,
+    Activity.SET_RESOLVED_IN_COMMIT,
+    Activity.SET_RESOLVED_IN_PULL_REQUEST,
+    Activity.SET_UNRESOLVED,
+    Activity.SET_IGNORED,
+    Activity.SET_REGRESSION,
+    Activity.MERGE,
+    Activity.UNMERGE_SOURCE,
+])
+
+
+def invalidate_search_results(instance, created, **kwargs):
+    if created and instance.type in STATUS_ACTIVITY_TYPES:
+        search_cache.invalidate(instance.project_id)
+
+
+post_save.connect(
+    invalidate_search_results,
+    sender=Activity,
+    dispatch_uid="invalidate_search_results",
+    weak=False,
+)
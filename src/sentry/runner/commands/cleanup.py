@@ -125,6 +125,34 @@ def _chunk_until_complete(task, num_shards=None, shard_id=None):
             num_shards=num_shards, shard_id=shard_id)
 
 
+def delete_with_task(task, model):
+    """
+    Returns a callback for `IncrementalDeleteQuery` which deletes rows
+    through a deletion task, so that their child relations are removed too.
+    """
+    def delete(ids):
+        instances = list(model.objects.filter(id__in=ids))
+        while instances and task.delete_bulk(instances):
+            pass
+    return delete
+
+
+def run_incremental(model, dtfield, days, project_id, target_duration, duty_cycle,
+                    max_duration, task=None):
+    from sentry.db.deletion import DeletionCheckpoint, IncrementalDeleteQuery
+
+    return IncrementalDeleteQuery(
+        model=model,
+        dtfield=dtfield,
+        days=days,
+        project_id=project_id,
+        checkpoint=DeletionCheckpoint.for_model(model, project_id),
+        delete=delete_with_task(task, model) if task is not None else None,
+        target_duration=target_duration,
+        duty_cycle=duty_cycle,
+    ).execute(max_duration=max_duration)
+
+
 @click.command()
 @click.option('--days', default=30, show_default=True, help='Numbers of days to truncate on.')
 @click.option('--project', help='Limit truncation to only entries from project.')
@@ -154,9 +182,37 @@ def _chunk_until_complete(task, num_shards=None, shard_id=None):
     is_flag=True,
     help='Send the duration of this command to internal metrics.'
 )
+@click.option(
+    '--incremental',
+    default=False,
+    is_flag=True,
+    help='Delete in small batches ordered by date, resuming from where the '
+    'previous run stopped.'
+)
+@click.option(
+    '--target-duration',
+    type=float,
+    default=1.0,
+    show_default=True,
+    help='Seconds a single incremental batch should take.'
+)
+@click.option(
+    '--duty-cycle',
+    type=float,
+    default=1.0,
+    show_default=True,
+    help='Fraction of time incremental deletions keep the database busy.'
+)
+@click.option(
+    '--max-duration',
+    type=int,
+    default=None,
+    help='Seconds to spend on incremental deletions per model.'
+)
 @log_options()
 @configuration
-def cleanup(days, project, concurrency, max_procs, silent, model, router, timed):
+def cleanup(days, project, concurrency, max_procs, silent, model, router, timed,
+            incremental, target_duration, duty_cycle, max_duration):
     """Delete a portion of trailing data based on creation date.
 
     All data that is older than `--days` will be deleted.  The default for
@@ -164,11 +220,21 @@ def cleanup(days, project, concurrency, max_procs, silent, model, router, timed)
     but if you have a specific project you want to limit this to this can be
     done with the `--project` flag which accepts a project ID or a string
     with the form `org/project` where both are slugs.
+
+    With `--incremental` events, groups and the other bulk deleted models
+    are removed in batches that take about `--target-duration` seconds,
+    pausing between batches according to `--duty-cycle`. Progress is
+    remembered, so this can be run frequently with a `--max-duration`
+    instead of once a night.
     """
     if concurrency < 1:
         click.echo('Error: Minimum concurrency is 1', err=True)
         raise click.Abort()
 
+    if not 0 < duty_cycle <= 1:
+        click.echo('Error: Duty cycle must be within (0, 1]', err=True)
+        raise click.Abort()
+
     import math
     import multiprocessing
     import pickle
@@ -267,6 +333,9 @@ def cleanup(days, project, concurrency, max_procs, silent, model, router, timed)
         if is_filtered(model):
             if not silent:
                 click.echo('>> Skipping %s' % model.__name__)
+        elif incremental:
+            run_incremental(model, dtfield, days, project_id,
+                            target_duration, duty_cycle, max_duration)
         else:
             BulkDeleteQuery(
                 model=model,
@@ -289,6 +358,10 @@ def cleanup(days, project, concurrency, max_procs, silent, model, router, timed)
         if is_filtered(model):
             if not silent:
                 click.echo('>> Skipping %s' % model.__name__)
+        elif incremental:
+            task = create_deletion_task(days, project_id, model, dtfield, order_by)
+            run_incremental(model, dtfield, days, project_id,
+                            target_duration, duty_cycle, max_duration, task=task)
         else:
             if concurrency > 1:
                 shard_ids = range(concurrency)
@@ -22,5 +22,6 @@ class SearchBackend(Service):
         pass
 
     def query(self, project, tags=None, environment=None, sort_by='date', limit=100,
-              cursor=None, count_hits=False, paginator_options=None, **parameters):
+              cursor=None, count_hits=False, paginator_options=None, use_cache=False,
+              **parameters):
         raise NotImplementedError
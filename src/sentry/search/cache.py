@@ -0,0 +1,106 @@
+"""
+sentry.search.cache
+~~~~~~~~~~~~~~~~~~~
+
+A short lived cache of search result pages which is shared by everyone
+looking at the same search. Only the ordered group ids of a page are cached
+along with its cursors and hits, groups are loaded fresh for every request.
+
+:copyright: (c) 2010-2018 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+from __future__ import absolute_import
+
+import six
+
+from datetime import datetime
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models import Model
+
+from sentry.search.base import ANY
+from sentry.utils.cursors import Cursor, CursorResult
+from sentry.utils.hashlib import md5_text
+
+__all__ = ('get_cache_key', 'get_result', 'set_result', 'invalidate')
+
+# how long invalidation markers are kept, this only needs to exceed the
+# TTL of the cached results
+GENERATION_TTL = 60 * 60
+
+
+def _normalize(value):
+    if value is ANY:
+        return '*'
+    if isinstance(value, Model):
+        return '%s:%s' % (type(value).__name__, value.pk)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return sorted((k, _normalize(v)) for k, v in six.iteritems(value))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sorted(_normalize(v) for v in value)
+    if isinstance(value, Cursor):
+        return six.text_type(value)
+    return value
+
+
+def _get_generation_key(project_id):
+    return 'search:gen:%s' % (project_id, )
+
+
+def invalidate(project_id):
+    """
+    Drop all cached results of a project.
+    """
+    cache.set(_get_generation_key(project_id), uuid4().hex, GENERATION_TTL)
+
+
+def get_cache_key(project, environment=None, **kwargs):
+    """
+    Build the key of a result page from the search arguments. Results are
+    only shared between requests which normalize to the same arguments.
+    """
+    generation = cache.get(_get_generation_key(project.id)) or ''
+    return 'search:result:%s:%s' % (
+        project.id,
+        md5_text(
+            generation,
+            environment.id if environment is not None else '',
+            repr(_normalize(kwargs)),
+        ).hexdigest(),
+    )
+
+
+def _dump_cursor(cursor):
+    return (cursor.value, cursor.offset, cursor.is_prev, cursor.has_results)
+
+
+def get_result(cache_key):
+    from sentry.models import Group
+
+    data = cache.get(cache_key)
+    if data is None:
+        return None
+
+    groups = Group.objects.in_bulk(data['ids'])
+    return CursorResult(
+        results=[groups[id] for id in data['ids'] if id in groups],
+        next=Cursor(*data['next']),
+        prev=Cursor(*data['prev']),
+        hits=data['hits'],
+        max_hits=data['max_hits'],
+        hits_mode=data['hits_mode'],
+    )
+
+
+def set_result(cache_key, result, ttl):
+    cache.set(cache_key, {
+        'ids': [group.id for group in result.results],
+        'next': _dump_cursor(result.next),
+        'prev': _dump_cursor(result.prev),
+        'hits': result.hits,
+        'max_hits': result.max_hits,
+        'hits_mode': result.hits_mode,
+    }, ttl)
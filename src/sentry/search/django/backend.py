@@ -15,8 +15,9 @@ from django.db import router
 from django.db.models import Q
 from django.utils import timezone
 
-from sentry import quotas, tagstore
+from sentry import options, quotas, tagstore
 from sentry.api.paginator import DateTimePaginator, Paginator, SequencePaginator
+from sentry.search import cache as search_cache
 from sentry.search.base import ANY, SearchBackend
 from sentry.search.django.constants import (
     MSSQL_ENGINES, MSSQL_SORT_CLAUSES, MYSQL_SORT_CLAUSES, ORACLE_SORT_CLAUSES, SORT_CLAUSES,
@@ -205,7 +206,35 @@ def get_latest_release(project, environment):
 
 class DjangoSearchBackend(SearchBackend):
     def query(self, project, tags=None, environment=None, sort_by='date', limit=100,
-              cursor=None, count_hits=False, paginator_options=None, **parameters):
+              cursor=None, count_hits=False, paginator_options=None, use_cache=False,
+              **parameters):
+        # Result pages can be shared for a few seconds when the caller
+        # tolerates slightly stale results, e.g. when polling the stream.
+        ttl = options.get('search.result-cache-ttl') if use_cache else 0
+        if not ttl:
+            return self._query_uncached(project, tags, environment, sort_by, limit,
+                                        cursor, count_hits, paginator_options, **parameters)
+
+        cache_key = search_cache.get_cache_key(
+            project,
+            environment,
+            tags=tags,
+            sort_by=sort_by,
+            limit=limit,
+            cursor=cursor,
+            count_hits=count_hits,
+            paginator_options=paginator_options,
+            parameters=parameters,
+        )
+        result = search_cache.get_result(cache_key)
+        if result is None:
+            result = self._query_uncached(project, tags, environment, sort_by, limit,
+                                          cursor, count_hits, paginator_options, **parameters)
+            search_cache.set_result(cache_key, result, ttl)
+        return result
+
+    def _query_uncached(self, project, tags, environment, sort_by, limit, cursor,
+                        count_hits, paginator_options, **parameters):
 
         from sentry.models import Group, GroupStatus, GroupSubscription, Release
 
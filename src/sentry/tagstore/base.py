@@ -92,13 +92,15 @@ class TagStorage(Service):
         'get_tag_value_label',
     ]) | __read_methods__ | __write_methods__
 
-    def setup_merge(self, grouptagkey_model, grouptagvalue_model):
+    def setup_merge(self, grouptagkey_model, grouptagvalue_model, eventtag_model=None):
         from sentry.tasks import merge
 
         merge.EXTRA_MERGE_MODELS += [
             grouptagvalue_model,
             grouptagkey_model,
         ]
+        if eventtag_model is not None:
+            merge.EXTRA_MERGE_MODELS.append(eventtag_model)
 
     def is_valid_key(self, key):
         return bool(TAG_KEY_RE.match(key))
@@ -71,6 +71,7 @@ class LegacyTagStorage(TagStorage):
         self.setup_merge(
             grouptagkey_model=models.GroupTagKey,
             grouptagvalue_model=models.GroupTagValue,
+            eventtag_model=models.EventTag,
         )
 
         self.setup_receivers()
@@ -86,14 +87,16 @@ class LegacyTagStorage(TagStorage):
 
     def setup_deletions(self):
         from sentry.deletions import default_manager as deletion_manager
-        from sentry.deletions.defaults import BulkModelDeletionTask, ModelDeletionTask
+        from sentry.deletions.defaults import (
+            BulkModelDeletionTask, BulkQueryDeletionTask, ModelDeletionTask
+        )
         from sentry.deletions.base import ModelRelation
         from sentry.models import Event, Group, Project
 
         deletion_manager.add_bulk_dependencies(Event, [
             lambda instance_list: ModelRelation(models.EventTag,
                                                 {'event_id__in': [i.id for i in instance_list]},
-                                                ModelDeletionTask),
+                                                BulkQueryDeletionTask),
         ])
 
         deletion_manager.register(models.TagValue, BulkModelDeletionTask)
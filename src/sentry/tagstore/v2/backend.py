@@ -78,6 +78,7 @@ class V2TagStorage(TagStorage):
         self.setup_merge(
             grouptagkey_model=models.GroupTagKey,
             grouptagvalue_model=models.GroupTagValue,
+            eventtag_model=models.EventTag,
         )
 
         self.setup_receivers()
@@ -88,7 +89,9 @@ class V2TagStorage(TagStorage):
 
     def setup_deletions(self):
         from sentry.deletions import default_manager as deletion_manager
-        from sentry.deletions.defaults import BulkModelDeletionTask, ModelDeletionTask
+        from sentry.deletions.defaults import (
+            BulkModelDeletionTask, BulkQueryDeletionTask, ModelDeletionTask
+        )
         from sentry.deletions.base import ModelRelation
         from sentry.models import Event, Group, Project
 
@@ -96,7 +99,7 @@ class V2TagStorage(TagStorage):
             lambda instance_list: ModelRelation(models.EventTag,
                                                 {'event_id__in': [i.id for i in instance_list],
                                                  'project_id': instance_list[0].project_id},
-                                                ModelDeletionTask),
+                                                BulkQueryDeletionTask),
         ])
 
         deletion_manager.register(models.TagValue, BulkModelDeletionTask)
@@ -44,3 +44,21 @@ def send_activity_notifications(activity_id):
 
     for notifier in get_activity_notifiers(activity.project):
         notifier.notify_about_activity(activity)
+
+
+@instrumented_task(name='sentry.tasks.activity.send_bulk_activity_notifications',
+                   queue='activity.notify')
+def send_bulk_activity_notifications(activity_ids):
+    from sentry.models import Activity
+
+    notifiers = {}
+    activity_list = Activity.objects.filter(
+        id__in=activity_ids,
+    ).select_related('project', 'group')
+
+    for activity in activity_list:
+        if activity.project_id not in notifiers:
+            notifiers[activity.project_id] = get_activity_notifiers(activity.project)
+
+        for notifier in notifiers[activity.project_id]:
+            notifier.notify_about_activity(activity)
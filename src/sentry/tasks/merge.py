@@ -33,6 +33,31 @@ EXTRA_MERGE_MODELS = []
 )
 def merge_group(
     from_object_id=None, to_object_id=None, transaction_id=None, recursed=False, **kwargs
+):
+    if not (from_object_id and to_object_id):
+        logger.error(
+            'group.malformed.missing_params', extra={
+                'transaction_id': transaction_id,
+            }
+        )
+        return
+
+    merge_groups(
+        from_object_ids=[from_object_id],
+        to_object_id=to_object_id,
+        transaction_id=transaction_id,
+        recursed=recursed,
+    )
+
+
+@instrumented_task(
+    name='sentry.tasks.merge.merge_groups',
+    queue='merge',
+    default_retry_delay=60 * 5,
+    max_retries=None
+)
+def merge_groups(
+    from_object_ids=None, to_object_id=None, transaction_id=None, recursed=False, **kwargs
 ):
     # TODO(mattrobenolt): Write tests for all of this
     from sentry.models import (
@@ -51,7 +76,7 @@ def merge_group(
         GroupMeta,
     )
 
-    if not (from_object_id and to_object_id):
+    if not (from_object_ids and to_object_id):
         logger.error(
             'group.malformed.missing_params', extra={
                 'transaction_id': transaction_id,
@@ -59,9 +84,8 @@ def merge_group(
         )
         return
 
-    try:
-        group = Group.objects.get(id=from_object_id)
-    except Group.DoesNotExist:
+    group_list = list(Group.objects.filter(id__in=from_object_ids).exclude(id=to_object_id))
+    for from_object_id in set(from_object_ids) - set(g.id for g in group_list) - {to_object_id}:
         logger.warn(
             'group.malformed.invalid_id',
             extra={
@@ -69,6 +93,7 @@ def merge_group(
                 'old_object_id': from_object_id,
             }
         )
+    if not group_list:
         return
 
     try:
@@ -78,25 +103,26 @@ def merge_group(
             'group.malformed.invalid_id',
             extra={
                 'transaction_id': transaction_id,
-                'old_object_id': from_object_id,
+                'old_object_id': from_object_ids[0],
             }
         )
         return
 
     if not recursed:
-        logger.info(
-            'merge.queued',
-            extra={
-                'transaction_id': transaction_id,
-                'new_group_id': new_group.id,
-                'old_group_id': group.id,
-                # TODO(jtcunning): figure out why these are full seq scans and/or alternative solution
-                # 'new_event_id': getattr(new_group.event_set.order_by('-id').first(), 'id', None),
-                # 'old_event_id': getattr(group.event_set.order_by('-id').first(), 'id', None),
-                # 'new_hash_id': getattr(new_group.grouphash_set.order_by('-id').first(), 'id', None),
-                # 'old_hash_id': getattr(group.grouphash_set.order_by('-id').first(), 'id', None),
-            }
-        )
+        for group in group_list:
+            logger.info(
+                'merge.queued',
+                extra={
+                    'transaction_id': transaction_id,
+                    'new_group_id': new_group.id,
+                    'old_group_id': group.id,
+                    # TODO(jtcunning): figure out why these are full seq scans and/or alternative solution
+                    # 'new_event_id': getattr(new_group.event_set.order_by('-id').first(), 'id', None),
+                    # 'old_event_id': getattr(group.event_set.order_by('-id').first(), 'id', None),
+                    # 'new_hash_id': getattr(new_group.grouphash_set.order_by('-id').first(), 'id', None),
+                    # 'old_hash_id': getattr(group.grouphash_set.order_by('-id').first(), 'id', None),
+                }
+            )
 
     model_list = tuple(EXTRA_MERGE_MODELS) + (
         Activity, GroupAssignee, GroupEnvironment, GroupHash, GroupRuleStatus,
@@ -104,36 +130,41 @@ def merge_group(
         GroupMeta,
     )
 
-    has_more = merge_objects(
-        model_list,
-        group,
-        new_group,
-        logger=logger,
-        transaction_id=transaction_id,
-    )
-
-    if has_more:
-        merge_group.delay(
-            from_object_id=from_object_id,
-            to_object_id=to_object_id,
+    for group in group_list:
+        has_more = merge_objects(
+            model_list,
+            group,
+            new_group,
+            logger=logger,
             transaction_id=transaction_id,
-            recursed=True,
         )
-        return
 
-    features.merge(new_group, [group], allow_unsafe=True)
+        if has_more:
+            merge_groups.delay(
+                from_object_ids=[g.id for g in group_list],
+                to_object_id=to_object_id,
+                transaction_id=transaction_id,
+                recursed=True,
+            )
+            return
+
+    features.merge(new_group, group_list, allow_unsafe=True)
 
     environment_ids = list(
         Environment.objects.filter(
-            projects=group.project
-        ).values_list('id', flat=True)
+            projects__in=set(g.project_id for g in group_list),
+        ).values_list('id', flat=True).distinct()
     )
 
+    # The counters of all source groups are merged at once, which the TSDB
+    # backends do in a single round trip per model.
+    source_ids = [g.id for g in group_list]
+
     for model in [tsdb.models.group]:
         tsdb.merge(
             model,
             new_group.id,
-            [group.id],
+            source_ids,
             environment_ids=environment_ids if model in tsdb.models_with_environment_support else None
         )
 
@@ -141,7 +172,7 @@ def merge_group(
         tsdb.merge_distinct_counts(
             model,
             new_group.id,
-            [group.id],
+            source_ids,
             environment_ids=environment_ids if model in tsdb.models_with_environment_support else None,
         )
 
@@ -151,41 +182,42 @@ def merge_group(
         tsdb.merge_frequencies(
             model,
             new_group.id,
-            [group.id],
+            source_ids,
             environment_ids=environment_ids if model in tsdb.models_with_environment_support else None,
         )
 
-    previous_group_id = group.id
+    for group in group_list:
+        previous_group_id = group.id
 
-    group.delete()
-    delete_logger.info(
-        'object.delete.executed',
-        extra={
-            'object_id': previous_group_id,
-            'transaction_id': transaction_id,
-            'model': Group.__name__,
-        }
-    )
+        group.delete()
+        delete_logger.info(
+            'object.delete.executed',
+            extra={
+                'object_id': previous_group_id,
+                'transaction_id': transaction_id,
+                'model': Group.__name__,
+            }
+        )
 
-    try:
-        with transaction.atomic():
-            GroupRedirect.objects.create(
-                group_id=new_group.id,
-                previous_group_id=previous_group_id,
-            )
-    except IntegrityError:
-        pass
+        try:
+            with transaction.atomic():
+                GroupRedirect.objects.create(
+                    group_id=new_group.id,
+                    previous_group_id=previous_group_id,
+                )
+        except IntegrityError:
+            pass
 
     new_group.update(
         # TODO(dcramer): ideally these would be SQL clauses
-        first_seen=min(group.first_seen, new_group.first_seen),
-        last_seen=max(group.last_seen, new_group.last_seen),
+        first_seen=min([new_group.first_seen] + [g.first_seen for g in group_list]),
+        last_seen=max([new_group.last_seen] + [g.last_seen for g in group_list]),
     )
     try:
         # it's possible to hit an out of range value for counters
         new_group.update(
-            times_seen=F('times_seen') + group.times_seen,
-            num_comments=F('num_comments') + group.num_comments,
+            times_seen=F('times_seen') + sum(g.times_seen for g in group_list),
+            num_comments=F('num_comments') + sum(g.num_comments for g in group_list),
         )
     except DataError:
         pass
@@ -299,8 +331,19 @@ def _rehash_group_events(group, limit=100):
     return bool(event_list)
 
 
-def merge_objects(models, group, new_group, limit=1000, logger=None, transaction_id=None):
-    has_more = False
+def merge_objects(models, group, new_group, limit=1000, logger=None, transaction_id=None,
+                  max_rows=100000):
+    """
+    Move the rows of ``models`` which belong to ``group`` to ``new_group``.
+
+    Rows are moved with a single ``UPDATE`` for every chunk of ``limit`` rows,
+    bounded by the range of ids in the chunk. If that violates a unique
+    constraint, the rows of the chunk are moved one at a time instead, and
+    the rows which already exist for ``new_group`` are merged into it.
+
+    Returns ``True`` if there are rows left after moving ``max_rows`` rows.
+    """
+    moved = 0
     for model in models:
         all_fields = model._meta.get_all_field_names()
 
@@ -315,40 +358,60 @@ def merge_objects(models, group, new_group, limit=1000, logger=None, transaction
         has_group = 'group' in all_fields
         if has_group:
             queryset = project_qs.filter(group=group)
+            values = {'group': new_group}
         else:
             queryset = project_qs.filter(group_id=group.id)
+            values = {'group_id': new_group.id}
+
+        using = router.db_for_write(model)
+        last_id = None
+        while True:
+            chunk_qs = queryset if last_id is None else queryset.filter(id__gt=last_id)
+            id_list = list(chunk_qs.order_by('id').values_list('id', flat=True)[:limit])
+            if not id_list:
+                break
 
-        for obj in queryset[:limit]:
             try:
-                with transaction.atomic(using=router.db_for_write(model)):
-                    if has_group:
-                        project_qs.filter(id=obj.id).update(group=new_group)
-                    else:
-                        project_qs.filter(id=obj.id).update(group_id=new_group.id)
+                with transaction.atomic(using=using):
+                    queryset.filter(
+                        id__gte=id_list[0],
+                        id__lte=id_list[-1],
+                    ).update(**values)
             except IntegrityError:
-                delete = True
-            else:
-                delete = False
-
-            if delete:
-                # Before deleting, we want to merge in counts
-                if hasattr(model, 'merge_counts'):
-                    obj.merge_counts(new_group)
-
-                obj_id = obj.id
-                obj.delete()
-
-                if logger is not None:
-                    delete_logger.debug(
-                        'object.delete.executed',
-                        extra={
-                            'object_id': obj_id,
-                            'transaction_id': transaction_id,
-                            'model': model.__name__,
-                        }
-                    )
-            has_more = True
+                for obj in queryset.filter(id__in=id_list):
+                    _merge_object(model, obj, project_qs, values, new_group,
+                                  logger=logger, transaction_id=transaction_id)
 
-        if has_more:
-            return True
-    return has_more
+            last_id = id_list[-1]
+            moved += len(id_list)
+            if moved >= max_rows:
+                return True
+    return False
+
+
+def _merge_object(model, obj, project_qs, values, new_group, logger=None, transaction_id=None):
+    try:
+        with transaction.atomic(using=router.db_for_write(model)):
+            project_qs.filter(id=obj.id).update(**values)
+    except IntegrityError:
+        delete = True
+    else:
+        delete = False
+
+    if delete:
+        # Before deleting, we want to merge in counts
+        if hasattr(model, 'merge_counts'):
+            obj.merge_counts(new_group)
+
+        obj_id = obj.id
+        obj.delete()
+
+        if logger is not None:
+            delete_logger.debug(
+                'object.delete.executed',
+                extra={
+                    'object_id': obj_id,
+                    'transaction_id': transaction_id,
+                    'model': model.__name__,
+                }
+            )
@@ -0,0 +1,40 @@
+from __future__ import absolute_import
+
+from sentry.models import Release
+from sentry.tasks.base import instrumented_task
+from sentry.utils.cache import cache
+
+
+def get_pending_cache_key(release_id):
+    return 'releasefile:prefetch-pending:v1:%s' % (release_id, )
+
+
+def schedule_prefetch_release_artifacts(release_id, countdown=30):
+    """
+    Schedules prefetching the artifacts of a release. Uploads of a release
+    usually happen in bursts, so all of them are coalesced into one task.
+    """
+    if cache.add(get_pending_cache_key(release_id), 1, countdown):
+        prefetch_release_artifacts.apply_async(
+            kwargs={'release_id': release_id},
+            countdown=countdown,
+        )
+
+
+@instrumented_task(
+    name='sentry.tasks.release_artifacts.prefetch_release_artifacts',
+    time_limit=300,
+    soft_time_limit=270,
+)
+def prefetch_release_artifacts(release_id, **kwargs):
+    from sentry.lang.javascript.processor import prefetch_release_artifacts
+
+    # uploads from this point on need to schedule another run
+    cache.delete(get_pending_cache_key(release_id))
+
+    try:
+        release = Release.objects.get(id=release_id)
+    except Release.DoesNotExist:
+        return
+
+    prefetch_release_artifacts(release)
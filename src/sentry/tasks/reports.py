@@ -154,6 +154,146 @@ def merge_series(target, other, function=operator.add):
     return results
 
 
+class DailySnapshotStore(object):
+    """
+    Keeps the daily event totals of every project. Each day is written once
+    after it ended, which allows reports to be built from these instead of
+    reading months of data from the TSDB for every project at once.
+    """
+    version = 1
+
+    # snapshot field, TSDB model
+    fields = (
+        ('total', 'project'),
+        ('blacklisted', 'project_total_blacklisted'),
+        ('rejected', 'project_total_rejected'),
+    )
+
+    rollup = 60 * 60 * 24
+
+    def __init__(self, cluster, ttl, namespace='s'):
+        self.cluster = cluster
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def __make_key(self, organization_id, timestamp):
+        return '{}:{}:{}:{}'.format(
+            self.namespace,
+            self.version,
+            organization_id,
+            int(timestamp),
+        )
+
+    def get_model(self, field):
+        return getattr(tsdb.models, dict(self.fields)[field])
+
+    def prepare(self, timestamp, organization, days=1):
+        """
+        Store the totals of the ``days`` days up to and including the day
+        starting at ``timestamp`` for all projects in the organization.
+        """
+        project_ids = list(organization.project_set.values_list('id', flat=True))
+        if not project_ids:
+            return
+
+        stop = to_datetime(timestamp)
+        start = stop - timedelta(days=days - 1)
+        _, series = tsdb.get_optimal_rollup_series(start, stop, self.rollup)
+
+        values = {day: {project_id: [] for project_id in project_ids} for day in series}
+        for field, _ in self.fields:
+            data = tsdb.get_range(
+                self.get_model(field),
+                project_ids,
+                start,
+                stop,
+                rollup=self.rollup,
+            )
+            for project_id in project_ids:
+                counts = dict(data.get(project_id, []))
+                for day in series:
+                    values[day][project_id].append(counts.get(day, 0))
+
+        with self.cluster.map() as client:
+            for day, day_values in values.items():
+                key = self.__make_key(organization.id, day)
+                client.hmset(key, {
+                    project_id: json.dumps(value) for project_id, value in day_values.items()
+                })
+                client.expire(key, self.ttl)
+
+    def fetch(self, project, timestamps):
+        """
+        Fetch the snapshots of a project for the days starting at the given
+        timestamps, returning a mapping of timestamp to snapshot for the
+        days which have one.
+        """
+        with self.cluster.map() as client:
+            results = [
+                (timestamp, client.hget(
+                    self.__make_key(project.organization_id, timestamp),
+                    project.id,
+                )) for timestamp in timestamps
+            ]
+
+        names = [field for field, _ in self.fields]
+        return {
+            timestamp: dict(zip(names, json.loads(result.value)))
+            for timestamp, result in results if result.value is not None
+        }
+
+
+# events are counted at their own timestamp and may arrive late, so every
+# run also refreshes the snapshots of the days before
+SNAPSHOT_REFRESH_DAYS = 7
+
+snapshot_store = DailySnapshotStore(
+    redis.clusters.get('default'),
+    60 * 60 * 24 * 100,
+)
+
+
+def get_project_series(project, field, start, stop, rollup=60 * 60 * 24):
+    """
+    Identical to reading the series of ``project`` for the snapshot
+    ``field`` from the TSDB, except that days with a snapshot are not read
+    from the TSDB.
+    """
+    model = snapshot_store.get_model(field)
+    if rollup != snapshot_store.rollup:
+        return tsdb.get_range(model, [project.id], start, stop, rollup=rollup)[project.id]
+
+    _, series = tsdb.get_optimal_rollup_series(start, stop, rollup)
+    counts = {
+        timestamp: snapshot[field]
+        for timestamp, snapshot in snapshot_store.fetch(project, series).items()
+    }
+
+    # consecutive days without a snapshot are read together
+    missing_runs = []
+    for timestamp in series:
+        if timestamp in counts:
+            continue
+        if missing_runs and missing_runs[-1][-1] + rollup == timestamp:
+            missing_runs[-1].append(timestamp)
+        else:
+            missing_runs.append([timestamp])
+
+    for run in missing_runs:
+        run_timestamps = set(run)
+        counts.update(
+            (timestamp, count) for timestamp, count in tsdb.get_range(
+                model,
+                [project.id],
+                to_datetime(run[0]),
+                to_datetime(run[-1]),
+                rollup=rollup,
+            )[project.id] if timestamp in run_timestamps
+        )
+
+    return [(timestamp, counts.get(timestamp, 0)) for timestamp in series]
+
+
 def prepare_project_series(start__stop, project, rollup=60 * 60 * 24):
     start, stop = start__stop
     resolution, series = tsdb.get_optimal_rollup_series(start, stop, rollup)
@@ -179,13 +319,13 @@ def prepare_project_series(start__stop, project, rollup=60 * 60 * 24):
             clean([(timestamp, 0) for timestamp in series]),
         ),
         clean(
-            tsdb.get_range(
-                tsdb.models.project,
-                [project.id],
+            get_project_series(
+                project,
+                'total',
                 start,
                 stop,
                 rollup=rollup,
-            )[project.id],
+            ),
         ),
         lambda resolved, total: (
             resolved,
@@ -204,13 +344,14 @@ def prepare_project_aggregates(ignore__stop, project):
     start = stop - (period * segments)
 
     def get_aggregate_value(start, stop):
-        return tsdb.get_sums(
-            tsdb.models.project,
-            (project.id, ),
-            start,
-            stop,
-            rollup=60 * 60 * 24,
-        )[project.id]
+        return sum(
+            count for _, count in get_project_series(
+                project,
+                'total',
+                start,
+                stop,
+            )
+        )
 
     return [
         get_aggregate_value(
@@ -266,13 +407,15 @@ def prepare_project_issue_summaries(interval, project):
     new_issue_count = sum(event_counts[id] for id in new_issue_ids)
     reopened_issue_count = sum(event_counts[id] for id in reopened_issue_ids)
     existing_issue_count = max(
-        tsdb.get_sums(
-            tsdb.models.project,
-            [project.id],
-            start,
-            stop,
-            rollup=rollup,
-        )[project.id] - new_issue_count - reopened_issue_count,
+        sum(
+            count for _, count in get_project_series(
+                project,
+                'total',
+                start,
+                stop,
+                rollup=rollup,
+            )
+        ) - new_issue_count - reopened_issue_count,
         0,
     )
 
@@ -285,20 +428,9 @@ def prepare_project_issue_summaries(interval, project):
 
 def prepare_project_usage_summary(start__stop, project):
     start, stop = start__stop
-    return (
-        tsdb.get_sums(
-            tsdb.models.project_total_blacklisted,
-            [project.id],
-            start,
-            stop,
-            rollup=60 * 60 * 24,
-        )[project.id], tsdb.get_sums(
-            tsdb.models.project_total_rejected,
-            [project.id],
-            start,
-            stop,
-            rollup=60 * 60 * 24,
-        )[project.id],
+    return tuple(
+        sum(count for _, count in get_project_series(project, field, start, stop))
+        for field in ('blacklisted', 'rejected')
     )
 
 
@@ -353,13 +485,13 @@ def prepare_project_calendar_series(interval, project):
     start, stop = get_calendar_query_range(interval, 3)
 
     rollup = 60 * 60 * 24
-    series = tsdb.get_range(
-        tsdb.models.project,
-        [project.id],
+    series = get_project_series(
+        project,
+        'total',
         start,
         stop,
         rollup=rollup,
-    )[project.id]
+    )
 
     return clean_calendar_data(
         project,
@@ -552,6 +684,28 @@ def prepare_organization_report(timestamp, duration, organization_id, dry_run=Fa
         )
 
 
+@instrumented_task(name='sentry.tasks.reports.prepare_snapshots', queue='reports.prepare')
+def prepare_snapshots(timestamp=None, *args, **kwargs):
+    if timestamp is None:
+        # the last day which has ended
+        timestamp = to_timestamp(floor_to_utc_day(timezone.now()) - timedelta(days=1))
+
+    organization_ids = _get_organization_queryset().values_list('id', flat=True)
+    for organization_id in organization_ids:
+        prepare_organization_snapshot.delay(timestamp, organization_id)
+
+
+@instrumented_task(name='sentry.tasks.reports.prepare_organization_snapshot',
+                   queue='reports.prepare')
+def prepare_organization_snapshot(timestamp, organization_id):
+    try:
+        organization = _get_organization_queryset().get(id=organization_id)
+    except Organization.DoesNotExist:
+        return
+
+    snapshot_store.prepare(timestamp, organization, days=SNAPSHOT_REFRESH_DAYS)
+
+
 def fetch_personal_statistics(start__stop, organization, user):
     start, stop = start__stop
     resolved_issue_ids = Activity.objects.filter(
@@ -1,12 +1,15 @@
 from __future__ import absolute_import
 
 import logging
-from collections import defaultdict
+import operator
+from collections import OrderedDict, defaultdict
+from uuid import uuid4
 
 from django.db import transaction
+from django.db.models import Max, Min
 
 from sentry import tagstore
-from sentry.app import tsdb
+from sentry.app import locks, tsdb
 from sentry.constants import DEFAULT_LOGGER_NAME, LOG_LEVELS_MAP
 from sentry.event_manager import (
     ScoreClause, generate_culprit, get_fingerprint_for_event, get_hashes_from_fingerprint, md5_from_hash
@@ -17,8 +20,14 @@ from sentry.models import (
 )
 from sentry.similarity import features
 from sentry.tasks.base import instrumented_task
+from sentry.utils import redis
+from sentry.utils.compat import pickle
+from sentry.utils.dates import to_datetime, to_timestamp
+from sentry.utils.retries import TimedRetryPolicy
 from six.moves import reduce
 
+logger = logging.getLogger(__name__)
+
 
 def cache(function):
     results = {}
@@ -148,67 +157,91 @@ def get_fingerprint(event):
     return md5_from_hash(primary_hash)
 
 
-def migrate_events(caches, project, source_id, destination_id, fingerprints, events, actor_id):
+def create_destination(caches, project, source_id, fingerprints, events, actor_id):
     # XXX: This is only actually able to create a destination group and migrate
     # the group hashes if there are events that can be migrated. How do we
     # handle this if there aren't any events? We can't create a group (there
     # isn't any data to derive the aggregates from), so we'd have to mark the
     # hash as in limbo somehow...?)
-    if not events:
-        return destination_id
 
-    if destination_id is None:
-        # XXX: There is a race condition here between the (wall clock) time
-        # that the migration is started by the user and when we actually
-        # get to this block where the new destination is created and we've
-        # moved the ``GroupHash`` so that events start being associated
-        # with it. During this gap, there could have been additional events
-        # ingested, and if we want to handle this, we'd need to record the
-        # highest event ID we've seen at the beginning of the migration,
-        # then scan all events greater than that ID and migrate the ones
-        # where necessary. (This still isn't even guaranteed to catch all
-        # of the events due to processing latency, but it's a better shot.)
-        # Create a new destination group.
-        destination = Group.objects.create(
-            project_id=project.id,
-            short_id=project.next_short_id(),
-            **get_group_creation_attributes(caches, events)
-        )
+    # XXX: There is a race condition here between the (wall clock) time
+    # that the migration is started by the user and when we actually
+    # get to this block where the new destination is created and we've
+    # moved the ``GroupHash`` so that events start being associated
+    # with it. During this gap, there could have been additional events
+    # ingested, and if we want to handle this, we'd need to record the
+    # highest event ID we've seen at the beginning of the migration,
+    # then scan all events greater than that ID and migrate the ones
+    # where necessary. (This still isn't even guaranteed to catch all
+    # of the events due to processing latency, but it's a better shot.)
+    # Create a new destination group. Its attributes are derived from the
+    # first events found, and replaced once all events were migrated.
+    destination = Group.objects.create(
+        project_id=project.id,
+        short_id=project.next_short_id(),
+        **get_group_creation_attributes(caches, events)
+    )
 
-        destination_id = destination.id
+    # Move the group hashes to the destination.
+    GroupHash.objects.filter(
+        project_id=project.id,
+        hash__in=fingerprints,
+    ).update(group=destination.id)
 
-        # Move the group hashes to the destination.
-        GroupHash.objects.filter(
-            project_id=project.id,
-            hash__in=fingerprints,
-        ).update(group=destination_id)
+    # Create activity records for the source and destination group.
+    Activity.objects.create(
+        project_id=project.id,
+        group_id=destination.id,
+        type=Activity.UNMERGE_DESTINATION,
+        user_id=actor_id,
+        data={
+            'fingerprints': fingerprints,
+            'source_id': source_id,
+        },
+    )
 
-        # Create activity records for the source and destination group.
-        Activity.objects.create(
-            project_id=project.id,
-            group_id=destination_id,
-            type=Activity.UNMERGE_DESTINATION,
-            user_id=actor_id,
-            data={
-                'fingerprints': fingerprints,
-                'source_id': source_id,
-            },
-        )
+    Activity.objects.create(
+        project_id=project.id,
+        group_id=source_id,
+        type=Activity.UNMERGE_SOURCE,
+        user_id=actor_id,
+        data={
+            'fingerprints': fingerprints,
+            'destination_id': destination.id,
+        },
+    )
 
-        Activity.objects.create(
-            project_id=project.id,
-            group_id=source_id,
-            type=Activity.UNMERGE_SOURCE,
-            user_id=actor_id,
-            data={
-                'fingerprints': fingerprints,
-                'destination_id': destination_id,
-            },
-        )
-    else:
-        # Update the existing destination group.
-        destination = Group.objects.get(id=destination_id)
-        destination.update(**get_group_backfill_attributes(caches, destination, events))
+    return destination
+
+
+def get_destination_id(caches, project, state, source_id, fingerprints, events, actor_id):
+    """\
+    Return the destination group, creating it from ``events`` if none of the
+    partitions has done so yet.
+    """
+    destination_id, _ = state.get_destination()
+    if destination_id is not None:
+        return destination_id
+
+    lock = locks.get(u'{}:destination'.format(state.key), duration=60)
+    with TimedRetryPolicy(30)(lock.acquire):
+        destination_id, _ = state.get_destination()
+        if destination_id is None:
+            destination_id = create_destination(
+                caches,
+                project,
+                source_id,
+                fingerprints,
+                events,
+                actor_id,
+            ).id
+            state.set_destination(destination_id)
+
+    return destination_id
+
+
+def migrate_events(project, destination_id, events):
+    destination = Group.objects.get(id=destination_id)
 
     event_id_set = set(event.id for event in events)
 
@@ -238,8 +271,6 @@ def migrate_events(caches, project, source_id, destination_id, fingerprints, eve
         event_id__in=event_event_id_set,
     ).update(group=destination_id)
 
-    return destination.id
-
 
 def truncate_denormalizations(group):
     tagstore.delete_all_group_tag_keys(group.project_id, group.id)
@@ -280,21 +311,77 @@ def truncate_denormalizations(group):
     features.delete(group)
 
 
+def collect_group_data(caches, events):
+    """\
+    Summarize the attributes of each group from an id-descending sorted list
+    of events, along with the range of event ids they were derived from.
+    """
+    events_by_group = OrderedDict()
+    for event in events:
+        events_by_group.setdefault(event.group_id, []).append(event)
+
+    return {
+        group_id: (
+            group_events[0].id,
+            group_events[-1].id,
+            get_group_creation_attributes(caches, group_events),
+        ) for group_id, group_events in events_by_group.items()
+    }
+
+
+def merge_group_data(a, b):
+    # The summaries cover disjoint ranges of events, so the attributes taken
+    # from the latest event come from one and the backfilled attributes from
+    # the earliest event come from the other.
+    latest, earliest = (a, b) if a[0] > b[0] else (b, a)
+
+    attributes = dict(latest[2])
+    for name in ('platform', 'logger', 'first_seen', 'active_at'):
+        attributes[name] = earliest[2][name]
+    attributes['first_release'] = earliest[2]['first_release'] or latest[2]['first_release']
+    attributes['times_seen'] = latest[2]['times_seen'] + earliest[2]['times_seen']
+    attributes['score'] = ScoreClause.calculate(
+        attributes['times_seen'],
+        attributes['last_seen'],
+    )
+
+    return (latest[0], earliest[1], attributes)
+
+
+def get_group_repair_attributes(group, summary, reset):
+    _, _, attributes = summary
+    if reset:
+        return attributes
+
+    # Backfill an existing group in the same way as
+    # ``get_group_backfill_attributes``.
+    result = {name: attributes[name] for name in ('platform', 'logger', 'first_seen', 'active_at')}
+    result['first_release'] = attributes['first_release'] or group.first_release
+    result['times_seen'] = group.times_seen + attributes['times_seen']
+    result['score'] = ScoreClause.calculate(result['times_seen'], group.last_seen)
+    return result
+
+
 def collect_group_environment_data(events):
     """\
-    Find the first release for a each group and environment pair from a
-    date-descending sorted list of events.
+    Find the first release for a each group and environment pair, along with
+    the id of the event it was taken from.
     """
     results = {}
     for event in events:
-        results[(event.group_id, get_environment_name(event))] = event.get_tag('sentry:release')
+        key = (event.group_id, get_environment_name(event))
+        if key not in results or event.id < results[key][0]:
+            results[key] = (event.id, event.get_tag('sentry:release'))
     return results
 
 
-def repair_group_environment_data(caches, project, events):
-    for (group_id, env_name), first_release in collect_group_environment_data(events).items():
+def repair_group_environment_data(caches, project, data):
+    for (group_id, env_name), (_, first_release) in data.items():
         fields = {
-            'first_release_id': caches['Release'](project.organization_id, first_release).id,
+            'first_release_id': caches['Release'](
+                project.organization_id,
+                first_release,
+            ).id if first_release else None,
         }
 
         GroupEnvironment.objects.create_or_update(
@@ -310,61 +397,69 @@ def collect_tag_data(events):
 
     for event in events:
         environment = get_environment_name(event)
-        tags = results.setdefault((event.group_id, environment), {})
 
         for key, value in event.get_tags():
-            values = tags.setdefault(key, {})
+            tag = (event.group_id, environment, key, value)
 
-            if value in values:
-                times_seen, first_seen, last_seen = values[value]
-                values[value] = (times_seen + 1, event.datetime, last_seen)
+            if tag in results:
+                results[tag] = merge_tag_values(
+                    results[tag],
+                    (1, event.datetime, event.datetime),
+                )
             else:
-                values[value] = (1, event.datetime, event.datetime)
+                results[tag] = (1, event.datetime, event.datetime)
 
     return results
 
 
-def repair_tag_data(caches, project, events):
-    for (group_id, env_name), keys in collect_tag_data(events).items():
+def merge_tag_values(a, b):
+    return (a[0] + b[0], min(a[1], b[1]), max(a[2], b[2]))
+
+
+def repair_tag_data(caches, project, data):
+    repaired_keys = set()
+
+    for (group_id, env_name, key, value), (times_seen, first_seen, last_seen) in data.items():
         environment = caches['Environment'](
             project.organization_id,
             env_name,
         )
-        for key, values in keys.items():
+
+        if (group_id, environment.id, key) not in repaired_keys:
             tagstore.get_or_create_group_tag_key(
                 project_id=project.id,
                 group_id=group_id,
                 environment_id=environment.id,
                 key=key,
             )
+            repaired_keys.add((group_id, environment.id, key))
 
-            # XXX: `{first,last}_seen` columns don't totally replicate the
-            # ingestion logic (but actually represent a more accurate value.)
-            # See GH-5289 for more details.
-            for value, (times_seen, first_seen, last_seen) in values.items():
-                _, created = tagstore.get_or_create_group_tag_value(
-                    project_id=project.id,
-                    group_id=group_id,
-                    environment_id=environment.id,
-                    key=key,
-                    value=value,
-                    defaults={
-                        'first_seen': first_seen,
-                        'last_seen': last_seen,
-                        'times_seen': times_seen,
-                    },
-                )
+        # XXX: `{first,last}_seen` columns don't totally replicate the
+        # ingestion logic (but actually represent a more accurate value.)
+        # See GH-5289 for more details.
+        _, created = tagstore.get_or_create_group_tag_value(
+            project_id=project.id,
+            group_id=group_id,
+            environment_id=environment.id,
+            key=key,
+            value=value,
+            defaults={
+                'first_seen': first_seen,
+                'last_seen': last_seen,
+                'times_seen': times_seen,
+            },
+        )
 
-                if not created:
-                    tagstore.incr_group_tag_value_times_seen(
-                        project_id=project.id,
-                        group_id=group_id,
-                        environment_id=environment.id,
-                        key=key,
-                        value=value,
-                        count=times_seen,
-                        extra={'first_seen': first_seen}
-                    )
+        if not created:
+            tagstore.incr_group_tag_value_times_seen(
+                project_id=project.id,
+                group_id=group_id,
+                environment_id=environment.id,
+                key=key,
+                value=value,
+                count=times_seen,
+                extra={'first_seen': first_seen}
+            )
 
 
 def get_environment_name(event):
@@ -388,17 +483,19 @@ def collect_release_data(caches, project, events):
         )
 
         if key in results:
-            first_seen, last_seen = results[key]
-            results[key] = (event.datetime, last_seen)
+            results[key] = merge_release_data(results[key], (event.datetime, event.datetime))
         else:
             results[key] = (event.datetime, event.datetime)
 
     return results
 
 
-def repair_group_release_data(caches, project, events):
-    attributes = collect_release_data(caches, project, events).items()
-    for (group_id, environment, release_id), (first_seen, last_seen) in attributes:
+def merge_release_data(a, b):
+    return (min(a[0], b[0]), max(a[1], b[1]))
+
+
+def repair_group_release_data(caches, project, data):
+    for (group_id, environment, release_id), (first_seen, last_seen) in data.items():
         instance, created = GroupRelease.objects.get_or_create(
             project_id=project.id,
             group_id=group_id,
@@ -423,50 +520,45 @@ def get_event_user_from_interface(value):
     )
 
 
-def collect_tsdb_data(caches, project, events):
-    counters = defaultdict(
-        lambda: defaultdict(
-            lambda: defaultdict(int),
-        ),
-    )
+def get_tsdb_timestamp(timestamp):
+    # Events are counted at the resolution of the smallest rollup, which
+    # combines the writes for all events that fall into the same interval.
+    rollup = min(tsdb.get_rollups())
+    value = int(to_timestamp(timestamp))
+    return to_datetime(value - value % rollup)
 
-    sets = defaultdict(
-        lambda: defaultdict(
-            lambda: defaultdict(set),
-        ),
-    )
 
-    frequencies = defaultdict(
-        lambda: defaultdict(
-            lambda: defaultdict(
-                lambda: defaultdict(int),
-            ),
-        ),
-    )
+def collect_tsdb_data(caches, project, events):
+    counters = defaultdict(int)
+    sets = defaultdict(set)
+    frequencies = defaultdict(int)
 
     for event in events:
+        timestamp = get_tsdb_timestamp(event.datetime)
         environment = caches['Environment'](
             project.organization_id,
             get_environment_name(event),
         )
 
-        counters[event.datetime][tsdb.models.group][(event.group_id, environment.id)] += 1
+        counters[(timestamp, tsdb.models.group, event.group_id, environment.id)] += 1
 
         user = event.data.get('sentry.interfaces.User')
         if user:
-            sets[event.datetime][tsdb.models.users_affected_by_group][(event.group_id, environment.id)].add(
+            sets[(timestamp, tsdb.models.users_affected_by_group,
+                  event.group_id, environment.id)].add(
                 get_event_user_from_interface(user).tag_value,
             )
 
-        frequencies[event.datetime][tsdb.models.frequent_environments_by_group
-                                    ][event.group_id][environment.id] += 1
+        frequencies[(timestamp, tsdb.models.frequent_environments_by_group,
+                     event.group_id, environment.id)] += 1
 
         release = event.get_tag('sentry:release')
         if release:
+            # The ``GroupRelease`` is only created when the release data is
+            # repaired, so the member is resolved in ``repair_tsdb_data``.
             # TODO: I'm also not sure if "environment" here is correct, see
             # similar comment above during creation.
-            grouprelease = caches['GroupRelease'](
-                event.group_id,
+            member = (
                 get_environment_name(event),
                 caches['Release'](
                     project.organization_id,
@@ -474,38 +566,244 @@ def collect_tsdb_data(caches, project, events):
                 ).id,
             )
 
-            frequencies[event.datetime][tsdb.models.frequent_releases_by_group
-                                        ][event.group_id][grouprelease.id] += 1
+            frequencies[(timestamp, tsdb.models.frequent_releases_by_group,
+                         event.group_id, member)] += 1
 
-    return counters, sets, frequencies
+    return dict(counters), dict(sets), dict(frequencies)
 
 
-def repair_tsdb_data(caches, project, events):
-    counters, sets, frequencies = collect_tsdb_data(caches, project, events)
+def repair_tsdb_data(caches, project, counters, sets, frequencies):
+    for (timestamp, model, key, environment_id), value in counters.items():
+        tsdb.incr(model, key, timestamp, value, environment_id=environment_id)
+
+    for (timestamp, model, key, environment_id), values in sets.items():
+        # TODO: This should use `record_multi` rather than `record`.
+        tsdb.record(model, key, values, timestamp, environment_id=environment_id)
 
-    for timestamp, data in counters.items():
-        for model, keys in data.items():
-            for (key, environment_id), value in keys.items():
-                tsdb.incr(model, key, timestamp, value, environment_id=environment_id)
+    requests = defaultdict(
+        lambda: defaultdict(
+            lambda: defaultdict(
+                lambda: defaultdict(int),
+            ),
+        ),
+    )
 
-    for timestamp, data in sets.items():
-        for model, keys in data.items():
-            for (key, environment_id), values in keys.items():
-                # TODO: This should use `record_multi` rather than `record`.
-                tsdb.record(model, key, values, timestamp, environment_id=environment_id)
+    for (timestamp, model, key, member), value in frequencies.items():
+        if model == tsdb.models.frequent_releases_by_group:
+            environment, release_id = member
+            member = caches['GroupRelease'](key, environment, release_id).id
+        requests[timestamp][model][key][member] += value
 
-    for timestamp, data in frequencies.items():
+    for timestamp, data in requests.items():
         tsdb.record_frequency_multi(data.items(), timestamp)
 
 
-def repair_denormalizations(caches, project, events):
-    repair_group_environment_data(caches, project, events)
-    repair_tag_data(caches, project, events)
-    repair_group_release_data(caches, project, events)
-    repair_tsdb_data(caches, project, events)
+# How the values collected for the same key from different batches of events
+# are combined, for each kind of repair.
+repair_merges = {
+    'groups': merge_group_data,
+    'environments': min,
+    'tags': merge_tag_values,
+    'releases': merge_release_data,
+    'tsdb_counters': operator.add,
+    'tsdb_sets': operator.or_,
+    'tsdb_frequencies': operator.add,
+}
 
-    for event in events:
-        features.record([event])
+
+def collect_repairs(caches, project, events):
+    """\
+    Collect the denormalizations for an id-descending sorted list of events.
+    Each kind of repair is a mapping, and repairs collected from disjoint
+    batches of events are combined key by key with ``repair_merges``, so
+    that they are only applied once.
+    """
+    counters, sets, frequencies = collect_tsdb_data(caches, project, events)
+    return {
+        'groups': collect_group_data(caches, events),
+        'environments': collect_group_environment_data(events),
+        'tags': collect_tag_data(events),
+        'releases': collect_release_data(caches, project, events),
+        'tsdb_counters': counters,
+        'tsdb_sets': sets,
+        'tsdb_frequencies': frequencies,
+    }
+
+
+def repair_denormalizations(caches, project, repairs):
+    repair_group_environment_data(caches, project, repairs['environments'])
+    repair_tag_data(caches, project, repairs['tags'])
+    repair_group_release_data(caches, project, repairs['releases'])
+    repair_tsdb_data(
+        caches,
+        project,
+        repairs['tsdb_counters'],
+        repairs['tsdb_sets'],
+        repairs['tsdb_frequencies'],
+    )
+
+
+def dumps(value):
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+class UnmergeState(object):
+    """\
+    The state shared by the partitions of an unmerge: the destination group,
+    the progress made, and the repairs collected by each partition so far.
+    """
+    ttl = 60 * 60 * 24
+
+    def __init__(self, id):
+        self.id = id
+        self.key = u'unmerge:{}'.format(id)
+
+    @property
+    def client(self):
+        # Every key of an unmerge lives on the same host as the main key.
+        return redis.clusters.get('default').get_local_client_for_key(self.key)
+
+    def get_repairs_key(self, partition, kind):
+        return u'{}:{}:{}'.format(self.key, partition, kind)
+
+    def get_repairs_keys(self, partitions):
+        return [
+            self.get_repairs_key(partition, kind)
+            for partition in range(partitions) for kind in repair_merges
+        ]
+
+    def start(self, partitions, total, destination_id, reset_source=True):
+        pipeline = self.client.pipeline()
+        pipeline.hmset(self.key, {
+            'partitions': partitions,
+            'remaining': partitions,
+            'processed': 0,
+            'total': total,
+            'destination': destination_id or '',
+            'created': 0,
+            'reset_source': 1 if reset_source else 0,
+        })
+        pipeline.expire(self.key, self.ttl)
+        pipeline.execute()
+
+    def get_destination(self):
+        """\
+        Return the destination id, if there is one yet, and whether it was
+        created by this unmerge.
+        """
+        destination_id, created = self.client.hmget(self.key, ['destination', 'created'])
+        return int(destination_id) if destination_id else None, created == '1'
+
+    def resets_source(self):
+        """\
+        Return whether the attributes of the source group are replaced, or
+        only backfilled as they were already reset by a previous run.
+        """
+        return self.client.hget(self.key, 'reset_source') != '0'
+
+    def set_destination(self, destination_id):
+        self.client.hmset(self.key, {'destination': destination_id, 'created': 1})
+
+    def record(self, partition, count, repairs):
+        """\
+        Merge the repairs of a batch into the ones of its partition. Every
+        repaired key is a field of a hash per kind of repair, and only the
+        fields touched by the batch are read and written back.
+        """
+        client = self.client
+
+        updates = [
+            (kind, [(dumps(key), value) for key, value in values.items()])
+            for kind, values in repairs.items() if values
+        ]
+
+        # Each partition is processed one batch at a time, so its repairs are
+        # never updated concurrently.
+        pipeline = client.pipeline()
+        for kind, items in updates:
+            pipeline.hmget(self.get_repairs_key(partition, kind), [field for field, _ in items])
+        existing = pipeline.execute()
+
+        pipeline = client.pipeline()
+        for (kind, items), previous in zip(updates, existing):
+            merge = repair_merges[kind]
+            key = self.get_repairs_key(partition, kind)
+            pipeline.hmset(key, {
+                field: dumps(merge(pickle.loads(old), value) if old is not None else value)
+                for (field, value), old in zip(items, previous)
+            })
+            pipeline.expire(key, self.ttl)
+        pipeline.hincrby(self.key, 'processed', count)
+        pipeline.expire(self.key, self.ttl)
+        pipeline.execute()
+
+    def finish_partition(self):
+        """\
+        Mark a partition as done, returning ``True`` if it was the last one.
+        """
+        return self.client.hincrby(self.key, 'remaining', -1) == 0
+
+    def get_progress(self):
+        values = self.client.hgetall(self.key)
+        if not values:
+            return None
+        return {
+            'processed': int(values['processed']),
+            'total': int(values['total']),
+            'partitions': int(values['partitions']),
+            'remaining': int(values['remaining']),
+        }
+
+    def get_repairs(self):
+        partitions = int(self.client.hget(self.key, 'partitions') or 0)
+        if not partitions:
+            return None
+
+        pipeline = self.client.pipeline()
+        kinds = []
+        for partition in range(partitions):
+            for kind in repair_merges:
+                pipeline.hgetall(self.get_repairs_key(partition, kind))
+                kinds.append(kind)
+
+        repairs = {kind: {} for kind in repair_merges}
+        for kind, values in zip(kinds, pipeline.execute()):
+            merge = repair_merges[kind]
+            result = repairs[kind]
+            for field, value in values.items():
+                # Equal keys may have been pickled differently, for instance
+                # as ``str`` and ``unicode``, so they are merged once loaded.
+                key, value = pickle.loads(field), pickle.loads(value)
+                result[key] = merge(result[key], value) if key in result else value
+        return repairs
+
+    def fail(self):
+        self.client.hset(self.key, 'failed', 1)
+
+    def has_failed(self):
+        return self.client.hget(self.key, 'failed') == '1'
+
+    def delete(self):
+        partitions = int(self.client.hget(self.key, 'partitions') or 0)
+        self.client.delete(self.key, *self.get_repairs_keys(partitions))
+
+
+def get_unmerge_progress(unmerge_id):
+    """\
+    Return the progress of a running unmerge, or ``None`` if it finished.
+    """
+    return UnmergeState(unmerge_id).get_progress()
+
+
+def get_partitions(min_id, max_id, partitions):
+    """\
+    Split the range of event ids into ``[start, stop)`` ranges.
+    """
+    size = (max_id - min_id) // partitions + 1
+    return [
+        (start, min(start + size, max_id + 1))
+        for start in range(min_id, max_id + 1, size)
+    ]
 
 
 def lock_hashes(project_id, source_id, fingerprints):
@@ -535,6 +833,30 @@ def unlock_hashes(project_id, fingerprints):
     ).update(state=GroupHash.State.UNLOCKED)
 
 
+def finish_unmerge(state, project_id, source_id, destination_id, fingerprints):
+    caches = get_caches()
+
+    project = caches['Project'](project_id)
+
+    repairs = state.get_repairs()
+    if repairs is not None:
+        _, created = state.get_destination()
+        for group in Group.objects.filter(id__in=repairs['groups'].keys()):
+            group.update(**get_group_repair_attributes(
+                group,
+                repairs['groups'][group.id],
+                # The source group was truncated, and a destination created
+                # by this unmerge only has attributes of its first events.
+                reset=state.resets_source() if group.id == source_id else created,
+            ))
+
+        repair_denormalizations(caches, project, repairs)
+
+    tagstore.update_group_tag_key_values_seen(project_id, [source_id, destination_id])
+    unlock_hashes(project_id, fingerprints)
+    state.delete()
+
+
 @instrumented_task(name='sentry.tasks.unmerge', queue='unmerge')
 def unmerge(
     project_id,
@@ -544,93 +866,200 @@ def unmerge(
     actor_id,
     cursor=None,
     batch_size=500,
-    source_fields_reset=False
+    source_fields_reset=False,
+    partitions=4,
 ):
-    # XXX: The queryset chunking logic below is awfully similar to
-    # ``RangeQuerySetWrapper``. Ideally that could be refactored to be able to
-    # be run without iteration by passing around a state object and we could
-    # just use that here instead.
+    """\
+    Move the events of the given fingerprints out of the source group.
+
+    The events are scanned by id range in ``partitions`` parallel chains of
+    ``unmerge_partition`` tasks. The denormalizations (group attributes,
+    tags, releases, environments and TSDB data) are collected across all
+    partitions and repaired once the last partition is done. Returns the id
+    which can be passed to ``get_unmerge_progress``.
 
+    ``cursor`` and ``source_fields_reset`` are only passed by runs which were
+    queued by previous versions, which moved one batch of events per task.
+    Those runs continue with the events that were not moved yet.
+    """
     source = Group.objects.get(
         project_id=project_id,
         id=source_id,
     )
 
-    # On the first iteration of this loop, we clear out all of the
-    # denormalizations from the source group so that we can have a clean slate
-    # for the new, repaired data.
+    queryset = Event.objects.filter(
+        project_id=project_id,
+        group_id=source_id,
+    )
+
     if cursor is None:
+        # We clear out all of the denormalizations from the source group so
+        # that we can have a clean slate for the new, repaired data.
         fingerprints = lock_hashes(project_id, source_id, fingerprints)
         truncate_denormalizations(source)
+    else:
+        # The hashes are already locked, and the denormalizations of the
+        # events after the cursor were already repaired.
+        logger.info('unmerge.resumed', extra={
+            'project_id': project_id,
+            'source_id': source_id,
+            'cursor': cursor,
+        })
+        queryset = queryset.filter(id__lt=cursor)
+
+    state = UnmergeState(uuid4().hex)
+
+    bounds = queryset.aggregate(min_id=Min('id'), max_id=Max('id'))
+    if bounds['max_id'] is None:
+        finish_unmerge(state, project_id, source_id, destination_id, fingerprints)
+        return state.id
+
+    ranges = get_partitions(bounds['min_id'], bounds['max_id'], partitions)
+    state.start(
+        len(ranges),
+        queryset.count(),
+        destination_id,
+        reset_source=not source_fields_reset,
+    )
 
+    for partition, (start, stop) in enumerate(ranges):
+        unmerge_partition.delay(
+            state.id,
+            project_id,
+            source_id,
+            fingerprints,
+            actor_id,
+            partition,
+            start,
+            stop,
+            batch_size=batch_size,
+        )
+
+    return state.id
+
+
+def unmerge_batch(state, project_id, source_id, fingerprints, actor_id,
+                  partition, start, stop, cursor, batch_size):
+    """\
+    Migrate the next batch of events of a partition and record its repairs.
+    Returns the cursor of the following batch, or ``None`` if the partition
+    is done.
+    """
     caches = get_caches()
 
     project = caches['Project'](project_id)
 
     # We fetch the events in descending order by their primary key to get the
     # best approximation of the most recently received events.
-    queryset = Event.objects.filter(
-        project_id=project_id,
-        group_id=source_id,
-    ).order_by('-id')
-
-    if cursor is not None:
-        queryset = queryset.filter(id__lt=cursor)
-
-    events = list(queryset[:batch_size])
+    events = list(
+        Event.objects.filter(
+            project_id=project_id,
+            group_id=source_id,
+            id__gte=start,
+            id__lt=cursor if cursor is not None else stop,
+        ).order_by('-id')[:batch_size]
+    )
 
-    # If there are no more events to process, we're done with the migration.
+    # If there are no more events to process, this partition is done. The
+    # last partition to finish applies the repairs for all of them.
     if not events:
-        tagstore.update_group_tag_key_values_seen(project_id, [source_id, destination_id])
-        unlock_hashes(project_id, fingerprints)
-        return destination_id
+        if state.finish_partition():
+            destination_id, _ = state.get_destination()
+            finish_unmerge(state, project_id, source_id, destination_id, fingerprints)
+        return None
 
     Event.objects.bind_nodes(events, 'data')
 
-    source_events = []
-    destination_events = []
+    fingerprint_set = set(fingerprints)
+    destination_events = [
+        event for event in events if get_fingerprint(event) in fingerprint_set
+    ]
+
+    if destination_events:
+        destination_id = get_destination_id(
+            caches,
+            project,
+            state,
+            source_id,
+            fingerprints,
+            destination_events,
+            actor_id,
+        )
+        migrate_events(project, destination_id, destination_events)
+
+    state.record(partition, len(events), collect_repairs(caches, project, events))
 
     for event in events:
-        (destination_events
-         if get_fingerprint(event) in fingerprints else source_events).append(event)
+        features.record([event])
 
-    if source_events:
-        if not source_fields_reset:
-            source.update(**get_group_creation_attributes(
-                caches,
-                source_events,
-            ))
-            source_fields_reset = True
-        else:
-            source.update(**get_group_backfill_attributes(
-                caches,
-                source,
-                source_events,
-            ))
+    logger.info('unmerge.progress', extra=dict(
+        state.get_progress() or {},
+        unmerge_id=state.id,
+        project_id=project_id,
+        source_id=source_id,
+        partition=partition,
+    ))
 
-    destination_id = migrate_events(
-        caches,
-        project,
-        source_id,
-        destination_id,
-        fingerprints,
-        destination_events,
-        actor_id,
-    )
+    return events[-1].id
 
-    repair_denormalizations(
-        caches,
-        project,
-        events,
-    )
 
-    unmerge.delay(
+@instrumented_task(name='sentry.tasks.unmerge_partition', queue='unmerge')
+def unmerge_partition(
+    unmerge_id,
+    project_id,
+    source_id,
+    fingerprints,
+    actor_id,
+    partition,
+    start,
+    stop,
+    cursor=None,
+    batch_size=500,
+):
+    state = UnmergeState(unmerge_id)
+
+    # The hashes were already unlocked when another partition failed.
+    if state.has_failed():
+        return
+
+    try:
+        cursor = unmerge_batch(
+            state,
+            project_id,
+            source_id,
+            fingerprints,
+            actor_id,
+            partition,
+            start,
+            stop,
+            cursor,
+            batch_size,
+        )
+    except Exception:
+        # The unmerge can't be completed anymore, so the hashes are released
+        # instead of staying locked in migration forever.
+        logger.exception('unmerge.failed', extra={
+            'unmerge_id': unmerge_id,
+            'project_id': project_id,
+            'source_id': source_id,
+            'partition': partition,
+        })
+        state.fail()
+        unlock_hashes(project_id, fingerprints)
+        raise
+
+    if cursor is None:
+        return
+
+    unmerge_partition.delay(
+        unmerge_id,
         project_id,
         source_id,
-        destination_id,
         fingerprints,
         actor_id,
-        cursor=events[-1].id,
+        partition,
+        start,
+        stop,
+        cursor=cursor,
         batch_size=batch_size,
-        source_fields_reset=source_fields_reset,
     )
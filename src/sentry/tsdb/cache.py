@@ -0,0 +1,153 @@
+"""
+sentry.tsdb.cache
+~~~~~~~~~~~~~~~~~
+
+A read through cache for ``tsdb.get_range``. Buckets which are closed do
+not change anymore, so they are cached for as long as their rollup is kept
+and shared by everyone asking for them. Only buckets which are still open
+are read from the TSDB, and even those are shared for a few seconds so that
+dashboards polling the same stats are answered by a single read.
+
+Models counted when an event is received close shortly after their bucket
+ended. Models counted with the timestamp of the event itself can change for
+as long as events with that timestamp are accepted.
+
+:copyright: (c) 2010-2018 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+from __future__ import absolute_import
+
+import six
+
+from collections import defaultdict
+from django.core.cache import cache
+from django.utils import timezone
+
+from sentry import options, tsdb
+from sentry.tsdb.base import TSDBModel
+from sentry.utils.dates import to_datetime, to_timestamp
+
+__all__ = ('get_range', )
+
+# models which are incremented with the time an event was received
+RECEIPT_TIME_MODELS = frozenset(
+    model for model in TSDBModel
+    if any(kind in model.name for kind in (
+        '_total_received', '_total_rejected', '_total_blacklisted',
+    ))
+)
+
+# receipt time counters can still be incremented for a while after their
+# bucket ended by requests which are in flight
+SETTLE_DELAY = 5 * 60
+
+# other counters use the timestamp of the event, which is accepted for up to
+# 30 days in the past
+EVENT_TIME_SETTLE_DELAY = 31 * 24 * 60 * 60
+
+# memcached treats larger timeouts as absolute timestamps
+MAX_TTL = 7 * 24 * 60 * 60
+
+# stored for buckets which the backend did not return
+MISSING = ()
+
+
+def _get_cache_key(model, key, environment_id, rollup, epoch, closed):
+    return 'tsdb:range:%s:%s:%s:%s:%s:%s' % (
+        model.value,
+        key,
+        environment_id or '',
+        rollup,
+        epoch,
+        'c' if closed else 'o',
+    )
+
+
+def _fetch(model, keys, start_epoch, end, rollup, environment_id):
+    data = tsdb.get_range(
+        model=model,
+        keys=keys,
+        start=to_datetime(start_epoch),
+        end=end,
+        rollup=rollup,
+        environment_id=environment_id,
+    )
+    return {
+        (key, int(point[0])): point for key, points in six.iteritems(data) for point in points
+    }
+
+
+def get_range(model, keys, start, end, rollup=None, environment_id=None):
+    """
+    Identical to ``tsdb.get_range``, but closed buckets are only ever read
+    from the TSDB once.
+    """
+    if not options.get('api.stats.cache'):
+        return tsdb.get_range(
+            model=model,
+            keys=keys,
+            start=start,
+            end=end,
+            rollup=rollup,
+            environment_id=environment_id,
+        )
+
+    keys = list(keys)
+    rollup, series = tsdb.get_optimal_rollup_series(start, end, rollup)
+    settled = int(to_timestamp(timezone.now())) - (
+        SETTLE_DELAY if model in RECEIPT_TIME_MODELS else EVENT_TIME_SETTLE_DELAY
+    )
+
+    cache_keys = {}
+    for key in keys:
+        for epoch in series:
+            cache_keys[(key, epoch)] = _get_cache_key(
+                model, key, environment_id, rollup, epoch, epoch + rollup <= settled,
+            )
+    cached = cache.get_many(list(six.itervalues(cache_keys)))
+
+    points = {}
+    first_missing = {}
+    for (key, epoch), cache_key in six.iteritems(cache_keys):
+        value = cached.get(cache_key)
+        if value is None:
+            first_missing[key] = min(epoch, first_missing.get(key, epoch))
+        else:
+            points[(key, epoch)] = value
+
+    # keys which were cached up to the same bucket are read together, which
+    # usually leaves a read of the open buckets and one for new keys
+    keys_by_epoch = defaultdict(list)
+    for key, epoch in six.iteritems(first_missing):
+        keys_by_epoch[epoch].append(key)
+
+    closed_values = {}
+    open_values = {}
+    for start_epoch, epoch_keys in six.iteritems(keys_by_epoch):
+        fetched = _fetch(model, epoch_keys, start_epoch, end, rollup, environment_id)
+        for key in epoch_keys:
+            for epoch in series:
+                if epoch < start_epoch:
+                    continue
+                value = points[(key, epoch)] = fetched.get((key, epoch), MISSING)
+                if epoch + rollup <= settled:
+                    closed_values[cache_keys[(key, epoch)]] = value
+                else:
+                    open_values[cache_keys[(key, epoch)]] = value
+
+    if closed_values:
+        cache.set_many(
+            closed_values,
+            min(rollup * tsdb.get_rollups().get(rollup, 1), MAX_TTL),
+        )
+    open_ttl = options.get('api.stats.open-bucket-ttl')
+    if open_values and open_ttl:
+        cache.set_many(open_values, open_ttl)
+
+    result = {}
+    for key in keys:
+        key_points = [points[(key, epoch)] for epoch in series]
+        key_points = [point for point in key_points if point != MISSING]
+        if key_points:
+            result[key] = key_points
+    return result
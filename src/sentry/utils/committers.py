@@ -1,12 +1,15 @@
 from __future__ import absolute_import
 
+import bisect
 import operator
 import six
+import zlib
 
 from sentry.api.serializers import serialize
 from sentry.models import (Release, ReleaseCommit, Commit, CommitFileChange, Event, Group)
 from sentry.api.serializers.models.commit import CommitSerializer, get_users_for_commits
-from sentry.utils import metrics
+from sentry.utils import json, metrics
+from sentry.utils.cache import cache
 
 from django.db.models import Q
 
@@ -16,6 +19,11 @@ from six.moves import reduce
 
 PATH_SEPERATORS = frozenset(['/', '\\'])
 
+PATH_INDEX_CACHE_TTL = 60 * 60
+
+# memcached refuses to store items larger than 1MB
+PATH_INDEX_MAX_CACHE_SIZE = 1000 * 1000
+
 
 def tokenize_path(path):
     for sep in PATH_SEPERATORS:
@@ -34,6 +42,110 @@ def score_path_match_length(path_a, path_b):
     return score
 
 
+class CommitPathIndex(object):
+    """
+    Suffix index over the files changed by a set of commits.
+
+    Every file name is stored as its path components in reverse order, and
+    the keys are kept sorted. The files sharing the last ``n`` components
+    with a path then form a contiguous range of keys, so the best matches
+    for a path are found with a couple of binary searches per component
+    instead of scoring every changed file against it.
+    """
+
+    def __init__(self, file_changes=()):
+        entries = sorted(
+            (u'\x00'.join(tokenize_path(filename)), commit_id)
+            for filename, commit_id in file_changes
+        )
+        self.keys = [key for key, _ in entries]
+        self.commit_ids = [commit_id for _, commit_id in entries]
+
+    def dumps(self):
+        return zlib.compress(json.dumps([self.keys, self.commit_ids]))
+
+    @classmethod
+    def loads(cls, value):
+        index = cls()
+        index.keys, index.commit_ids = json.loads(zlib.decompress(value))
+        return index
+
+    def _find(self, prefix):
+        # keys which are the prefix or continue it with more components
+        return (
+            bisect.bisect_left(self.keys, prefix),
+            bisect.bisect_left(self.keys, prefix + u'\x01'),
+        )
+
+    def match(self, path):
+        """
+        Returns the number of trailing path components the best matching
+        files share with ``path`` and the ids of the commits which changed
+        them.
+        """
+        score = 0
+        lo = hi = 0
+        prefix = None
+        for token in tokenize_path(path):
+            key = token if prefix is None else prefix + u'\x00' + token
+            start, stop = self._find(key)
+            if start == stop:
+                break
+            prefix, lo, hi = key, start, stop
+            score += 1
+
+        if score == 1:
+            # only the file name matches, which is only trusted when the
+            # changed file has no directory either
+            hi = bisect.bisect_right(self.keys, prefix, lo, hi)
+        if not score or lo == hi:
+            return 0, set()
+        return score, set(self.commit_ids[lo:hi])
+
+
+def _get_release_file_changes(release):
+    return CommitFileChange.objects.filter(
+        commit__in=ReleaseCommit.objects.filter(
+            release=release,
+        ).values('commit'),
+    )
+
+
+def get_commit_path_index(release, paths):
+    # the commit count and last commit change whenever commits are set
+    cache_key = 'committers:path-index:%s:%s:%s' % (
+        release.id, release.commit_count, release.last_commit_id,
+    )
+    value = cache.get(cache_key)
+    if value is None:
+        index = CommitPathIndex(
+            _get_release_file_changes(release).values_list('filename', 'commit_id'),
+        )
+        value = index.dumps()
+        if len(value) > PATH_INDEX_MAX_CACHE_SIZE:
+            # remember that the index can't be cached, so that it isn't
+            # built again for every event
+            metrics.incr('committers.path-index.too-large')
+            value = ''
+        cache.set(cache_key, value, PATH_INDEX_CACHE_TTL)
+        return index
+
+    if value:
+        return CommitPathIndex.loads(value)
+
+    # the index is too large to be cached, only load the files with the same
+    # names as the paths
+    path_query = reduce(
+        operator.or_,
+        (Q(filename__endswith=next(tokenize_path(path))) for path in paths)
+    )
+    return CommitPathIndex(
+        _get_release_file_changes(release).filter(
+            path_query,
+        ).values_list('filename', 'commit_id'),
+    )
+
+
 def _get_frame_paths(event):
     data = event.data
     try:
@@ -55,39 +167,23 @@ def _get_commits(releases):
     ).select_related('author'))
 
 
-def _get_commit_file_changes(commits, path_name_set):
-    # build a single query to get all of the commit file that might match the first n frames
-    path_query = reduce(
-        operator.or_,
-        (Q(filename__endswith=next(tokenize_path(path))) for path in path_name_set)
-    )
-
-    commit_file_change_matches = CommitFileChange.objects.filter(
-        path_query,
-        commit__in=commits,
-    )
-
-    return list(commit_file_change_matches)
-
-
-def _match_commits_path(commit_file_changes, path):
-    # find commits that match the run time path the best.
-    matching_commits = {}
-    best_score = 1
-    for file_change in commit_file_changes:
-        score = score_path_match_length(file_change.filename, path)
+def _match_commits_path(indexes, commits_by_id, path):
+    # find commits that match the run time path the best, across all of the
+    # releases. We want a list of unique commits that tie for longest match.
+    best_score = 0
+    commit_ids = set()
+    for index in indexes:
+        score, ids = index.match(path)
         if score > best_score:
-            # reset matches for better match.
             best_score = score
-            matching_commits = {}
-        if score == best_score:
-            # skip 1-score matches when file change is longer than 1 token
-            if score == 1 and len(list(tokenize_path(file_change.filename))) > 1:
-                continue
-            #  we want a list of unique commits that tie for longest match
-            matching_commits[file_change.commit.id] = (file_change.commit, score)
+            commit_ids = set(ids)
+        elif score and score == best_score:
+            commit_ids |= ids
 
-    return matching_commits.values()
+    return [
+        (commits_by_id[commit_id], best_score)
+        for commit_id in commit_ids if commit_id in commits_by_id
+    ]
 
 
 def _get_commits_committer(commits, author_id):
@@ -189,12 +285,13 @@ def get_event_file_committers(project, event, frame_limit=25):
     path_set = {f for f in (frame.get('filename') or frame.get('abs_path')
                             for frame in app_frames) if f}
 
-    file_changes = []
-    if path_set:
-        file_changes = _get_commit_file_changes(commits, path_set)
+    indexes = [
+        get_commit_path_index(release, path_set) for release in releases
+    ] if path_set else []
+    commits_by_id = {commit.id: commit for commit in commits}
 
     commit_path_matches = {
-        path: _match_commits_path(file_changes, path) for path in path_set
+        path: _match_commits_path(indexes, commits_by_id, path) for path in path_set
     }
 
     annotated_frames = [
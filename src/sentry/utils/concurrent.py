@@ -4,7 +4,7 @@ import logging
 import sys
 import threading
 from Queue import Full, PriorityQueue
-from concurrent.futures import Future
+from concurrent.futures import Future, wait
 from concurrent.futures._base import RUNNING, FINISHED
 from time import time
 
@@ -245,3 +245,20 @@ class FutureSet(object):
 
         if remaining == 0:
             self.__execute_callback(callback)
+
+
+def execute_all(callables, executor, timeout=None):
+    """\
+    Submit every callable in the ``callables`` mapping to ``executor`` and
+    wait (for at most ``timeout`` seconds) for all of them to complete.
+
+    Returns a mapping with the same keys as ``callables`` where every value is
+    the ``TimedFuture`` for that callable. Futures that did not complete
+    before the timeout expired are cancelled (if they had not started yet) and
+    will raise when their result is requested.
+    """
+    futures = {key: executor.submit(callable) for key, callable in callables.items()}
+    done, not_done = wait(futures.values(), timeout=timeout)
+    for future in not_done:
+        future.cancel()
+    return futures
@@ -50,12 +50,13 @@ class Cursor(object):
 
 
 class CursorResult(Sequence):
-    def __init__(self, results, next, prev, hits=None, max_hits=None):
+    def __init__(self, results, next, prev, hits=None, max_hits=None, hits_mode=None):
         self.results = results
         self.next = next
         self.prev = prev
         self.hits = hits
         self.max_hits = max_hits
+        self.hits_mode = hits_mode
 
     def __len__(self):
         return len(self.results)
@@ -198,7 +199,8 @@ def _build_prev_values(cursor, results, key, limit, is_desc):
     return (prev_value, prev_offset, has_prev)
 
 
-def build_cursor(results, key, limit=100, is_desc=False, cursor=None, hits=None, max_hits=None):
+def build_cursor(results, key, limit=100, is_desc=False, cursor=None, hits=None, max_hits=None,
+                 hits_mode=None):
     if cursor is None:
         cursor = Cursor(0, 0, 0)
 
@@ -239,4 +241,5 @@ def build_cursor(results, key, limit=100, is_desc=False, cursor=None, hits=None,
         prev=prev_cursor,
         hits=hits,
         max_hits=max_hits,
+        hits_mode=hits_mode,
     )
@@ -10,7 +10,7 @@ from __future__ import absolute_import
 import six
 
 from django.conf import settings
-from django.db import connections, DEFAULT_DB_ALIAS
+from django.db import close_old_connections, connections, DEFAULT_DB_ALIAS
 from django.db.models.fields.related import SingleRelatedObjectDescriptor
 
 
@@ -104,3 +104,19 @@ def attach_foreignkey(objects, field, related=[], database=None):
 
 def table_exists(name, using=DEFAULT_DB_ALIAS):
     return name in connections[using].introspection.table_names()
+
+
+def close_connections_after(func):
+    """
+    Wraps a callable that is executed on a worker thread so that the database
+    connections it opened are cleaned up once it returns. Django connections
+    are thread local, so every worker thread holds its own connection which is
+    released here according to the ``CONN_MAX_AGE`` setting (or immediately if
+    it is unusable.)
+    """
+    def wrapped(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapped
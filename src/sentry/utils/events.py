@@ -0,0 +1,91 @@
+"""
+sentry.utils.events
+~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2018 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+from __future__ import absolute_import
+
+import six
+
+__all__ = ('hydrate_events', )
+
+
+def _bind_data(event_list):
+    from sentry.models import Event
+
+    # events which were bound already would be fetched again
+    Event.objects.bind_nodes(
+        [e for e in event_list if e.data._node_data is None],
+        'data',
+    )
+
+
+def _prefetch_groups(event_list):
+    from sentry.models import Group
+
+    missing = [e for e in event_list if e.group_id and not hasattr(e, '_group_cache')]
+    groups = Group.objects.in_bulk(set(e.group_id for e in missing))
+    for event in missing:
+        group = groups.get(event.group_id)
+        if group is not None:
+            event.group = group
+
+
+def _prefetch_projects(event_list):
+    from sentry.models import Project
+
+    missing = [e for e in event_list if not hasattr(e, '_project_cache')]
+    projects = Project.objects.in_bulk(set(e.project_id for e in missing))
+    for event in missing:
+        project = projects.get(event.project_id)
+        if project is not None:
+            event.project = project
+
+
+def _prefetch_releases(event_list):
+    from sentry.models import ReleaseProject
+
+    missing = [e for e in event_list if not hasattr(e, '_release_cache')]
+    versions = {e: e.get_tag('sentry:release') for e in missing}
+    if not any(six.itervalues(versions)):
+        for event in missing:
+            event._release_cache = None
+        return
+
+    releases = {
+        (rp.project_id, rp.release.version): rp.release
+        for rp in ReleaseProject.objects.filter(
+            project__in=set(e.project_id for e in missing),
+            release__version__in=set(v for v in six.itervalues(versions) if v),
+        ).select_related('release')
+    }
+    for event in missing:
+        event._release_cache = releases.get((event.project_id, versions[event]))
+
+
+def hydrate_events(event_list, groups=True, projects=True, releases=False):
+    """
+    Load everything the given events refer to with a fixed number of
+    queries, regardless of how many events are passed.
+
+    Node data is always bound, related objects are attached so that
+    ``Event.group``, ``Event.project`` and ``Event.get_release`` don't
+    need to query them one event at a time. Anything which is already
+    loaded is skipped.
+
+    >>> hydrate_events(events, releases=True)
+    """
+    event_list = list(event_list)
+    if not event_list:
+        return event_list
+
+    _bind_data(event_list)
+    if groups:
+        _prefetch_groups(event_list)
+    if projects:
+        _prefetch_projects(event_list)
+    if releases:
+        _prefetch_releases(event_list)
+    return event_list
@@ -3,13 +3,15 @@ from __future__ import absolute_import
 __all__ = ['timing', 'incr']
 
 import logging
+import six
 
+from collections import defaultdict
 from contextlib import contextmanager
 from django.conf import settings
 from random import random
 from time import time
 from threading import Thread
-from six.moves.queue import Queue
+from six.moves.queue import Empty, Full, Queue
 
 
 def get_default_backend():
@@ -48,25 +50,49 @@ class InternalMetrics(object):
         self._started = False
 
     def _start(self):
-        self.q = q = Queue()
+        self.q = q = Queue(maxsize=settings.SENTRY_INTERNAL_METRICS_QUEUE_SIZE)
+
+        def get_batch():
+            # block until there is work, then drain whatever else arrives
+            # within the flush interval into the same batch
+            batch = [q.get()]
+            deadline = time() + settings.SENTRY_INTERNAL_METRICS_FLUSH_INTERVAL
+            while True:
+                timeout = deadline - time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=timeout))
+                except Empty:
+                    break
+            return batch
 
         def worker():
             from sentry import tsdb
 
             while True:
-                key, instance, tags, amount = q.get()
-                amount = _sampled_value(amount)
-                if instance:
-                    full_key = '{}.{}'.format(key, instance)
-                else:
-                    full_key = key
+                batch = get_batch()
+                counts = defaultdict(int)
+                for key, instance, tags, amount in batch:
+                    if instance:
+                        full_key = '{}.{}'.format(key, instance)
+                    else:
+                        full_key = key
+                    counts[full_key] += _sampled_value(amount)
+
+                keys_by_count = defaultdict(list)
+                for full_key, amount in six.iteritems(counts):
+                    keys_by_count[amount].append((tsdb.models.internal, full_key))
+
                 try:
-                    tsdb.incr(tsdb.models.internal, full_key, count=amount)
+                    for amount, items in six.iteritems(keys_by_count):
+                        tsdb.incr_multi(items, count=amount)
                 except Exception:
                     logger = logging.getLogger('sentry.errors')
                     logger.exception('Unable to incr internal metric')
                 finally:
-                    q.task_done()
+                    for _ in batch:
+                        q.task_done()
 
         t = Thread(target=worker)
         t.setDaemon(True)
@@ -77,7 +103,16 @@ class InternalMetrics(object):
     def incr(self, key, instance=None, tags=None, amount=1):
         if not self._started:
             self._start()
-        self.q.put((key, instance, tags, amount))
+        try:
+            # Apply back-pressure when the worker falls behind, but never
+            # stall the caller indefinitely on an internal metric.
+            self.q.put(
+                (key, instance, tags, amount),
+                timeout=settings.SENTRY_INTERNAL_METRICS_PUT_TIMEOUT,
+            )
+        except Full:
+            logger = logging.getLogger('sentry.errors')
+            logger.warning('Internal metrics queue is full, dropping metric')
 
 
 internal = InternalMetrics()
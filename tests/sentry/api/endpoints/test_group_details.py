@@ -11,9 +11,26 @@ from sentry.models import (
     Activity, Environment, Group, GroupHash, GroupAssignee, GroupBookmark, GroupResolution, GroupSeen,
     GroupSnooze, GroupSubscription, GroupStatus, GroupTombstone, Release
 )
+from sentry.plugins import IssueTrackingPlugin, IssueTrackingPlugin2, plugins
 from sentry.testutils import APITestCase
 
 
+class DummyIssuePlugin(IssueTrackingPlugin):
+    slug = 'dummy-issue'
+    conf_key = 'dummy-issue'
+
+    def is_configured(self, request, project, **kwargs):
+        return True
+
+
+class DummyIssuePlugin2(IssueTrackingPlugin2):
+    slug = 'dummy-issue2'
+    conf_key = 'dummy-issue2'
+
+    def is_configured(self, request, project, **kwargs):
+        return True
+
+
 class GroupDetailsTest(APITestCase):
     def test_simple(self):
         self.login_as(user=self.user)
@@ -105,6 +122,72 @@ class GroupDetailsTest(APITestCase):
             assert response.status_code == 200
             assert make_series.call_count == 2
 
+    def test_plugin_sections(self):
+        self.login_as(user=self.user)
+        group = self.create_group()
+        issue_plugin = DummyIssuePlugin()
+        issue_plugin2 = DummyIssuePlugin2()
+
+        def for_project(project, version=1):
+            return [issue_plugin, issue_plugin2] if version == 1 else []
+
+        url = '/api/0/issues/{}/'.format(group.id)
+        for concurrent in (False, True):
+            with self.options({'api.group-details.concurrent-sections': concurrent}), \
+                    mock.patch.object(plugins, 'for_project', side_effect=for_project):
+                response = self.client.get(url, format='json')
+
+            assert response.status_code == 200, response.content
+            assert [action[0] for action in response.data['pluginActions']] == [
+                issue_plugin.get_new_issue_title(),
+            ]
+            assert [item['slug'] for item in response.data['pluginIssues']] == ['dummy-issue2']
+
+    def test_section_timeout(self):
+        from sentry.api.endpoints.group_details import GroupDetailsEndpoint
+        from sentry.utils.concurrent import SynchronousExecutor, TimedFuture
+
+        group = self.create_group()
+        executor = SynchronousExecutor()
+        futures = {
+            'activity': executor.submit(lambda: ['activity']),
+            'pluginIssues': TimedFuture(),  # still running
+        }
+
+        with mock.patch('sentry.api.endpoints.group_details.metrics') as metrics:
+            sections = GroupDetailsEndpoint()._collect_sections(
+                group, futures, deadlines={'activity': 0, 'pluginIssues': 0})
+
+        assert sections == {
+            'activity': ['activity'],
+            'pluginIssues': [],
+        }
+        metrics.incr.assert_called_once_with(
+            'api.group-details.section.timeout', tags={'section': 'pluginIssues'})
+        assert futures['pluginIssues'].cancelled()
+
+    def test_section_queue_full(self):
+        from sentry.api.endpoints.group_details import GroupDetailsEndpoint
+        from Queue import Full
+        from sentry.utils.concurrent import SynchronousExecutor
+
+        full = SynchronousExecutor().submit(mock.Mock(side_effect=Full))
+        executor = mock.Mock()
+        executor.submit.return_value = full
+
+        with self.options({'api.group-details.concurrent-sections': True}), \
+                mock.patch('sentry.api.endpoints.group_details.get_section_executor',
+                           return_value=executor):
+            futures, deadlines = GroupDetailsEndpoint()._submit_sections({
+                'activity': lambda: ['activity'],
+                'pluginIssues': lambda: ['issue'],
+            })
+
+        # sections which don't fit into the queue run on the request thread
+        assert futures['activity'].result() == ['activity']
+        assert futures['pluginIssues'].result() == ['issue']
+        assert deadlines['pluginIssues'] < deadlines['activity']
+
 
 class GroupUpdateTest(APITestCase):
     def test_resolve(self):
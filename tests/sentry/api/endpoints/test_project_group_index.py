@@ -11,8 +11,8 @@ from mock import patch
 
 from sentry import tagstore
 from sentry.models import (
-    Activity, ApiToken, EventMapping, Group, GroupAssignee, GroupBookmark, GroupHash, GroupResolution,
-    GroupSeen, GroupSnooze, GroupStatus, GroupSubscription,
+    Activity, ApiToken, EventMapping, FeatureAdoption, Group, GroupAssignee, GroupBookmark,
+    GroupHash, GroupResolution, GroupSeen, GroupSnooze, GroupStatus, GroupSubscription,
     GroupTombstone, Release, UserOption, GroupShare,
 )
 from sentry.models.event import Event
@@ -1192,8 +1192,8 @@ class GroupUpdateTest(APITestCase):
         assert not r4.exists()
 
     @patch('sentry.api.endpoints.project_group_index.uuid4')
-    @patch('sentry.api.endpoints.project_group_index.merge_group')
-    def test_merge(self, merge_group, mock_uuid4):
+    @patch('sentry.api.endpoints.project_group_index.merge_groups')
+    def test_merge(self, merge_groups, mock_uuid4):
         class uuid(object):
             hex = 'abc123'
 
@@ -1224,17 +1224,12 @@ class GroupUpdateTest(APITestCase):
             ]
         )
 
-        assert len(merge_group.mock_calls) == 2
-        merge_group.delay.assert_any_call(
-            from_object_id=group1.id,
-            to_object_id=group2.id,
-            transaction_id='abc123',
-        )
-        merge_group.delay.assert_any_call(
-            from_object_id=group3.id,
-            to_object_id=group2.id,
-            transaction_id='abc123',
-        )
+        # all children are merged by a single task
+        assert len(merge_groups.mock_calls) == 1
+        _, kwargs = merge_groups.delay.call_args
+        assert sorted(kwargs['from_object_ids']) == sorted([group1.id, group3.id])
+        assert kwargs['to_object_id'] == group2.id
+        assert kwargs['transaction_id'] == 'abc123'
 
     def test_assign(self):
         group1 = self.create_group(checksum='a' * 32, is_public=True)
@@ -1386,6 +1381,10 @@ class GroupUpdateTest(APITestCase):
         assert tombstone.culprit == group1.culprit
         assert tombstone.project == group1.project
         assert tombstone.data == group1.data
+        assert FeatureAdoption.objects.get_by_slug(
+            organization=group1.project.organization,
+            slug='delete_and_discard',
+        )
 
 
 class GroupDeleteTest(APITestCase):
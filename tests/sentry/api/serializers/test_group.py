@@ -13,12 +13,27 @@ from mock import patch
 from sentry.api.serializers import serialize
 from sentry.api.serializers.models.group import StreamGroupSerializer
 from sentry.models import (
-    Environment, GroupResolution, GroupSnooze, GroupStatus,
+    Environment, GroupMeta, GroupResolution, GroupSnooze, GroupStatus,
     GroupSubscription, UserOption, UserOptionValue
 )
+from sentry.plugins import IssueTrackingPlugin, plugins
 from sentry.testutils import TestCase
 
 
+class DummyIssuePlugin(IssueTrackingPlugin):
+    slug = 'dummy-issue'
+    conf_key = 'dummy-issue'
+
+    def is_configured(self, request, project, **kwargs):
+        return True
+
+    def get_issue_label(self, group, issue_id, **kwargs):
+        return u'DUMMY-%s' % issue_id
+
+    def get_issue_url(self, group, issue_id, **kwargs):
+        return u'https://example.com/issues/%s' % issue_id
+
+
 class GroupSerializerTest(TestCase):
     def test_is_ignored_with_expired_snooze(self):
         now = timezone.now().replace(microsecond=0)
@@ -270,6 +285,36 @@ class GroupSerializerTest(TestCase):
         result = serialize(group)
         assert not result['isSubscribed']
 
+    @patch('sentry.api.serializers.models.group.metrics.timing')
+    def test_records_lookup_timings(self, timing):
+        user = self.create_user()
+        group = self.create_group()
+
+        serialize(group, user)
+
+        lookups = set(kwargs['tags']['lookup'] for args, kwargs in timing.call_args_list)
+        assert lookups == set([
+            'assignees', 'ignore_items', 'resolutions', 'share_ids',
+            'bookmarks', 'seen_groups', 'subscriptions', 'user_counts',
+        ])
+
+    def test_annotations(self):
+        group = self.create_group()
+        GroupMeta.objects.create(group=group, key='dummy-issue:tid', value='1')
+        plugin = DummyIssuePlugin()
+
+        def for_project(project, version=1):
+            return [plugin] if version == 1 else []
+
+        for concurrent in (False, True):
+            GroupMeta.objects.clear_local_cache()
+            with self.options({'api.group-serializer.concurrent-lookups': concurrent}), \
+                    mock.patch.object(plugins, 'for_project', side_effect=for_project):
+                result = serialize(group, self.user)
+
+            assert len(result['annotations']) == 1, concurrent
+            assert 'DUMMY-1' in result['annotations'][0]
+
 
 class StreamGroupSerializerTestCase(TestCase):
     def test_environment(self):
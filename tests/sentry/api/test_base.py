@@ -1,13 +1,15 @@
 from __future__ import absolute_import
 
 import base64
+import zlib
 
 from django.http import HttpRequest
 from rest_framework.response import Response
 
 from sentry.api.base import Endpoint
-from sentry.models import ApiKey
+from sentry.models import ApiKey, Project
 from sentry.testutils import APITestCase
+from sentry.utils import json
 
 
 class DummyEndpoint(Endpoint):
@@ -20,6 +22,51 @@ class DummyEndpoint(Endpoint):
 _dummy_endpoint = DummyEndpoint.as_view()
 
 
+class DummyLargeEndpoint(Endpoint):
+    permission_classes = ()
+
+    def get(self, request):
+        return Response({"values": ["x" * 100] * 100})
+
+
+_dummy_large_endpoint = DummyLargeEndpoint.as_view()
+
+
+class DummyPaginationEndpoint(Endpoint):
+    permission_classes = ()
+
+    def get(self, request):
+        return self.paginate(
+            request=request,
+            queryset=Project.objects.all(),
+            order_by='id',
+            on_results=lambda x: [{'id': p.id} for p in x],
+            stream=True,
+        )
+
+
+_dummy_pagination_endpoint = DummyPaginationEndpoint.as_view()
+
+
+class DummyBrokenPaginationEndpoint(Endpoint):
+    permission_classes = ()
+
+    def get(self, request):
+        def on_results(results):
+            raise ValueError('broken')
+
+        return self.paginate(
+            request=request,
+            queryset=Project.objects.all(),
+            order_by='id',
+            on_results=on_results,
+            stream=True,
+        )
+
+
+_dummy_broken_pagination_endpoint = DummyBrokenPaginationEndpoint.as_view()
+
+
 class EndpointTest(APITestCase):
     def test_basic_cors(self):
         org = self.create_organization()
@@ -40,3 +87,57 @@ class EndpointTest(APITestCase):
         assert response.status_code == 200, response.content
 
         assert response['Access-Control-Allow-Origin'] == 'http://example.com'
+
+    def test_compression(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT_ENCODING'] = 'gzip, deflate'
+
+        with self.options({'api.response.compression': True}):
+            response = _dummy_large_endpoint(request)
+            response.render()
+
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response['Vary']
+        content = zlib.decompress(response.content, 16 + zlib.MAX_WBITS)
+        assert json.loads(content) == {"values": ["x" * 100] * 100}
+
+        # small responses are not worth compressing
+        with self.options({'api.response.compression': True}):
+            response = _dummy_endpoint(request)
+            response.render()
+
+        assert not response.has_header('Content-Encoding')
+        assert json.loads(response.content) == {"ok": True}
+
+    def test_streaming(self):
+        projects = [self.create_project() for _ in range(30)]
+
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT_ENCODING'] = 'gzip'
+
+        with self.options({
+            'api.response.compression': True,
+            'api.response.streaming': True,
+        }):
+            response = _dummy_pagination_endpoint(request)
+            content = b''.join(response.streaming_content)
+
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+        assert json.loads(content) == [{'id': p.id} for p in projects]
+
+    def test_streaming_error(self):
+        self.create_project()
+
+        request = HttpRequest()
+        request.method = 'GET'
+
+        with self.options({'api.response.streaming': True}):
+            response = _dummy_broken_pagination_endpoint(request)
+            response.render()
+
+        assert response.status_code == 500
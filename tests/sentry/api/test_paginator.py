@@ -6,6 +6,8 @@ from django.utils import timezone
 from unittest import TestCase as SimpleTestCase
 
 from sentry.api.paginator import (
+    HITS_CACHED,
+    HITS_EXACT,
     Paginator,
     DateTimePaginator,
     OffsetPaginator,
@@ -59,6 +61,31 @@ class PaginatorTest(TestCase):
         result = paginator.count_hits(1)
         assert result == 1
 
+    def test_count_hits_estimate(self):
+        self.create_user('foo@example.com')
+        self.create_user('bar@example.com')
+
+        paginator = self.cls(User.objects.all(), 'id', hits_mode='estimate')
+        assert paginator.count_hits(1) == 1
+
+        paginator = self.cls(User.objects.none(), 'id', hits_mode='estimate')
+        assert paginator.get_hits(1000) == (0, HITS_EXACT)
+
+    def test_count_hits_cached(self):
+        self.create_user('foo@example.com')
+
+        paginator = self.cls(User.objects.all(), 'id', hits_mode='cached')
+        assert paginator.get_hits(1000) == (1, HITS_EXACT)
+
+        # the count is reused for the same query, regardless of ordering
+        self.create_user('bar@example.com')
+        paginator = self.cls(User.objects.all(), '-id', hits_mode='cached')
+        assert paginator.get_hits(1000) == (1, HITS_CACHED)
+
+        result = paginator.get_result(limit=1, count_hits=True)
+        assert result.hits == 1
+        assert result.hits_mode == HITS_CACHED
+
     def test_prev_emptyset(self):
         queryset = User.objects.all()
 
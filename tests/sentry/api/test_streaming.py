@@ -0,0 +1,48 @@
+from __future__ import absolute_import
+
+import zlib
+
+from django.http import HttpRequest
+from rest_framework.renderers import JSONRenderer
+
+from sentry.api.streaming import (
+    compress, compress_chunks, get_content_encoding, iter_json_list
+)
+from sentry.testutils import TestCase
+
+
+class GetContentEncodingTest(TestCase):
+    def get_encoding(self, value):
+        request = HttpRequest()
+        if value is not None:
+            request.META['HTTP_ACCEPT_ENCODING'] = value
+        return get_content_encoding(request)
+
+    def test_simple(self):
+        assert self.get_encoding(None) is None
+        assert self.get_encoding('') is None
+        assert self.get_encoding('identity') is None
+        assert self.get_encoding('gzip, deflate') == 'gzip'
+        assert self.get_encoding('deflate;q=1.0, GZIP;q=0.5') == 'gzip'
+        assert self.get_encoding('gzip;q=0') is None
+        assert self.get_encoding('*') is not None
+
+
+class CompressTest(TestCase):
+    def test_gzip(self):
+        chunks = [b'[', b'{"foo": "bar"}', b', ', b'{"foo": "baz"}', b']']
+        content = b''.join(compress_chunks(chunks, 'gzip'))
+        assert zlib.decompress(content, 16 + zlib.MAX_WBITS) == b''.join(chunks)
+        assert zlib.decompress(compress(b'foo', 'gzip'), 16 + zlib.MAX_WBITS) == b'foo'
+
+
+class IterJsonListTest(TestCase):
+    def test_matches_renderer(self):
+        renderer = JSONRenderer()
+        items = [{'id': i, 'name': u'☃'} for i in range(5)] + [None]
+        content = b''.join(iter_json_list([items[:2], [], items[2:]]))
+        assert content == renderer.render(items)
+
+    def test_empty(self):
+        assert b''.join(iter_json_list([])) == b'[]'
+        assert b''.join(iter_json_list([[]])) == b'[]'
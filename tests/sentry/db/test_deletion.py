@@ -3,7 +3,7 @@ from __future__ import absolute_import
 from datetime import timedelta
 from django.utils import timezone
 
-from sentry.db.deletion import BulkDeleteQuery
+from sentry.db.deletion import BulkDeleteQuery, DeletionCheckpoint, IncrementalDeleteQuery
 from sentry.models import Group, Project
 from sentry.testutils import TestCase
 
@@ -41,3 +41,65 @@ class BulkDeleteQueryTest(TestCase):
         assert not Group.objects.filter(id=group1_1.id).exists()
         assert not Group.objects.filter(id=group1_2.id).exists()
         assert Group.objects.filter(id=group1_3.id).exists()
+
+
+class IncrementalDeleteQueryTest(TestCase):
+    def test_execute(self):
+        now = timezone.now()
+        project = self.create_project()
+        old = [
+            self.create_group(project, last_seen=now - timedelta(days=2, minutes=i))
+            for i in range(5)
+        ]
+        new = self.create_group(project, last_seen=now)
+
+        deleted = IncrementalDeleteQuery(
+            model=Group,
+            dtfield='last_seen',
+            days=1,
+            chunk_size=2,
+        ).execute()
+
+        assert deleted == 5
+        assert not Group.objects.filter(id__in=[g.id for g in old]).exists()
+        assert Group.objects.filter(id=new.id).exists()
+
+    def test_checkpoint(self):
+        now = timezone.now()
+        project = self.create_project()
+        groups = [
+            self.create_group(project, last_seen=now - timedelta(days=2, minutes=i))
+            for i in range(4)
+        ]
+        checkpoint = DeletionCheckpoint('test')
+        # everything up to the second oldest group was already handled
+        checkpoint.set(groups[2].last_seen, groups[2].id)
+
+        deleted = []
+        IncrementalDeleteQuery(
+            model=Group,
+            dtfield='last_seen',
+            days=1,
+            checkpoint=checkpoint,
+            delete=deleted.extend,
+        ).execute()
+
+        assert deleted == [groups[1].id, groups[0].id]
+        # a completed pass starts over the next time
+        assert checkpoint.get() is None
+
+    def test_max_duration(self):
+        project = self.create_project()
+        self.create_group(project, last_seen=timezone.now() - timedelta(days=2))
+        checkpoint = DeletionCheckpoint('test')
+
+        deleted = IncrementalDeleteQuery(
+            model=Group,
+            dtfield='last_seen',
+            days=1,
+            checkpoint=checkpoint,
+            chunk_size=1,
+        ).execute(max_duration=-1)
+
+        assert deleted == 0
+        assert Group.objects.count() == 1
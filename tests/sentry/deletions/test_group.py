@@ -1,12 +1,13 @@
 from __future__ import absolute_import
 
+from mock import patch
 from uuid import uuid4
 
-from sentry import tagstore
+from sentry import nodestore, tagstore
 from sentry.tagstore.models import EventTag
 from sentry.models import (
     Event, EventMapping, Group, GroupAssignee, GroupHash, GroupMeta, GroupRedirect,
-    ScheduledDeletion
+    ScheduledDeletion, UserReport
 )
 from sentry.tasks.deletion import run_deletion
 from sentry.testutils import TestCase
@@ -81,3 +82,37 @@ class DeleteGroupTest(TestCase):
         assert not GroupRedirect.objects.filter(group_id=group.id).exists()
         assert not GroupHash.objects.filter(group_id=group.id).exists()
         assert not Group.objects.filter(id=group.id).exists()
+
+    def test_events_in_bulk(self):
+        project = self.create_project()
+        group = self.create_group(project=project)
+        other_group = self.create_group(project=project)
+        events = [self.create_event(group=group) for _ in range(5)]
+        other_event = self.create_event(group=other_group)
+        UserReport.objects.create(
+            project=project,
+            group=group,
+            event_id=events[0].event_id,
+            name='Jane Doe',
+            email='jane@example.com',
+            comments='It broke',
+        )
+        node_ids = [e.data.id for e in events]
+
+        deletion = ScheduledDeletion.schedule(group, days=0)
+        deletion.update(in_progress=True)
+
+        with patch.object(nodestore, 'delete') as delete, \
+                patch.object(nodestore, 'delete_multi') as delete_multi, \
+                self.tasks():
+            run_deletion(deletion.id)
+
+        # nodes are removed in a single call, not once per event
+        assert not delete.called
+        assert delete_multi.call_count == 1
+        assert sorted(delete_multi.call_args[0][0]) == sorted(node_ids)
+
+        assert not Event.objects.filter(group_id=group.id).exists()
+        assert not UserReport.objects.filter(group=group).exists()
+        assert Event.objects.filter(id=other_event.id).exists()
+        assert Group.objects.filter(id=other_group.id).exists()
@@ -6,10 +6,11 @@ import responses
 import six
 from symbolic import SourceMapTokenMatch
 
-from mock import patch
+from mock import Mock, patch
 from requests.exceptions import RequestException
 
 from sentry import http
+from sentry.app import locks
 from sentry.lang.javascript.processor import (
     discover_sourcemap,
     fetch_sourcemap,
@@ -17,6 +18,10 @@ from sentry.lang.javascript.processor import (
     generate_module,
     trim_line,
     fetch_release_file,
+    fetch_single_flight,
+    prefetch_release_artifacts,
+    get_release_artifact_index_cache_key,
+    invalidate_release_artifact_index,
     UnparseableSourcemap,
     get_max_age,
     CACHE_CONTROL_MAX,
@@ -25,6 +30,8 @@ from sentry.lang.javascript.processor import (
 from sentry.lang.javascript.errormapping import (rewrite_exception, REACT_MAPPING_URL)
 from sentry.models import File, Release, ReleaseFile, EventError
 from sentry.testutils import TestCase
+from sentry.utils.cache import cache
+from sentry.utils.hashlib import md5_text
 from sentry.utils.strings import truncatechars
 
 base64_sourcemap = 'data:application/json;base64,eyJ2ZXJzaW9uIjozLCJmaWxlIjoiZ2VuZXJhdGVkLmpzIiwic291cmNlcyI6WyIvdGVzdC5qcyJdLCJuYW1lcyI6W10sIm1hcHBpbmdzIjoiO0FBQUEiLCJzb3VyY2VzQ29udGVudCI6WyJjb25zb2xlLmxvZyhcImhlbGxvLCBXb3JsZCFcIikiXX0='
@@ -168,6 +175,100 @@ class FetchReleaseFileTest(TestCase):
         )
 
 
+class PrefetchReleaseArtifactsTest(TestCase):
+    def setUp(self):
+        self.release = Release.objects.create(
+            organization_id=self.project.organization_id,
+            version='abc',
+        )
+        self.release.add_project(self.project)
+
+        file = File.objects.create(
+            name='~/file.min.js',
+            type='release.file',
+            headers={'Content-Type': 'application/json; charset=utf-8'},
+        )
+        self.body = unicode_body.encode('utf-8')
+        file.putfile(six.BytesIO(self.body))
+
+        ReleaseFile.objects.create(
+            name='~/file.min.js',
+            release=self.release,
+            organization_id=self.project.organization_id,
+            file=file,
+        )
+
+    def test_warm_cache(self):
+        assert prefetch_release_artifacts(self.release) == 1
+
+        with self.assertNumQueries(0):
+            result = fetch_release_file('http://example.com/file.min.js', self.release)
+
+        assert result == http.UrlResult(
+            'http://example.com/file.min.js',
+            {'content-type': 'application/json; charset=utf-8'},
+            self.body,
+            200,
+            'utf-8',
+        )
+
+    def test_missing_artifact(self):
+        prefetch_release_artifacts(self.release)
+
+        with self.assertNumQueries(0):
+            assert fetch_release_file('http://example.com/other.js', self.release) is None
+
+    def test_artifacts_changed_while_indexing(self):
+        get_release_files = ReleaseFile.objects.filter
+
+        def upload(*args, **kwargs):
+            # an artifact is uploaded while the index is being built
+            invalidate_release_artifact_index(self.release.id)
+            return get_release_files(*args, **kwargs)
+
+        with patch.object(ReleaseFile.objects, 'filter', side_effect=upload):
+            prefetch_release_artifacts(self.release)
+
+        assert cache.get(get_release_artifact_index_cache_key(self.release.id)) is None
+
+
+class FetchSingleFlightTest(TestCase):
+    def hold_lock(self, key):
+        return locks.get(
+            'sourcemaps:fetch:%s' % (md5_text(key).hexdigest(), ),
+            duration=10,
+        ).acquire()
+
+    def test_fetch(self):
+        fetch = Mock(return_value='foo')
+        assert fetch_single_flight('key', lambda: None, fetch, 'test') == 'foo'
+        assert fetch.call_count == 1
+
+    def test_fetched_while_waiting_for_lock(self):
+        fetch = Mock()
+        assert fetch_single_flight('key', lambda: 'foo', fetch, 'test') == 'foo'
+        assert not fetch.called
+
+    @patch('sentry.lang.javascript.processor.SINGLE_FLIGHT_POLL_INTERVAL', 0)
+    def test_wait_for_other_worker(self):
+        results = [None, None, 'foo']
+        fetch = Mock()
+        with self.hold_lock('key'):
+            result = fetch_single_flight('key', lambda: results.pop(0), fetch, 'test')
+
+        assert result == 'foo'
+        assert not fetch.called
+
+    @patch('sentry.lang.javascript.processor.SINGLE_FLIGHT_WAIT', 0)
+    def test_other_worker_timeout(self):
+        fetch = Mock(return_value='foo')
+        with self.hold_lock('key'):
+            result = fetch_single_flight('key', lambda: None, fetch, 'test')
+
+        assert result == 'foo'
+        assert fetch.call_count == 1
+
+
 class FetchFileTest(TestCase):
     @responses.activate
     def test_simple(self):
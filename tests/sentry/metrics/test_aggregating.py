@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+
+from mock import patch
+
+from sentry.metrics.aggregating import AggregatingMetricsBackend
+from sentry.testutils import TestCase
+
+
+class AggregatingMetricsBackendTest(TestCase):
+    def setUp(self):
+        self.backend = AggregatingMetricsBackend(
+            backend='sentry.metrics.dummy.DummyMetricsBackend',
+            max_series=2,
+            max_timing_samples=3,
+            prefix='sentrytest.',
+        )
+
+    def tearDown(self):
+        self.backend.aggregator._reset()
+
+    @patch('sentry.metrics.dummy.DummyMetricsBackend.incr')
+    def test_incr(self, mock_incr):
+        self.backend.incr('foo', tags={'a': 'b'})
+        self.backend.incr('foo', tags={'a': 'b'}, amount=2)
+        assert not mock_incr.called
+
+        self.backend.flush()
+        mock_incr.assert_called_once_with('foo', None, {'a': 'b'}, 3)
+
+        self.backend.flush()
+        assert mock_incr.call_count == 1
+
+    @patch('sentry.metrics.dummy.DummyMetricsBackend.incr')
+    @patch('sentry.metrics.dummy.DummyMetricsBackend.timing')
+    def test_timing(self, mock_timing, mock_incr):
+        for value in range(10):
+            self.backend.timing('foo', value)
+        self.backend.flush()
+
+        assert mock_timing.call_count == 3
+        for args, _ in mock_timing.call_args_list:
+            assert args[0] == 'foo'
+            assert 0 <= args[1] < 10
+            assert len(args) == 4
+        mock_incr.assert_called_once_with('foo.count', None, {}, 10)
+
+    @patch('sentry.metrics.aggregating.os.getpid')
+    def test_restart_after_fork(self, mock_getpid):
+        aggregator = self.backend.aggregator
+        aggregator._thread = thread = object()
+        aggregator._pid = 1
+
+        mock_getpid.return_value = 1
+        self.backend.incr('foo')
+        assert aggregator._thread is thread
+
+        # the thread of the parent does not run in a forked child
+        mock_getpid.return_value = 2
+        self.backend.incr('foo')
+        assert aggregator._thread is not thread
+        assert aggregator._pid == 2
+
+    def test_prefix(self):
+        assert self.backend.backend.prefix == 'sentrytest.'
+
+    @patch('sentry.metrics.dummy.DummyMetricsBackend.incr')
+    def test_back_pressure(self, mock_incr):
+        self.backend.incr('foo')
+        self.backend.incr('bar')
+        assert not mock_incr.called
+
+        self.backend.incr('baz')
+        assert mock_incr.call_count == 2
+        assert self.backend.aggregator.counters == {('baz', None, ()): 1}
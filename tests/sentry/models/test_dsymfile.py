@@ -153,3 +153,64 @@ class SymCacheTest(TestCase):
 
         assert symcache.id == debug_id
         assert symcache.is_latest_file_format
+
+    def test_symcache_metadata_cache(self):
+        file = File.objects.create(
+            name='crash.dSYM',
+            type='default',
+            headers={'Content-Type': 'application/x-mach-binary'},
+        )
+
+        path = os.path.join(os.path.dirname(__file__), 'fixtures', 'crash.dsym')
+        with open(path) as f:
+            file.putfile(f)
+
+        debug_id = '67e9247c-814e-392b-a027-dbde6748fcbf'
+        ProjectDSymFile.objects.create(
+            file=file,
+            object_name='crash.dSYM',
+            cpu_name='x86',
+            project=self.project,
+            debug_id=debug_id,
+        )
+
+        symcaches = ProjectDSymFile.dsymcache.get_symcaches(self.project, [debug_id])
+        assert symcaches[debug_id].id == debug_id
+
+        with self.assertNumQueries(0):
+            symcaches = ProjectDSymFile.dsymcache.get_symcaches(self.project, [debug_id])
+        assert symcaches[debug_id].id == debug_id
+
+
+class DSymCacheSizeBudgetTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache_path = ProjectDSymFile.dsymcache.cache_path
+        project_path = os.path.join(cache_path, 'size-budget-test')
+        try:
+            os.makedirs(project_path)
+        except OSError:
+            pass
+
+        # older than anything else in the cache, but not yet expired
+        now = time.time()
+        paths = []
+        for hours in (30, 29, 28):
+            path = os.path.join(project_path, 'file-%d' % hours)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 10)
+            os.utime(path, (now - hours * 3600, now - hours * 3600))
+            paths.append(path)
+
+        total_size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(cache_path)
+            for name in names
+        )
+
+        with self.options({'dsym.cache-max-size': total_size - 15}):
+            ProjectDSymFile.dsymcache.clear_old_entries()
+
+        assert not os.path.isfile(paths[0])
+        assert not os.path.isfile(paths[1])
+        assert os.path.isfile(paths[2])
+        os.remove(paths[2])
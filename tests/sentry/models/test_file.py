@@ -1,10 +1,13 @@
 from __future__ import absolute_import
 
 import os
+import shutil
+import tempfile
 
 from django.core.files.base import ContentFile
+from hashlib import sha1
 
-from sentry.models import File, FileBlob
+from sentry.models import AssembleChecksumMismatch, File, FileBlob, FileBlobIndex
 from sentry.testutils import TestCase
 
 
@@ -22,6 +25,66 @@ class FileBlobTest(TestCase):
         assert my_file1.checksum == my_file2.checksum
         assert my_file1.path == my_file2.path
 
+    def test_from_chunks(self):
+        existing = FileBlob.from_file(ContentFile(b'foo'))
+
+        blobs = FileBlob.from_chunks([b'foo', b'bar', b'foo', b'baz'])
+
+        assert [b.size for b in blobs] == [3, 3, 3, 3]
+        assert blobs[0].id == blobs[2].id == existing.id
+        assert blobs[1].id != blobs[3].id
+        assert blobs[1].getfile().read() == b'bar'
+        assert blobs[3].getfile().read() == b'baz'
+
+
+class FileBlobCacheTest(TestCase):
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path, ignore_errors=True)
+
+    def test_read_through(self):
+        blob = FileBlob.from_file(ContentFile(b'foo bar'))
+        with self.options({'filestore.cache-path': self.cache_path}):
+            assert blob.getfile().read() == b'foo bar'
+
+            path = FileBlob.blobcache.get_cachefile_path(blob.checksum)
+            assert path.startswith(self.cache_path)
+            with open(path, 'rb') as f:
+                assert f.read() == b'foo bar'
+
+            # Served from the cache even if the storage lost the file
+            blob.deletefile()
+            blob.path = 'missing'
+            assert blob.getfile().read() == b'foo bar'
+
+    def test_checksum_mismatch(self):
+        blob = FileBlob.from_file(ContentFile(b'foo bar'))
+        blob.checksum = sha1(b'something else').hexdigest()
+        with self.options({'filestore.cache-path': self.cache_path}):
+            assert blob.getfile().read() == b'foo bar'
+            path = FileBlob.blobcache.get_cachefile_path(blob.checksum)
+            assert not os.path.exists(path)
+            assert os.listdir(os.path.dirname(path)) == []
+
+    def test_clear_old_entries(self):
+        blobs = [FileBlob.from_file(ContentFile(c * 10)) for c in (b'a', b'b', b'c')]
+        with self.options({
+            'filestore.cache-path': self.cache_path,
+            'filestore.cache-max-size': 25,
+        }):
+            paths = []
+            for age, blob in zip((300, 200, 100), blobs):
+                blob.getfile().close()
+                path = FileBlob.blobcache.get_cachefile_path(blob.checksum)
+                mtime = os.stat(path).st_mtime - age
+                os.utime(path, (mtime, mtime))
+                paths.append(path)
+
+            FileBlob.blobcache.clear_old_entries()
+            assert [os.path.exists(p) for p in paths] == [False, True, True]
+
 
 class FileTest(TestCase):
     def test_file_handling(self):
@@ -77,3 +140,50 @@ class FileTest(TestCase):
 
         f = file.getfile(prefetch=True)
         assert f.read() == random_data
+
+    def test_prefetch_from_blob_cache(self):
+        random_data = os.urandom(1 << 21)
+
+        file = File.objects.create(
+            name='test.bin',
+            type='default',
+            size=len(random_data),
+        )
+        file.putfile(ContentFile(random_data))
+
+        cache_path = tempfile.mkdtemp()
+        try:
+            with self.options({'filestore.cache-path': cache_path}):
+                # once to populate the cache, once to read from it
+                assert file.getfile(prefetch=True).read() == random_data
+                assert file.getfile(prefetch=True).read() == random_data
+        finally:
+            shutil.rmtree(cache_path, ignore_errors=True)
+
+    def test_assemble_from_file_blob_ids(self):
+        blobs = FileBlob.from_chunks([b'foo', b'bar', b'baz'])
+        checksum = sha1(b'foobarbaz').hexdigest()
+
+        file = File.objects.create(
+            name='test.bin',
+            type='default',
+        )
+        with file.assemble_from_file_blob_ids([b.id for b in blobs], checksum) as tf:
+            assert tf.read() == b'foobarbaz'
+
+        assert file.size == 9
+        assert file.checksum == checksum
+        with file.getfile() as fp:
+            assert fp.read() == b'foobarbaz'
+
+    def test_assemble_checksum_mismatch(self):
+        blobs = FileBlob.from_chunks([b'foo', b'bar'])
+
+        file = File.objects.create(
+            name='test.bin',
+            type='default',
+        )
+        with self.assertRaises(AssembleChecksumMismatch):
+            file.assemble_from_file_blob_ids([b.id for b in blobs], 'invalid')
+
+        assert not FileBlobIndex.objects.filter(file=file).exists()
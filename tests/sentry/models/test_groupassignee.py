@@ -1,10 +1,12 @@
 from __future__ import absolute_import
 
+import mock
 import pytest
 import six
 
 from sentry.testutils import TestCase
-from sentry.models import GroupAssignee, Activity
+from sentry.models import GroupAssignee, GroupSubscription, Activity
+from sentry.signals import issue_assigned
 
 
 class GroupAssigneeTestCase(TestCase):
@@ -99,3 +101,53 @@ class GroupAssigneeTestCase(TestCase):
         assert activity[1].data['assignee'] == six.text_type(self.team.id)
         assert activity[1].data['assigneeEmail'] is None
         assert activity[1].data['assigneeType'] == 'team'
+
+    def test_bulk_assign(self):
+        group2 = self.create_group(project=self.project)
+        GroupAssignee.objects.assign(self.group, self.team)
+
+        GroupAssignee.objects.bulk_assign([self.group, group2], self.user)
+
+        assert set(GroupAssignee.objects.filter(
+            user=self.user,
+            team__isnull=True,
+        ).values_list('group_id', flat=True)) == set([self.group.id, group2.id])
+        activity = list(Activity.objects.filter(
+            type=Activity.ASSIGNED,
+        ).order_by('id'))
+        assert len(activity) == 3
+        assert activity[1].data['assigneeType'] == 'user'
+        assert activity[2].data['assigneeType'] == 'user'
+
+        # assigning again does not create any activity
+        GroupAssignee.objects.bulk_assign([self.group, group2], self.user)
+        assert Activity.objects.filter(type=Activity.ASSIGNED).count() == 3
+
+    def test_bulk_assign_team(self):
+        group2 = self.create_group(project=self.project)
+        receiver = mock.Mock()
+        issue_assigned.connect(receiver)
+        try:
+            GroupAssignee.objects.bulk_assign([self.group, group2], self.team)
+        finally:
+            issue_assigned.disconnect(receiver)
+
+        assert set(GroupAssignee.objects.filter(
+            team=self.team,
+        ).values_list('group_id', flat=True)) == set([self.group.id, group2.id])
+        assert set(
+            call[1]['group'].id for call in receiver.call_args_list
+        ) == set([self.group.id, group2.id])
+        assert set(GroupSubscription.objects.filter(
+            user=self.user,
+        ).values_list('group_id', flat=True)) == set([self.group.id, group2.id])
+
+    def test_bulk_deassign(self):
+        group2 = self.create_group(project=self.project)
+        GroupAssignee.objects.assign(self.group, self.user)
+
+        GroupAssignee.objects.bulk_deassign([self.group, group2])
+
+        assert not GroupAssignee.objects.filter(group=self.group).exists()
+        assert Activity.objects.filter(type=Activity.UNASSIGNED, group=self.group).exists()
+        assert not Activity.objects.filter(type=Activity.UNASSIGNED, group=group2).exists()
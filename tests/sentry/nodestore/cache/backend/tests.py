@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import mock
+
+from django.core.cache import cache
+
+from sentry.nodestore.base import NodeStorage
+from sentry.nodestore.cache.backend import CachedNodeStorage
+from sentry.testutils import TestCase
+
+
+class InMemoryBackend(NodeStorage):
+    def __init__(self):
+        self._data = {}
+        self.reads = []
+
+    def set(self, id, data):
+        self._data[id] = data
+
+    def get(self, id):
+        self.reads.append([id])
+        return self._data.get(id)
+
+    def get_multi(self, id_list):
+        self.reads.append(list(id_list))
+        return {id: self._data.get(id) for id in id_list}
+
+    def delete(self, id):
+        self._data.pop(id, None)
+
+
+class CachedNodeStorageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ns = CachedNodeStorage(InMemoryBackend, max_node_size=512)
+        self.backend = self.ns.backend
+
+    def test_write_through(self):
+        node_id = self.ns.create({'foo': 'bar'})
+        assert self.backend.get(node_id) == {'foo': 'bar'}
+        del self.backend.reads[:]
+
+        assert self.ns.get(node_id) == {'foo': 'bar'}
+        assert self.backend.reads == []
+
+        self.ns.set(node_id, {'foo': 'baz'})
+        assert self.ns.get(node_id) == {'foo': 'baz'}
+        assert self.backend.reads == []
+
+    def test_get_multi_fetches_misses_in_batch(self):
+        self.backend.set('a', {'foo': 'a'})
+        self.backend.set('b', {'foo': 'b'})
+        self.ns.set('c', {'foo': 'c'})
+
+        result = self.ns.get_multi(['a', 'b', 'c', 'd'])
+        assert result == {
+            'a': {'foo': 'a'},
+            'b': {'foo': 'b'},
+            'c': {'foo': 'c'},
+            'd': None,
+        }
+        assert self.backend.reads == [['a', 'b', 'd']]
+
+        assert self.ns.get_multi(['a', 'b'])['b'] == {'foo': 'b'}
+        assert self.backend.reads == [['a', 'b', 'd']]
+
+    def test_large_nodes_are_not_cached(self):
+        data = {'foo': [str(i) for i in range(1000)]}
+        self.ns.set('a', data)
+
+        assert self.ns.get('a') == data
+        assert self.backend.reads == [['a']]
+
+    def test_delete(self):
+        self.ns.set('a', {'foo': 'bar'})
+        self.ns.delete('a')
+
+        assert self.ns.get('a') is None
+        assert self.backend.reads == [['a']]
+
+    def test_delete_cache_failure(self):
+        self.ns.set('a', {'foo': 'bar'})
+        with mock.patch.object(self.ns.cache, 'delete_many', side_effect=Exception):
+            self.ns.delete('a')
+
+        assert self.backend.get('a') is None
@@ -2,14 +2,22 @@
 
 from __future__ import absolute_import
 
+import pytest
+
+from concurrent.futures import TimeoutError
+from threading import Event, current_thread
+
 from sentry.nodestore.base import NodeStorage
+from sentry.nodestore.django.backend import DjangoNodeStorage
 from sentry.nodestore.multi.backend import MultiNodeStorage
 from sentry.testutils import TestCase
 
 
 class InMemoryBackend(NodeStorage):
-    def __init__(self):
-        self._data = {}
+    # Backends are thread local and writes happen on other threads, the
+    # data has to be passed in to be shared between them.
+    def __init__(self, data):
+        self._data = data
 
     def set(self, id, data):
         self._data[id] = data
@@ -18,11 +26,44 @@ class InMemoryBackend(NodeStorage):
         return self._data.get(id)
 
 
+class BrokenBackend(NodeStorage):
+    def set(self, id, data):
+        raise ValueError('broken')
+
+    def get(self, id):
+        raise ValueError('broken')
+
+
+class BlockingBackend(InMemoryBackend):
+    def __init__(self, data, event):
+        super(BlockingBackend, self).__init__(data)
+        self.event = event
+
+    def set(self, id, data):
+        self.event.wait()
+        super(BlockingBackend, self).set(id, data)
+
+    def get(self, id):
+        self.event.wait()
+        return super(BlockingBackend, self).get(id)
+
+
+class ThreadRecordingDjangoBackend(DjangoNodeStorage):
+    def __init__(self, threads):
+        self.threads = threads
+
+    def set(self, id, data):
+        self.threads.append(current_thread())
+
+    def get(self, id):
+        self.threads.append(current_thread())
+
+
 class MultiNodeStorageTest(TestCase):
     def setUp(self):
         self.ns = MultiNodeStorage([
-            (InMemoryBackend, {}),
-            (InMemoryBackend, {}),
+            (InMemoryBackend, {'data': {}}),
+            (InMemoryBackend, {'data': {}}),
         ])
 
     def test_basic_integration(self):
@@ -80,3 +121,59 @@ class MultiNodeStorageTest(TestCase):
             assert backend.get(node_id2) == {
                 'foo': 'bir',
             }
+
+
+class MultiNodeStorageConcurrencyTest(TestCase):
+    def test_write_error(self):
+        data = {}
+        ns = MultiNodeStorage([
+            (BrokenBackend, {}),
+            (InMemoryBackend, {'data': data}),
+        ])
+        with pytest.raises(ValueError):
+            ns.set('a', {'foo': 'bar'})
+        assert data == {'a': {'foo': 'bar'}}
+
+    def test_write_timeout(self):
+        event = Event()
+        data = {}
+        ns = MultiNodeStorage([
+            (BlockingBackend, {'data': {}, 'event': event}),
+            (InMemoryBackend, {'data': data}),
+        ], write_timeout=0.1)
+        try:
+            with pytest.raises(TimeoutError):
+                ns.set('a', {'foo': 'bar'})
+        finally:
+            event.set()
+        assert data == {'a': {'foo': 'bar'}}
+
+    def test_hedged_read(self):
+        event = Event()
+        data = {'a': {'foo': 'bar'}}
+        ns = MultiNodeStorage([
+            (BlockingBackend, {'data': data, 'event': event}),
+            (InMemoryBackend, {'data': data}),
+        ], read_selector=lambda backends: backends[0], hedge_reads=True)
+        try:
+            assert ns.get('a') == {'foo': 'bar'}
+        finally:
+            event.set()
+
+    def test_hedged_read_error(self):
+        ns = MultiNodeStorage([
+            (BrokenBackend, {}),
+            (InMemoryBackend, {'data': {'a': {'foo': 'bar'}}}),
+        ], read_selector=lambda backends: backends[0], hedge_reads=True,
+            hedge_min_delay=10)
+        assert ns.get('a') == {'foo': 'bar'}
+
+    def test_database_backend_runs_inline(self):
+        threads = []
+        ns = MultiNodeStorage([
+            (ThreadRecordingDjangoBackend, {'threads': threads}),
+            (InMemoryBackend, {'data': {}}),
+        ], read_selector=lambda backends: backends[0], hedge_reads=True)
+        ns.set('a', {'foo': 'bar'})
+        ns.get('a')
+        assert threads == [current_thread(), current_thread()]
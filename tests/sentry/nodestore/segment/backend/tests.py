@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import time
+
+from datetime import timedelta
+from django.utils import timezone
+
+from sentry.nodestore import codec
+from sentry.nodestore.segment.backend import (
+    RECORD_SET, SegmentNodeStorage, _make_record
+)
+from sentry.testutils import TestCase
+
+
+class SegmentNodeStorageTest(TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.ns = SegmentNodeStorage(self.path, index_capacity=8)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def get_segments(self):
+        return sorted(name for name in os.listdir(self.path) if name.endswith('.seg'))
+
+    def test_basic_integration(self):
+        node_id = self.ns.create({'foo': 'bar'})
+        assert self.ns.get(node_id) == {'foo': 'bar'}
+
+        self.ns.set(node_id, {'foo': 'baz'})
+        assert self.ns.get(node_id) == {'foo': 'baz'}
+
+        self.ns.delete(node_id)
+        assert self.ns.get(node_id) is None
+
+    def test_multi(self):
+        # enough nodes to make the index grow a few times
+        self.ns.set_multi({'node%d' % i: {'i': i} for i in range(100)})
+
+        result = self.ns.get_multi(['node1', 'node99', 'missing'])
+        assert result == {
+            'node1': {'i': 1},
+            'node99': {'i': 99},
+            'missing': None,
+        }
+
+        self.ns.delete_multi(['node1', 'node2'])
+        assert self.ns.get_multi(['node1', 'node2', 'node3']) == {
+            'node1': None,
+            'node2': None,
+            'node3': {'i': 3},
+        }
+
+    def test_shared_between_instances(self):
+        self.ns.set('a', {'foo': 'bar'})
+
+        other = SegmentNodeStorage(self.path)
+        assert other.get('a') == {'foo': 'bar'}
+        other.set('b', {'foo': 'baz'})
+        assert self.ns.get('b') == {'foo': 'baz'}
+
+    def test_rebuild_index(self):
+        self.ns.set_multi({'a': {'foo': 'bar'}, 'b': {'foo': 'baz'}})
+        self.ns.delete('b')
+        self.ns.index.close()
+        os.remove(os.path.join(self.path, 'index'))
+
+        ns = SegmentNodeStorage(self.path)
+        assert ns.get('a') == {'foo': 'bar'}
+        assert ns.get('b') is None
+
+    def test_replay_after_crash(self):
+        self.ns.set('a', {'foo': 'bar'})
+        segment = os.path.join(self.path, self.get_segments()[-1])
+
+        # a record which was written without updating the index, followed
+        # by a partial write
+        with open(segment, 'ab') as f:
+            f.write(_make_record(RECORD_SET, b'b', codec.encode({'foo': 'baz'})))
+            size = f.tell()
+            f.write(b'NR\x00')
+
+        self.ns.set('c', {'foo': 'qux'})
+        assert self.ns.get_multi(['a', 'b', 'c']) == {
+            'a': {'foo': 'bar'},
+            'b': {'foo': 'baz'},
+            'c': {'foo': 'qux'},
+        }
+        # the new record replaced the partial write
+        assert os.path.getsize(segment) > size
+        assert SegmentNodeStorage(self.path).get('c') == {'foo': 'qux'}
+
+    def test_cleanup(self):
+        ns = SegmentNodeStorage(self.path, segment_size=1)
+        ns.set('a', {'foo': 'bar'})
+        ns.set('b', {'foo': 'baz'})
+        ns.set('c', {'foo': 'qux'})
+        segments = self.get_segments()
+        assert len(segments) == 3
+
+        old = time.time() - 2 * 60 * 60
+        for segment in segments:
+            os.utime(os.path.join(self.path, segment), (old, old))
+
+        ns.cleanup(timezone.now() - timedelta(hours=1))
+
+        # the newest segment is always kept
+        assert self.get_segments() == segments[-1:]
+        assert ns.get_multi(['a', 'b', 'c']) == {
+            'a': None,
+            'b': None,
+            'c': {'foo': 'qux'},
+        }
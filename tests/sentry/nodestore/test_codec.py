@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import zlib
+
+from datetime import datetime
+
+from django.test.utils import override_settings
+
+from sentry.nodestore import codec
+from sentry.nodestore.codec import CompactNodeCodec, PickleNodeCodec, train_dictionary
+from sentry.testutils import TestCase
+from sentry.utils.compat import pickle
+from sentry.utils.strings import compress
+
+
+def make_event(i):
+    return {
+        'sdk': {'name': 'raven-python', 'version': '6.4.0'},
+        'sentry.interfaces.Exception': {
+            'values': [{
+                'type': 'ValueError',
+                'value': u'invalid literal %d – ü' % i,
+                'stacktrace': {
+                    'frames': [{
+                        'filename': 'django/core/handlers/base.py',
+                        'abs_path': '/usr/lib/python2.7/site-packages/django/core/handlers/base.py',
+                        'function': 'get_response',
+                        'module': 'django.core.handlers.base',
+                        'in_app': False,
+                        'lineno': 112 + i,
+                    }],
+                },
+            }],
+        },
+    }
+
+
+class CompactNodeCodecTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        path = os.path.join(self.tmpdir, 'raven-python-1')
+        with open(path, 'wb') as f:
+            f.write(train_dictionary(make_event(i) for i in range(10)))
+        self.codec = CompactNodeCodec(dictionaries={
+            1: {'sdk': 'raven-python', 'path': path},
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        data = make_event(100)
+        value = self.codec.encode(data)
+        assert value.startswith(codec.MAGIC)
+        assert self.codec.decode(value) == data
+
+    def test_dictionary(self):
+        data = make_event(100)
+        assert len(self.codec.encode(data)) < len(CompactNodeCodec().encode(data))
+
+        # payloads without a matching dictionary are compressed without one
+        data['sdk']['name'] = 'raven-js'
+        assert self.codec.decode(self.codec.encode(data)) == data
+
+    def test_dictionary_level(self):
+        path = os.path.join(self.tmpdir, 'raven-python-1')
+        fast = CompactNodeCodec(dictionaries={
+            1: {'sdk': 'raven-python', 'path': path},
+        }, level=1)
+        assert fast.dictionaries[1].level == 1
+
+        data = make_event(100)
+        assert self.codec.decode(fast.encode(data)) == data
+
+    def test_unknown_dictionary(self):
+        value = self.codec.encode(make_event(100))
+        with self.assertRaises(ValueError):
+            CompactNodeCodec().decode(value)
+
+    def test_legacy_payloads(self):
+        data = {'foo': 'bar', 'timestamp': datetime(2017, 1, 1)}
+        assert self.codec.decode(PickleNodeCodec().encode(data)) == data
+        assert self.codec.decode(zlib.compress(pickle.dumps(data, 0))) == data
+
+        # data which is not valid JSON is stored in the legacy format
+        value = self.codec.encode(data)
+        assert not value.startswith(codec.MAGIC)
+        assert self.codec.decode(value) == data
+
+
+class TextCodecTest(TestCase):
+    def test_legacy_format(self):
+        data = {'foo': 'bar'}
+        value = compress(pickle.dumps(data))
+        assert codec.encode_text(data) == value
+        assert codec.decode_text(value) == data
+
+    @override_settings(SENTRY_NODESTORE_CODEC='sentry.nodestore.codec.CompactNodeCodec')
+    def test_compact_format(self):
+        codec._codec = None
+        try:
+            data = make_event(1)
+            value = codec.encode_text(data)
+            assert value.startswith(codec.TEXT_PREFIX)
+            assert codec.decode_text(value) == data
+            assert codec.decode_text(compress(pickle.dumps(data))) == data
+        finally:
+            codec._codec = None
+
+    def test_compact_payloads_with_pickle_codec(self):
+        data = make_event(1)
+        codec._codec = CompactNodeCodec()
+        try:
+            value = codec.encode(data)
+            text = codec.encode_text(data)
+        finally:
+            codec._codec = None
+
+        # the default codec is configured again
+        assert value.startswith(codec.MAGIC)
+        assert codec.decode(value) == data
+        assert codec.decode_text(text) == data
@@ -1,13 +1,21 @@
 from __future__ import absolute_import
 
+import mock
+
 from django.conf.urls import url
 
 from sentry.plugins import Plugin2
+from sentry.plugins.base.manager import PluginManager
 from sentry.plugins.base.project_api_urls import load_plugin_urls
 from sentry.plugins.base.response import JSONResponse
 from sentry.testutils import TestCase
 
 
+class DisabledByDefaultPlugin(Plugin2):
+    slug = 'disabled-by-default'
+    project_default_enabled = False
+
+
 def test_json_response():
     resp = JSONResponse({}).respond(None)
     assert resp.status_code == 200
@@ -59,3 +67,33 @@ class Plugin2TestCase(TestCase):
         assert a_plugin.get_option('key', project=project) == 'value'
         a_plugin.reset_options(project=project)
         assert a_plugin.get_option('key', project=project) is None
+
+
+class PluginManagerTestCase(TestCase):
+    def test_for_project(self):
+        manager = PluginManager([
+            '%s.%s' % (__name__, DisabledByDefaultPlugin.__name__),
+        ])
+        plugin = manager.get('disabled-by-default')
+
+        assert list(manager.for_project(self.project, version=2)) == []
+
+        plugin.enable(self.project)
+        assert list(manager.for_project(self.project, version=2)) == [plugin]
+        assert list(manager.for_project(self.create_project(), version=2)) == []
+
+        plugin.disable(self.project)
+        assert list(manager.for_project(self.project, version=2)) == []
+
+    @mock.patch('sentry.plugins.base.manager.ENABLED_CACHE_SIZE', 1)
+    def test_for_project_cache_size(self):
+        manager = PluginManager([
+            '%s.%s' % (__name__, DisabledByDefaultPlugin.__name__),
+        ])
+        plugin = manager.get('disabled-by-default')
+        plugin.enable(self.project)
+        other_project = self.create_project()
+
+        assert list(manager.for_project(self.project, version=2)) == [plugin]
+        assert list(manager.for_project(other_project, version=2)) == []
+        assert list(manager._enabled_cache) == [(other_project.id, 2)]
@@ -64,3 +64,14 @@ class SentryCleanupTest(CliTestCase):
 
         for model in ALL_MODELS:
             assert model.objects.count() == 0
+
+    @pytest.mark.skipif(
+        settings.SENTRY_TAGSTORE == 'sentry.tagstore.v2.V2TagStorage',
+        reason='Cleanup is temporarily disabled for tagstore v2'
+    )
+    def test_incremental(self):
+        rv = self.invoke('--days=1', '--incremental', '--target-duration=0.1')
+        assert rv.exit_code == 0, rv.output
+
+        for model in ALL_MODELS:
+            assert model.objects.count() == 0
@@ -14,6 +14,7 @@ from sentry.models import (
     Environment, Event, GroupAssignee, GroupBookmark, GroupEnvironment, GroupStatus,
     GroupSubscription, Release, ReleaseEnvironment, ReleaseProjectEnvironment
 )
+from sentry.search import cache as search_cache
 from sentry.search.base import ANY
 from sentry.search.django.backend import DjangoSearchBackend, get_latest_release
 from sentry.tagstore.v2.backend import AGGREGATE_ENVIRONMENT_ID
@@ -387,6 +388,29 @@ class DjangoSearchBackendTest(TestCase):
         results = self.backend.query(self.project, cursor=results.next, limit=1, sort_by='date')
         assert set(results) == set([])
 
+    def test_result_cache(self):
+        with self.options({'search.result-cache-ttl': 10}):
+            results = self.backend.query(
+                self.project, status=GroupStatus.UNRESOLVED, limit=1, use_cache=True)
+            assert list(results) == [self.group1]
+
+            # status changes without an activity are not picked up until the
+            # cached page expires
+            self.group2.update(status=GroupStatus.UNRESOLVED)
+            cached = self.backend.query(
+                self.project, status=GroupStatus.UNRESOLVED, limit=1, use_cache=True)
+            assert list(cached) == [self.group1]
+            assert cached.next == results.next
+            assert cached.prev == results.prev
+
+            results = self.backend.query(self.project, status=GroupStatus.UNRESOLVED)
+            assert set(results) == set([self.group1, self.group2])
+
+            search_cache.invalidate(self.project.id)
+            results = self.backend.query(
+                self.project, status=GroupStatus.UNRESOLVED, use_cache=True)
+            assert set(results) == set([self.group1, self.group2])
+
     def test_pagination_with_environment(self):
         for dt in [
                 self.group1.first_seen + timedelta(days=1),
@@ -34,3 +34,20 @@ class ActivityNotificationsTest(PluginTestCase):
         activity.send_notification()
 
         assert mock_func.delay.call_count == 1
+
+    @mock.patch.object(BasicPreprocessorPlugin, 'notify_about_activity')
+    def test_bulk(self, mock_notify):
+        from sentry.tasks.activity import send_bulk_activity_notifications
+
+        activity_ids = [
+            Activity.objects.create(
+                project=group.project,
+                group=group,
+                type=Activity.SET_RESOLVED,
+                user=self.user,
+            ).id for group in (self.create_group(), self.create_group())
+        ]
+
+        send_bulk_activity_notifications(activity_ids)
+
+        assert mock_notify.call_count == 2
@@ -5,7 +5,7 @@ from mock import patch
 
 from sentry import tagstore
 from sentry.tagstore.models import GroupTagValue
-from sentry.tasks.merge import merge_group, rehash_group_events
+from sentry.tasks.merge import merge_group, merge_groups, merge_objects, rehash_group_events
 from sentry.models import Event, Group, GroupEnvironment, GroupMeta, GroupRedirect, UserReport
 from sentry.similarity import _make_index_backend
 from sentry.testutils import TestCase
@@ -238,6 +238,37 @@ class MergeGroupTest(TestCase):
 
         assert UserReport.objects.get(id=ur.id).group_id == group2.id
 
+    def test_merge_groups(self):
+        project = self.create_project()
+        target = self.create_group(project, times_seen=1)
+        sources = [self.create_group(project, times_seen=2) for _ in range(3)]
+        events = [
+            self.create_event(group=group)
+            for group in sources
+            for _ in range(2)
+        ]
+
+        with self.tasks():
+            merge_groups([g.id for g in sources], target.id)
+
+        assert not Group.objects.filter(id__in=[g.id for g in sources]).exists()
+        assert set(Event.objects.filter(group_id=target.id).values_list('id', flat=True)) == \
+            set(e.id for e in events)
+        assert set(GroupRedirect.objects.filter(group_id=target.id).values_list(
+            'previous_group_id', flat=True)) == set(g.id for g in sources)
+        assert Group.objects.get(id=target.id).times_seen == 7
+
+    def test_merge_objects_in_chunks(self):
+        project = self.create_project()
+        group1 = self.create_group(project)
+        group2 = self.create_group(project)
+        events = [self.create_event(group=group1) for _ in range(5)]
+
+        assert merge_objects([Event], group1, group2, limit=2, max_rows=4)
+        assert Event.objects.filter(group_id=group1.id).count() == 1
+        assert not merge_objects([Event], group1, group2, limit=2)
+        assert Event.objects.filter(group_id=group2.id).count() == len(events)
+
 
 class RehashGroupEventsTest(TestCase):
     def test_simple(self):
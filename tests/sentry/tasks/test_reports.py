@@ -12,9 +12,10 @@ from sentry.app import tsdb
 from sentry.models import Project, UserOption
 from sentry.tasks.reports import (
     DISABLED_ORGANIZATIONS_USER_OPTION_KEY, Report, Skipped, change, clean_series, colorize,
-    deliver_organization_user_report, get_calendar_range, get_percentile, has_valid_aggregates,
-    index_to_month, merge_mappings, merge_sequences, merge_series, month_to_index, prepare_reports,
-    safe_add, user_subscribed_to_organization_reports
+    deliver_organization_user_report, get_calendar_range, get_percentile, get_project_series,
+    has_valid_aggregates, index_to_month, merge_mappings, merge_sequences, merge_series,
+    month_to_index, prepare_reports, prepare_snapshots, safe_add, snapshot_store,
+    user_subscribed_to_organization_reports
 )
 from sentry.testutils.cases import TestCase
 from sentry.utils.dates import to_datetime, to_timestamp
@@ -340,3 +341,42 @@ class ReportTestCase(TestCase):
 
         set_option_value([organization.id])
         assert user_subscribed_to_organization_reports(user, organization) is False
+
+    def test_snapshots(self):
+        now = datetime(2016, 9, 12, tzinfo=pytz.utc)
+        project = self.create_project(
+            organization=self.organization,
+            teams=[self.team],
+        )
+
+        tsdb.incr(tsdb.models.project, project.id, now - timedelta(days=2), count=2)
+        tsdb.incr(tsdb.models.project, project.id, now - timedelta(days=1), count=3)
+        tsdb.incr(tsdb.models.project_total_rejected, project.id, now - timedelta(days=1))
+
+        snapshot_store.prepare(to_timestamp(now - timedelta(days=1)), self.organization)
+
+        # the day with a snapshot is no longer read from the TSDB
+        tsdb.incr(tsdb.models.project, project.id, now - timedelta(days=2), count=5)
+        tsdb.incr(tsdb.models.project, project.id, now - timedelta(days=1), count=5)
+
+        start = now - timedelta(days=2)
+        assert get_project_series(project, 'total', start, now) == [
+            (to_timestamp(now - timedelta(days=2)), 7),
+            (to_timestamp(now - timedelta(days=1)), 3),
+            (to_timestamp(now), 0),
+        ]
+        assert get_project_series(project, 'rejected', start, now) == [
+            (to_timestamp(now - timedelta(days=2)), 0),
+            (to_timestamp(now - timedelta(days=1)), 1),
+            (to_timestamp(now), 0),
+        ]
+
+        # late events are picked up by the snapshots of the following days
+        with self.tasks():
+            prepare_snapshots(timestamp=to_timestamp(now - timedelta(days=1)))
+
+        assert get_project_series(project, 'total', start, now) == [
+            (to_timestamp(now - timedelta(days=2)), 7),
+            (to_timestamp(now - timedelta(days=1)), 8),
+            (to_timestamp(now), 0),
+        ]
@@ -24,7 +24,7 @@ from sentry.models import (
 from sentry.similarity import features, _make_index_backend
 from sentry.tasks.unmerge import (
     get_caches, get_event_user_from_interface, get_fingerprint, get_group_backfill_attributes,
-    get_group_creation_attributes, unmerge
+    get_group_creation_attributes, get_partitions, get_unmerge_progress, unmerge
 )
 from sentry.testutils import TestCase
 from sentry.utils.dates import to_timestamp
@@ -59,6 +59,12 @@ def test_get_fingerprint():
     ) == hashlib.md5('Not hello world').hexdigest()
 
 
+def test_get_partitions():
+    assert get_partitions(1, 17, 4) == [(1, 6), (6, 11), (11, 16), (16, 18)]
+    assert get_partitions(1, 3, 4) == [(1, 2), (2, 3), (3, 4)]
+    assert get_partitions(5, 5, 4) == [(5, 6)]
+
+
 @patch('sentry.similarity.features.index', new=index)
 class UnmergeTestCase(TestCase):
     def test_get_group_creation_attributes(self):
@@ -187,6 +193,86 @@ class UnmergeTestCase(TestCase):
             'first_release': None,
         }
 
+    def test_failed_partition_unlocks_hashes(self):
+        project = self.create_project()
+        source = self.create_group(project)
+        event = Event.objects.create(
+            project_id=project.id,
+            group_id=source.id,
+            event_id=uuid.uuid4().hex,
+            message='Hello world',
+            datetime=timezone.now(),
+            data={
+                'type': 'default',
+                'metadata': {},
+                'sentry.interfaces.Message': {
+                    'message': 'Hello world',
+                },
+            },
+        )
+        fingerprint = get_fingerprint(event)
+        GroupHash.objects.create(
+            project=project,
+            group=source,
+            hash=fingerprint,
+        )
+
+        with patch('sentry.tasks.unmerge.migrate_events', side_effect=ValueError), \
+                self.tasks(), self.assertRaises(ValueError):
+            unmerge.delay(project.id, source.id, None, [fingerprint], None)
+
+        assert GroupHash.objects.get(
+            project=project,
+            hash=fingerprint,
+        ).state == GroupHash.State.UNLOCKED
+
+    def test_resume_legacy_run(self):
+        project = self.create_project()
+        source = self.create_group(project)
+        events = [
+            Event.objects.create(
+                project_id=project.id,
+                group_id=source.id,
+                event_id=uuid.uuid4().hex,
+                message='Hello world',
+                datetime=timezone.now(),
+                data={
+                    'type': 'default',
+                    'metadata': {},
+                    'sentry.interfaces.Message': {
+                        'message': 'Hello world',
+                    },
+                },
+            ) for _ in range(2)
+        ]
+        fingerprint = get_fingerprint(events[0])
+        GroupHash.objects.create(
+            project=project,
+            group=source,
+            hash=fingerprint,
+            state=GroupHash.State.LOCKED_IN_MIGRATION,
+        )
+
+        # a run queued by a previous version, which already moved the
+        # events from the cursor on
+        with self.tasks():
+            unmerge.delay(
+                project.id,
+                source.id,
+                None,
+                [fingerprint],
+                None,
+                cursor=events[1].id,
+                batch_size=500,
+                source_fields_reset=True,
+            )
+
+        group_hash = GroupHash.objects.get(project=project, hash=fingerprint)
+        assert group_hash.state == GroupHash.State.UNLOCKED
+        assert group_hash.group_id != source.id
+        assert Event.objects.get(id=events[0].id).group_id == group_hash.group_id
+        assert Event.objects.get(id=events[1].id).group_id == source.id
+
     def test_unmerge(self):
         def shift(i):
             return timedelta(seconds=1 << i)
@@ -336,7 +422,7 @@ class UnmergeTestCase(TestCase):
         ]
 
         with self.tasks():
-            unmerge.delay(
+            result = unmerge.delay(
                 source.project_id,
                 source.id,
                 None,
@@ -345,6 +431,9 @@ class UnmergeTestCase(TestCase):
                 batch_size=5,
             )
 
+        # the shared state is removed once the repairs were applied
+        assert get_unmerge_progress(result.get()) is None
+
         assert list(
             Group.objects.filter(id=source.id).values_list(
                 'times_seen',
@@ -0,0 +1,72 @@
+from __future__ import absolute_import
+
+import mock
+
+from datetime import timedelta
+from django.utils import timezone
+
+from sentry import tsdb
+from sentry.testutils import TestCase
+from sentry.tsdb.cache import get_range
+
+
+class GetRangeTest(TestCase):
+    def test_closed_buckets_are_cached(self):
+        model = tsdb.models.project_total_received
+        now = timezone.now()
+        start = now - timedelta(days=1)
+        tsdb.incr(model, 1, now - timedelta(hours=2), count=3)
+
+        with self.options({
+            'api.stats.cache': True,
+            'api.stats.open-bucket-ttl': 0,
+        }):
+            expected = tsdb.get_range(model, [1, 2], start, now)
+            assert get_range(model, [1, 2], start, now) == expected
+
+            tsdb.incr(model, 1, now - timedelta(hours=2), count=3)
+            tsdb.incr(model, 1, now, count=1)
+
+            with mock.patch('sentry.tsdb.get_range', wraps=tsdb.get_range) as tsdb_get_range:
+                result = get_range(model, [1, 2], start, now)
+
+        # only the open buckets were read again
+        assert tsdb_get_range.call_count == 1
+        assert tsdb_get_range.call_args[1]['start'] > now - timedelta(hours=2)
+
+        assert sorted(result) == [1, 2]
+        assert [ts for ts, _ in result[1]] == [ts for ts, _ in expected[1]]
+        assert sum(count for _, count in result[1]) == 4
+        assert sum(count for _, count in result[2]) == 0
+
+    def test_event_time_buckets_are_not_closed(self):
+        model = tsdb.models.project
+        now = timezone.now()
+        start = now - timedelta(days=1)
+        tsdb.incr(model, 1, now - timedelta(hours=2), count=3)
+
+        with self.options({
+            'api.stats.cache': True,
+            'api.stats.open-bucket-ttl': 0,
+        }):
+            get_range(model, [1], start, now)
+
+            # a late event is still counted in its own bucket
+            tsdb.incr(model, 1, now - timedelta(hours=2), count=3)
+
+            with mock.patch('sentry.tsdb.get_range', wraps=tsdb.get_range) as tsdb_get_range:
+                result = get_range(model, [1], start, now)
+
+        assert tsdb_get_range.call_count == 1
+        assert sum(count for _, count in result[1]) == 6
+
+    def test_disabled(self):
+        model = tsdb.models.project
+        now = timezone.now()
+        start = now - timedelta(days=1)
+
+        with mock.patch('sentry.tsdb.get_range', wraps=tsdb.get_range) as tsdb_get_range:
+            get_range(model, [1], start, now)
+            get_range(model, [1], start, now)
+
+        assert tsdb_get_range.call_count == 2
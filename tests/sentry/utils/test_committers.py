@@ -1,11 +1,17 @@
 from __future__ import absolute_import
 
+import mock
+
 from datetime import timedelta
 from django.utils import timezone
 
-from sentry.models import Release
+from sentry.models import Commit, CommitFileChange, Release, ReleaseCommit, Repository
 from sentry.testutils import TestCase
-from sentry.utils.committers import get_previous_releases, score_path_match_length, tokenize_path
+from sentry.utils.cache import cache
+from sentry.utils.committers import (
+    CommitPathIndex, get_commit_path_index, get_previous_releases, score_path_match_length,
+    tokenize_path
+)
 
 
 def test_score_path_match_length():
@@ -22,6 +28,84 @@ def test_tokenize_path():
     assert list(tokenize_path('foo.bar')) == ['foo.bar']
 
 
+def test_commit_path_index():
+    index = CommitPathIndex([
+        ('src/foo/bar/baz.py', 1),
+        ('src/foo/bar/baz.py', 2),
+        ('lib/bar/baz.py', 3),
+        ('baz.py', 4),
+        ('src/foo/bar/baz.pyc', 5),
+        ('qux.py', 6),
+    ])
+
+    assert index.match('foo/bar/baz.py') == (3, set([1, 2]))
+    assert index.match('/usr/src/app/bar/baz.py') == (2, set([1, 2, 3]))
+    # a match of the file name alone only counts for files without a directory
+    assert index.match('app/baz.py') == (1, set([4]))
+    assert index.match('app/corge.py') == (0, set())
+    assert index.match('src/foo/bar/qux.py') == (1, set([6]))
+    assert CommitPathIndex().match('foo/bar/baz.py') == (0, set())
+
+    index = CommitPathIndex.loads(index.dumps())
+    assert index.match('foo/bar/baz.py') == (3, set([1, 2]))
+    assert index.match('app/baz.py') == (1, set([4]))
+
+
+class GetCommitPathIndexTestCase(TestCase):
+    def setUp(self):
+        self.org = self.create_organization()
+        repo = Repository.objects.create(organization_id=self.org.id, name='example')
+        self.commit = Commit.objects.create(
+            organization_id=self.org.id,
+            repository_id=repo.id,
+            key='a' * 40,
+        )
+        for filename in ('src/foo/bar/baz.py', 'src/foo/qux.py'):
+            CommitFileChange.objects.create(
+                organization_id=self.org.id,
+                commit=self.commit,
+                filename=filename,
+                type='M',
+            )
+        self.release = Release.objects.create(
+            organization=self.org,
+            version='b' * 40,
+            commit_count=1,
+            last_commit_id=self.commit.id,
+        )
+        ReleaseCommit.objects.create(
+            organization_id=self.org.id,
+            release=self.release,
+            commit=self.commit,
+            order=0,
+        )
+
+    def test_cached(self):
+        with mock.patch.object(cache, 'set') as cache_set, \
+                mock.patch.object(cache, 'get', return_value=None):
+            index = get_commit_path_index(self.release, ['bar/baz.py'])
+        assert index.match('bar/baz.py') == (2, set([self.commit.id]))
+
+        value = cache_set.call_args[0][1]
+        with mock.patch.object(cache, 'get', return_value=value):
+            index = get_commit_path_index(self.release, ['bar/baz.py'])
+        assert index.match('foo/qux.py') == (2, set([self.commit.id]))
+
+    @mock.patch('sentry.utils.committers.PATH_INDEX_MAX_CACHE_SIZE', 0)
+    def test_too_large(self):
+        with mock.patch.object(cache, 'set') as cache_set, \
+                mock.patch.object(cache, 'get', return_value=None):
+            index = get_commit_path_index(self.release, ['bar/baz.py'])
+        assert index.match('bar/baz.py') == (2, set([self.commit.id]))
+        assert cache_set.call_args[0][1] == ''
+
+        with mock.patch.object(cache, 'get', return_value=''):
+            index = get_commit_path_index(self.release, ['bar/baz.py'])
+        # only the files named like the paths are loaded
+        assert index.keys == [u'baz.py\x00bar\x00foo\x00src']
+        assert index.match('bar/baz.py') == (2, set([self.commit.id]))
+
+
 class GetPreviousReleasesTestCase(TestCase):
     def test_simple(self):
         current_datetime = timezone.now()
@@ -7,7 +7,9 @@ from concurrent.futures import CancelledError, Future
 from contextlib import contextmanager
 from threading import Event
 
-from sentry.utils.concurrent import FutureSet, SynchronousExecutor, ThreadedExecutor, TimedFuture
+from sentry.utils.concurrent import (
+    FutureSet, SynchronousExecutor, ThreadedExecutor, TimedFuture, execute_all
+)
 
 
 def test_future_set_callback_success():
@@ -229,3 +231,45 @@ def test_threaded_executor():
     low_priority_waiting.set()  # let the task finish
     assert low_priority_future.result(timeout=1) is 2
     assert low_priority_future.done()
+
+
+def test_execute_all():
+    executor = ThreadedExecutor(worker_count=2)
+
+    def error():
+        raise ValueError
+
+    futures = execute_all({
+        'a': lambda: 1,
+        'b': lambda: 2,
+        'c': error,
+    }, executor)
+
+    assert set(futures) == set(['a', 'b', 'c'])
+    assert futures['a'].result() == 1
+    assert futures['b'].result() == 2
+    with pytest.raises(ValueError):
+        futures['c'].result()
+
+    for future in futures.values():
+        started, finished = future.get_timing()
+        assert started <= finished
+
+
+def test_execute_all_timeout():
+    executor = ThreadedExecutor(worker_count=1)
+    event = Event()
+
+    futures = execute_all({
+        'a': event.wait,
+        'b': event.wait,
+    }, executor, timeout=0.5)
+
+    # only one of the callables can be running on the single worker, the
+    # other one is still queued when the timeout expires
+    cancelled = [key for key, future in futures.items() if future.cancelled()]
+    assert len(cancelled) == 1
+
+    event.set()
+    running, = set(futures) - set(cancelled)
+    assert futures[running].result() is True
@@ -0,0 +1,28 @@
+from __future__ import absolute_import
+
+from sentry.models import Event
+from sentry.testutils import TestCase
+from sentry.utils.events import hydrate_events
+
+
+class HydrateEventsTest(TestCase):
+    def test_simple(self):
+        release = self.create_release(self.project, version='1.0')
+        self.create_event(event_id='a' * 32, tags={
+            'sentry:release': '1.0',
+        })
+        self.create_event(event_id='b' * 32, tags={
+            'sentry:release': '2.0',
+        })
+
+        events = list(Event.objects.filter(project_id=self.project.id).order_by('event_id'))
+        hydrate_events(events, releases=True)
+
+        with self.assertNumQueries(0):
+            for event in events:
+                assert event.data['sentry.interfaces.Message']
+                assert event.group == self.group
+                assert event.project == self.project
+
+            assert events[0].get_release() == release
+            assert events[1].get_release() is None